@@ -0,0 +1,406 @@
+"""
+JSON API over logic: the generator for other systems, no Streamlit.
+
+    python api_server.py [--host 127.0.0.1] [--port 8765] [--workers 4]
+
+    GET /generate?patterns=木木土,木火土&zodiac=Horse&filter=EXCLUDE_XIONG&offset=0&limit=50
+    GET /paginate?patterns=all&page_size=100&cursor=<next_cursor>
+    GET /search?q=hong wen&zodiac=Horse&filter=EXCLUDE_XIONG
+    GET /analyze?name=洪文軒&zodiac=All
+    GET /stats                                  per-endpoint latency, cache sizes
+    GET /health
+
+Query parameters may also be sent as a JSON object in a POST body.
+Common ones: patterns ("all" or comma-separated, default the
+PATTERN_MEANINGS keys), zodiac, filter, surname (a config.SURNAMES preset,
+or custom characters with strokes=15,17 and pinyin=...), combo_source,
+engine, max_rows (default API_MAX_ROWS, "all" = uncapped), offset, limit,
+detail=1 (full rows with five grids and character details).
+
+The DB is loaded once. Result sets and their search indexes are shared
+by every request in an LRU; /generate and /search over the same query
+reuse one result set. Concurrent misses on the same query wait for a
+single generation. Generation and row building run on a thread pool, so
+a slow query never stalls /analyze, cache hits or /stats on the event loop.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+from config import (
+    API_HOST, API_MAX_LIMIT, API_MAX_ROWS, API_PORT, API_RESULT_SETS, API_WORKERS, COMBO_SOURCE, EXCEL_PATH,
+    FIRST_CHAR, PATTERN_MEANINGS, SURNAMES, ZODIAC_OPTIONS,
+)
+from logic import (
+    ALL_PATTERNS, ZODIAC_FILTER_MODES, DbHandle, analyze_name, custom_surname, generate_result_page,
+    load_db_handle, persistent_result_set, result_cache, result_cache_key, result_frame, result_rows,
+)
+from result_store import ResultSet
+from search_index import SearchIndex
+
+ENGINES = ("python", "numpy", "parallel", "sqlite")
+MAX_BODY = 1 << 20
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+# ============================================================
+# QUERY PARAMETERS
+# ============================================================
+class Query(NamedTuple):
+    patterns: tuple
+    zodiac_name: str
+    zodiac_filter_mode: str
+    max_rows: Optional[int]
+    surname: Optional[dict]
+    combo_source: str
+    engine: str
+
+
+def _choice(params: dict, name: str, options, default: str) -> str:
+    value = str(params.get(name, default))
+    if value not in options:
+        raise ValueError(f"{name} must be one of {', '.join(options)}; got {value!r}")
+    return value
+
+
+def _int(params: dict, name: str, default: Optional[int], lo: int = 0, hi: Optional[int] = None) -> Optional[int]:
+    value = params.get(name, default)
+    if value is None or value == "all":
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer; got {value!r}") from None
+    if value < lo or (hi is not None and value > hi):
+        raise ValueError(f"{name} must be between {lo} and {hi if hi is not None else '∞'}")
+    return value
+
+
+def parse_surname(params: dict) -> Optional[dict]:
+    name = params.get("surname")
+    if name is None:
+        return None
+    if params.get("strokes") is None:
+        if name not in SURNAMES:
+            raise ValueError(f"Unknown surname preset {name!r}; pass strokes (and pinyin) for a custom surname")
+        return None if SURNAMES[name] == FIRST_CHAR else SURNAMES[name]
+    return custom_surname(str(name), str(params.get("pinyin", "")), str(params["strokes"]))
+
+
+def parse_query(params: dict) -> Query:
+    raw = params.get("patterns", ",".join(PATTERN_MEANINGS))
+    if raw == "all":
+        patterns = tuple(ALL_PATTERNS)
+    else:
+        items = raw if isinstance(raw, list) else str(raw).replace("，", ",").split(",")
+        patterns = tuple(p.strip() for p in items if p.strip())
+        unknown = [p for p in patterns if p not in ALL_PATTERNS]
+        if unknown or not patterns:
+            raise ValueError(f"Unknown pattern(s): {', '.join(unknown) or '(none)'} (three of 木火土金水, or 'all')")
+    return Query(
+        patterns=patterns,
+        zodiac_name=_choice(params, "zodiac", ZODIAC_OPTIONS, "None"),
+        zodiac_filter_mode=_choice(params, "filter", ZODIAC_FILTER_MODES, "OFF"),
+        max_rows=_int(params, "max_rows", API_MAX_ROWS, lo=1),
+        surname=parse_surname(params),
+        combo_source=_choice(params, "combo_source", ("solver", "requested"), COMBO_SOURCE),
+        engine=_choice(params, "engine", ENGINES, "python"),
+    )
+
+
+# ============================================================
+# LATENCY
+# ============================================================
+class LatencyStats:
+    """Per-endpoint request count, errors and percentiles over the last `window` requests."""
+
+    def __init__(self, window: int = 1024):
+        self.count = 0
+        self.errors = 0
+        self.samples = deque(maxlen=window)
+
+    def record(self, ms: float, ok: bool) -> None:
+        self.count += 1
+        self.errors += not ok
+        self.samples.append(ms)
+
+    def snapshot(self) -> dict:
+        ms = sorted(self.samples)
+        if not ms:
+            return {"count": self.count, "errors": self.errors}
+
+        def pct(q: float) -> float:
+            return round(ms[min(len(ms) - 1, int(q * len(ms)))], 2)
+
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean_ms": round(sum(ms) / len(ms), 2),
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+            "max_ms": round(ms[-1], 2),
+        }
+
+
+# ============================================================
+# SERVICE
+# ============================================================
+class NameService:
+    def __init__(self, handle: DbHandle, workers: int = API_WORKERS, max_result_sets: int = API_RESULT_SETS):
+        self.handle = handle
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="generate")
+        self.max_result_sets = max_result_sets
+        self.results: "OrderedDict[str, ResultSet]" = OrderedDict()
+        self.indexes: "OrderedDict[str, SearchIndex]" = OrderedDict()
+        self.inflight: Dict[str, asyncio.Future] = {}
+        self.latency: Dict[str, LatencyStats] = {}
+        self.started = time.time()
+        self.routes: Dict[str, Callable[[dict], Any]] = {
+            "/generate": self.generate,
+            "/paginate": self.paginate,
+            "/search": self.search,
+            "/analyze": self.analyze,
+            "/stats": self.stats,
+            "/health": self.health,
+        }
+
+    async def run(self, fn, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, partial(fn, *args, **kwargs))
+
+    async def _shared(self, cache: OrderedDict, key: str, build: Callable[[], Any]):
+        """LRU lookup; on a miss exactly one build runs in the executor and every waiter gets its result."""
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+        flight_key = f"{id(cache)}:{key}"
+        future = self.inflight.get(flight_key)
+        if future is None:
+            future = asyncio.ensure_future(self.run(build))
+            self.inflight[flight_key] = future
+
+            def settle(done: asyncio.Future) -> None:
+                # runs when the build ends, whoever is still waiting (or not)
+                self.inflight.pop(flight_key, None)
+                if done.cancelled() or done.exception() is not None:
+                    return
+                cache[key] = done.result()
+                while len(cache) > self.max_result_sets:
+                    cache.popitem(last=False)
+
+            future.add_done_callback(settle)
+        # shielded for every waiter, the first included: a client that disconnects
+        # cancels its own handler, never the build the others are waiting on
+        return await asyncio.shield(future)
+
+    def _key(self, q: Query) -> str:
+        return result_cache_key(self.handle.fingerprint, q.patterns, q.zodiac_name, q.zodiac_filter_mode,
+                                q.max_rows, q.surname, q.combo_source)
+
+    async def result_set(self, q: Query) -> ResultSet:
+        return await self._shared(self.results, self._key(q), partial(
+            persistent_result_set, self.handle, q.patterns, q.zodiac_name, q.zodiac_filter_mode,
+            q.max_rows, q.engine, q.surname, q.combo_source,
+        ))
+
+    async def search_index(self, q: Query) -> SearchIndex:
+        rs = await self.result_set(q)
+        return await self._shared(self.indexes, self._key(q), partial(SearchIndex, rs, self.handle.db))
+
+    def _rows(self, rs: ResultSet, ids: List[int], detail: bool) -> List[dict]:
+        """JSON rows for the given candidate ids; "id" is the candidate's position in the result set."""
+        if detail:
+            rows = result_rows(rs, self.handle.db, self.handle.by_char, ids)
+            for k, row in zip(ids, rows):
+                row["id"] = k
+            return rows
+        records = result_frame(rs.select(ids), self.handle.db).to_dict("records")
+        for rec in records:
+            rec["id"] = ids[rec.pop("_rid")]
+        return records
+
+    # ---------------- endpoints ----------------
+    async def generate(self, params: dict) -> dict:
+        q = parse_query(params)
+        offset = _int(params, "offset", 0)
+        limit = _int(params, "limit", 100, hi=API_MAX_LIMIT)
+        rs = await self.result_set(q)
+        ids = list(range(min(offset, len(rs)), min(offset + limit, len(rs))))
+        rows = await self.run(self._rows, rs, ids, params.get("detail") in ("1", "true", True))
+        return {"total": len(rs), "offset": offset, "limit": limit, "rows": rows}
+
+    async def paginate(self, params: dict) -> dict:
+        q = parse_query(params)
+        page_size = _int(params, "page_size", 100, lo=1, hi=API_MAX_LIMIT)
+        page, next_cursor = await self.run(
+            generate_result_page, self.handle.db, self.handle.by_strokes, q.patterns, q.zodiac_name,
+            q.zodiac_filter_mode, page_size, params.get("cursor") or None, q.surname, q.combo_source,
+        )
+        rows = await self.run(self._rows, page, list(range(len(page))), params.get("detail") in ("1", "true", True))
+        return {"rows": rows, "next_cursor": next_cursor}
+
+    async def search(self, params: dict) -> dict:
+        q = parse_query(params)
+        limit = _int(params, "limit", 100, hi=API_MAX_LIMIT)
+        index = await self.search_index(q)
+        hits = index.search(str(params.get("q", "")))
+        ids = sorted(hits) if hits is not None else list(range(index.size))
+        rs = await self.result_set(q)
+        rows = await self.run(self._rows, rs, ids[:limit], params.get("detail") in ("1", "true", True))
+        return {"total": len(ids), "limit": limit, "rows": rows}
+
+    async def analyze(self, params: dict) -> dict:
+        surname = parse_surname(params)
+        zodiac_name = _choice(params, "zodiac", ZODIAC_OPTIONS, "None")
+        spec = surname or FIRST_CHAR
+        given = str(params.get("name", "")).strip()
+        if given.startswith(spec["char"]):
+            given = given[len(spec["char"]):]
+        if len(given) != 2:
+            raise ValueError(f"name must be the surname plus two characters (or just the two), e.g. {spec['char']}文軒")
+        chars = [self.handle.by_char.get(ch) for ch in given]
+        missing = [ch for ch, c in zip(given, chars) if c is None]
+        if missing:
+            raise ApiError(404, f"Not in the character DB: {''.join(missing)}")
+        return analyze_name(chars[0], chars[1], self.handle.by_char, zodiac_name, surname)
+
+    async def stats(self, params: dict) -> dict:
+        cache = result_cache()
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "endpoints": {path: s.snapshot() for path, s in sorted(self.latency.items())},
+            "result_sets": len(self.results),
+            "search_indexes": len(self.indexes),
+            "in_flight": len(self.inflight),
+            "result_cache": cache.stats() if cache else None,
+        }
+
+    async def health(self, params: dict) -> dict:
+        return {"status": "ok", "fingerprint": self.handle.fingerprint, "characters": len(self.handle.db)}
+
+    async def dispatch(self, method: str, target: str, body: bytes):
+        """(status, payload, elapsed ms) for one request; records the latency under the route."""
+        t0 = time.perf_counter()
+        url = urlsplit(target)
+        route = self.routes.get(url.path)
+        status = 200
+        try:
+            if route is None:
+                raise ApiError(404, f"Unknown endpoint {url.path}; try {', '.join(self.routes)}")
+            if method not in ("GET", "POST"):
+                raise ApiError(405, "Use GET or POST")
+            params: Dict[str, Any] = dict(parse_qsl(url.query))
+            if body:
+                extra = json.loads(body)
+                if not isinstance(extra, dict):
+                    raise ValueError("POST body must be a JSON object")
+                params.update(extra)
+            payload = await route(params)
+        except ApiError as exc:
+            status, payload = exc.status, {"error": str(exc)}
+        except ValueError as exc:  # bad parameters, bad cursor, bad JSON
+            status, payload = 400, {"error": str(exc)}
+        except Exception as exc:  # keep serving; the client gets the reason
+            status, payload = 500, {"error": f"{type(exc).__name__}: {exc}"}
+        elapsed = (time.perf_counter() - t0) * 1000
+        if route is not None:
+            self.latency.setdefault(url.path, LatencyStats()).record(elapsed, status < 500)
+        return status, payload, elapsed
+
+
+# ============================================================
+# HTTP (HTTP/1.1 with keep-alive, just enough for JSON clients)
+# ============================================================
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+def _json_default(o):
+    return o.item() if hasattr(o, "item") else str(o)  # numpy scalars from frames
+
+
+async def handle_connection(service: NameService, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                            quiet: bool = False) -> None:
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line.strip():
+                break
+            method, target, version = request_line.decode("latin-1").split()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            length = int(headers.get("content-length") or 0)
+            if length > MAX_BODY:
+                status, payload, elapsed = 413, {"error": "Body too large"}, 0.0
+                keep_alive = False
+            else:
+                body = await reader.readexactly(length) if length else b""
+                status, payload, elapsed = await service.dispatch(method, target, body)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+            data = json.dumps(payload, ensure_ascii=False, default=_json_default).encode("utf-8")
+            writer.write(
+                (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                 "Content-Type: application/json; charset=utf-8\r\n"
+                 f"Content-Length: {len(data)}\r\n"
+                 f"Server-Timing: app;dur={elapsed:.2f}\r\n"
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode("latin-1") + data
+            )
+            await writer.drain()
+            if not quiet:
+                print(f"{method} {target} {status} {elapsed:.1f}ms", file=sys.stderr, flush=True)
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass  # client went away or sent something that isn't HTTP
+    finally:
+        writer.close()
+
+
+async def serve(service: NameService, host: str = API_HOST, port: int = API_PORT, quiet: bool = False) -> None:
+    server = await asyncio.start_server(partial(handle_connection, service, quiet=quiet), host, port)
+    addrs = ", ".join(str(s.getsockname()) for s in server.sockets)
+    print(f"Serving {len(service.handle.db)} characters on {addrs}", file=sys.stderr, flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--excel", default=EXCEL_PATH)
+    ap.add_argument("--host", default=API_HOST)
+    ap.add_argument("--port", type=int, default=API_PORT)
+    ap.add_argument("--workers", type=int, default=API_WORKERS, help="generation threads")
+    ap.add_argument("--quiet", action="store_true", help="no access log")
+    args = ap.parse_args(argv)
+
+    service = NameService(load_db_handle(args.excel), workers=args.workers)
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.quiet))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.executor.shutdown(wait=False, cancel_futures=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,26 @@
+import hashlib
+import os
+import tempfile
+import threading
 import streamlit as st
 import pandas as pd
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
 
-from config import EXCEL_PATH, ELEMENT_COLORS, FIVE_GRID_TIPS, ZODIAC_OPTIONS
-from logic import generate_rows_cached, load_db_raw
+from config import (
+    EXCEL_PATH, ELEMENT_COLORS, FIVE_GRID_TIPS, ZODIAC_OPTIONS, ZODIAC_MATRIX, SURNAMES,
+    COMBO_SOURCE, PATTERN_MEANINGS, RESULT_CACHE_WARMUP, DIAGNOSTICS_LOG_LEVEL,
+)
+from logic import (
+    ALL_PATTERNS, HANDLE_HASH, DbHandle, generate_result_set_cached, result_cache, warm_result_cache, search_index_cached, generate_result_page_cached,
+    result_frame, result_matrix_passes, result_rows, custom_surname, pruning_counts_cached,
+)
+from diagnostics import Diagnostics, configure_logging
+from hot_reload import WorkbookWatcher
+from rules.zodiac_rules import ZODIAC_ORDER, zodiac_check
+from search_index import SearchIndex
+from pdf_export import export_pdf, generate_pdf
 
 # ============================================================
 # UI HELPERS
@@ -46,26 +64,44 @@ def horse_row_status(row: dict) -> str:
     if "吉" in statuses:
         return "吉"
     return "neutral"
-def render_pagination_bar(total: int, page_size: int, key_prefix: str = "pg"):
-    total_pages = max(1, (total + page_size - 1) // page_size)
+
+def turn_page(delta: int):
+    st.session_state.page += delta
+
+def render_pagination_bar(total: Optional[int], page_size: int, key_prefix: str = "pg", has_next: bool = False):
+    """
+    total=None → cursor mode: the page count is unknown, the caller fetches
+    page N by resuming from page N-1's cursor, and Next stays enabled while has_next.
+    Page turns rerun only the enclosing fragment, except in cursor mode where
+    the new page has to be fetched by the full script.
+    """
+    cursor_mode = total is None
+    total_pages = None if cursor_mode else max(1, (total + page_size - 1) // page_size)
 
     # init + clamp
     if "page" not in st.session_state:
         st.session_state.page = 1
-    st.session_state.page = max(1, min(int(st.session_state.page), total_pages))
+    st.session_state.page = max(1, int(st.session_state.page))
+    if not cursor_mode:
+        st.session_state.page = min(st.session_state.page, total_pages)
 
     start = (st.session_state.page - 1) * page_size
-    end = min(start + page_size, total)
+    end = start + page_size if cursor_mode else min(start + page_size, total)
 
     c1, c2, c3 = st.columns([1, 3, 1])
 
     with c1:
-        if st.button("⬅ Previous", key=f"{key_prefix}_prev", disabled=(st.session_state.page <= 1)):
-            st.session_state.page -= 1
+        if st.button("⬅ Previous", key=f"{key_prefix}_prev", disabled=(st.session_state.page <= 1),
+                     on_click=turn_page, args=(-1,)) and cursor_mode:
             st.rerun()
 
     with c2:
-        if total == 0:
+        if cursor_mode:
+            st.markdown(
+                f"Page **{st.session_state.page}** · names **{start+1}–{end}**"
+                + ("" if has_next else " · last page")
+            )
+        elif total == 0:
             st.markdown("No results.")
         else:
             st.markdown(
@@ -74,15 +110,35 @@ def render_pagination_bar(total: int, page_size: int, key_prefix: str = "pg"):
             )
 
     with c3:
-        if st.button("Next ➡", key=f"{key_prefix}_next", disabled=(st.session_state.page >= total_pages)):
-            st.session_state.page += 1
+        at_end = not has_next if cursor_mode else st.session_state.page >= total_pages
+        if st.button("Next ➡", key=f"{key_prefix}_next", disabled=at_end,
+                     on_click=turn_page, args=(1,)) and cursor_mode:
             st.rerun()
 
     return start, end
 
-@st.cache_data(show_spinner=False)
-def load_db_cached(path: str):
-    return load_db_raw(path)
+@st.cache_resource(show_spinner=False)
+def workbook_watcher(path: str) -> WorkbookWatcher:
+    # one per process: an edited workbook is hot reloaded (hot_reload.py) into a new shared handle
+    watcher = WorkbookWatcher(path)
+    watcher.start()
+    return watcher
+
+# Sidebar defaults; the startup warm-up precomputes exactly this query for every zodiac/filter
+DEFAULT_PATTERNS = [p for p in PATTERN_MEANINGS if p in ALL_PATTERNS]
+DEFAULT_MAX_GENERATE = 500
+
+@st.cache_resource(show_spinner=False, hash_funcs=HANDLE_HASH)
+def start_result_cache_warmup(handle: DbHandle) -> threading.Thread:
+    # once per process and DB version; other workers find the results in the shared on-disk cache
+    worker = threading.Thread(
+        target=warm_result_cache,
+        args=(handle, tuple(DEFAULT_PATTERNS), DEFAULT_MAX_GENERATE, SURNAMES[next(iter(SURNAMES))], COMBO_SOURCE),
+        name="result-cache-warmup",
+        daemon=True,
+    )
+    worker.start()
+    return worker
 
 def ensure_state():
     if "favorites" not in st.session_state:
@@ -101,16 +157,62 @@ def remove_favorite(name: str):
 def clear_favorites():
     st.session_state.favorites = []
 
+@contextmanager
+def fragment_stage(dx: Diagnostics, name: str):
+    """
+    Time a fragment as stage `name` of the script run. A fragment rerun on
+    its own (page turn, expander) comes after the run was logged, so it
+    gets a fresh Diagnostics and logs its own line.
+    """
+    if not dx.emitted:
+        with dx.stage(name):
+            yield dx
+        return
+    dx = Diagnostics()
+    with dx.stage(name):
+        yield dx
+    dx.emit(run=name)
+
+def render_diagnostics(dx: Diagnostics):
+    with st.sidebar.expander("⏱ Diagnostics", expanded=True):
+        st.caption("Last full run; stages may nest (cards includes card_rows). Fragment reruns are only logged.")
+        st.dataframe(
+            pd.DataFrame({"stage": list(dx.stages), "ms": [round(s * 1000, 1) for s in dx.stages.values()]}),
+            hide_index=True,
+        )
+        st.dataframe(
+            pd.DataFrame({"counter": list(dx.counters), "count": list(dx.counters.values())}),
+            hide_index=True,
+        )
+
 # ============================================================
 # APP
 # ============================================================
 ensure_state()
 
-if "_btn_counter" not in st.session_state:
-    st.session_state["_btn_counter"] = 0
-    
-st.set_page_config(page_title="（洪）Professional Name Generator", layout="wide")
-st.title("🔮（洪）Professional Chinese Name Generator")
+st.set_page_config(page_title="Professional Name Generator", layout="wide")
+
+configure_logging(DIAGNOSTICS_LOG_LEVEL)
+dx = Diagnostics()  # stage timings + pruning counters of this run (sidebar panel, log line)
+
+def surname_from_sidebar() -> dict:
+    """Preset from config.SURNAMES, or a custom (possibly compound) surname."""
+    options = list(SURNAMES) + ["Custom…"]
+    choice = st.sidebar.selectbox("Surname | 姓氏", options, index=0)
+    if choice != "Custom…":
+        return SURNAMES[choice]
+
+    chars = st.sidebar.text_input("Surname characters (1–2)", "歐陽")
+    pinyin = st.sidebar.text_input("Surname pinyin (one syllable per character)", "ōu yáng")
+    strokes_text = st.sidebar.text_input("Strokes per character (e.g. 15,17)", "15,17")
+    try:
+        return custom_surname(chars, pinyin, strokes_text)
+    except ValueError:
+        st.sidebar.error("Enter 1–2 characters and one stroke count per character. Using the default surname.")
+        return SURNAMES[options[0]]
+
+surname = surname_from_sidebar()
+st.title(f"🔮（{surname['char']}）Professional Chinese Name Generator")
 st.caption("✅ 第二/第三字只依筆畫配對（不需符合Excel五行）｜✅ 組合五行依 +1 規則｜✅ 總格數理不加 +1")
 
 guide_lang = st.sidebar.radio("Guide Language | 說明語言", ["English", "Chinese", "Both"], index=0)
@@ -128,7 +230,7 @@ with st.expander("📘 How to Read This Name Analysis | 使用說明（必讀）
 - **Total Grid (總格)** – overall destiny (**NO +1**)
 
 ### 2️⃣ Five-Element Pattern (五行組合)
-- Surname strokes + 1  
+- Surname strokes + 1 (compound surname: sum of both characters)  
 - Surname + first given name  
 - First + second given name  
 
@@ -151,7 +253,7 @@ Pinyin, strokes, element, and meanings from the database.
 - **總格**：一生命運（**總格不加1**）
 
 ### 2️⃣ 五行組合
-- 姓氏筆畫 + 1  
+- 姓氏筆畫 + 1（複姓：兩字筆畫相加）  
 - 姓氏 + 名字第一字  
 - 名字第一字 + 第二字  
 
@@ -162,15 +264,76 @@ Pinyin, strokes, element, and meanings from the database.
 展開卡片可查看拼音、筆畫、五行與中英文含義。
 """)
 
-db, by_strokes, by_char = load_db_cached(EXCEL_PATH)
+with dx.stage("load_workbook"):
+    watcher = workbook_watcher(EXCEL_PATH)
+    handle = watcher.current()
+db, by_strokes, by_char, load_report = handle.db, handle.by_strokes, handle.by_char, handle.report
+if RESULT_CACHE_WARMUP:
+    start_result_cache_warmup(handle)
 
 # Sidebar controls
 st.sidebar.header("Controls")
 lang = st.sidebar.radio("Meaning Language", ["English", "Chinese", "Both"], 0)
 show_destiny = st.sidebar.toggle("Show destiny meaning (總格數理)", value=True)
 page_size = st.sidebar.selectbox("Cards per page", [100, 200, 800], index=0)
-max_generate = st.sidebar.slider("Max results to generate (perf)", 100, 5000, 500, step=200)
-search = st.sidebar.text_input("Search (Name / Pinyin)", "")
+browse_mode = st.sidebar.radio(
+    "Browse mode",
+    ["Sorted (capped)", "Lazy pages (uncapped)"],
+    index=0,
+    help="Lazy pages generates one page at a time in generation order, so the whole result space can be browsed.",
+)
+lazy_pages = browse_mode == "Lazy pages (uncapped)"
+max_generate = st.sidebar.slider("Max results to generate (perf)", 100, 5000, DEFAULT_MAX_GENERATE, step=200, disabled=lazy_pages)
+engine = st.sidebar.selectbox(
+    "Generation engine",
+    ["python", "numpy", "parallel", "sqlite"],
+    index=0,
+    disabled=lazy_pages,
+    help="numpy evaluates each stroke-pair product with vectorized masks; parallel shards the products across "
+         "a process pool (config.PARALLEL_WORKERS); sqlite runs it as an indexed join on the shared catalog file "
+         "(built from the loaded DB, which stays in memory). "
+         "Results are identical.",
+)
+search = st.sidebar.text_input("Search (Name / Pinyin)", "", help="Characters or pinyin; tones optional (hong = hóng), syllable prefixes match.")
+show_diagnostics = st.sidebar.toggle(
+    "Diagnostics panel",
+    value=False,
+    help="Per-stage timings of this run and how many candidates each filter rejected.",
+)
+
+with st.sidebar.expander("🗂 Data load report"):
+    st.caption(
+        f"Source: {load_report['source']} · {load_report['parse_seconds'] * 1000:.0f} ms · "
+        f"{load_report['rows_read']} rows read · {load_report['rows_loaded']} loaded · "
+        f"{load_report['blank_rows']} blank"
+    )
+    reload = watcher.last_reload
+    if reload:
+        st.caption(
+            f"Hot reload at {reload['at']} ({reload['seconds'] * 1000:.0f} ms): "
+            f"{reload['added']} rows new or edited · {reload['removed']} gone · "
+            f"stroke buckets changed {reload['changed_strokes'] or '—'} (results affected: "
+            f"{reload['generation_strokes'] or '—'}) · {reload['carried']} cached result sets kept, "
+            f"{reload['dropped']} regenerated on demand"
+        )
+    if watcher.last_error:
+        st.caption(
+            f"⚠️ Workbook reload failed at {watcher.last_error['ts'][11:]} ({watcher.last_error['error']}); "
+            "still serving the last good load. Saving the workbook again retries."
+        )
+    cache = result_cache()
+    if cache is not None:
+        stats = cache.stats()
+        st.caption(
+            f"Result cache: {stats['entries']} result sets · "
+            f"{stats['bytes'] / 2**20:.1f} / {stats['max_bytes'] / 2**20:.0f} MB"
+        )
+    if load_report["rejected"]:
+        st.markdown(f"**Rejected rows ({len(load_report['rejected'])})**")
+        st.dataframe(pd.DataFrame(load_report["rejected"]), hide_index=True)
+    if load_report["duplicates"]:
+        st.markdown(f"**Duplicate characters ({len(load_report['duplicates'])})** · last row wins")
+        st.dataframe(pd.DataFrame(load_report["duplicates"]), hide_index=True)
 
 # One zodiac selector (covers horse / monkey / chicken / pig / etc.)
 zodiac_name = st.sidebar.selectbox("Select Zodiac Rule", ZODIAC_OPTIONS, index=0)
@@ -188,59 +351,132 @@ if zodiac_name != "None":
         "REQUIRE 吉 (strict)": "REQUIRE_JI",
     }[zodiac_filter_mode_ui]
 
+# Matrix mode: generate once for every rule set, then filter/pivot here without regenerating
+matrix_zodiacs = []
+if zodiac_name == ZODIAC_MATRIX:
+    matrix_zodiacs = st.sidebar.multiselect(
+        "Must pass for (empty = any rule set)",
+        options=ZODIAC_ORDER,
+        default=[],
+    )
+
 selected_patterns = st.sidebar.multiselect(
     "Select patterns",
-    options=list({"木木木", "木木土"}),  # UI only: options list
-    default=list({"木木木", "木木土"})
+    options=ALL_PATTERNS,
+    default=DEFAULT_PATTERNS,
 )
-
-rows = generate_rows_cached(
-    by_strokes, by_char,
-    tuple(selected_patterns),
-    zodiac_name,
-    zodiac_filter_mode,
-    max_generate
+combo_source_ui = st.sidebar.radio(
+    "Stroke combinations",
+    ["All valid (solver)", "Hand-picked list"],
+    index=0 if COMBO_SOURCE == "solver" else 1,
+    help="The solver searches every 2nd/3rd stroke pair in the workbook that fits the pattern and destiny filter.",
 )
+combo_source = "solver" if combo_source_ui == "All valid (solver)" else "requested"
 
-df = pd.DataFrame([{
-    "Name": r["Name"],
-    "Pinyin": r["Pinyin"],
-    "PatternComputed": r["PatternComputed"],
-    "DestinyTotal": r["DestinyTotal"],
-    "DestinyElement": r["DestinyElement"],
-    "PatternCalc": r["PatternCalc"],
-    "PatternMeaning_EN": r.get("PatternMeaning_EN", ""),
-    "PatternMeaning_ZH": r.get("PatternMeaning_ZH", ""),
-    "DestinyMeaning_EN": r.get("DestinyMeaning_EN", ""),
-    "DestinyMeaning_ZH": r.get("DestinyMeaning_ZH", ""),
-} for r in rows])
-
-df = df.drop_duplicates(subset=["Name", "Pinyin", "PatternComputed", "DestinyTotal"]).reset_index(drop=True)
-df["_c1"] = df["Name"].str[0]
-df["_c2"] = df["Name"].str[1]
-df["_c3"] = df["Name"].str[2]
-df = df.sort_values(by=["_c1", "_c2", "_c3"])
-df = df.drop(columns=["_c1", "_c2", "_c3"]).reset_index(drop=True)
+def fetch_lazy_page(query: tuple, surname: dict):
+    """
+    Result page for st.session_state.page in cursor mode. Cursors are remembered per
+    page, so page N resumes from page N-1's cursor instead of regenerating 1..N.
+    """
+    state = st.session_state.setdefault("lazy_cursors", {})
+    if state.get("query") != (handle.fingerprint, query, surname, combo_source):
+        # cursors index the DB's buckets: a reloaded workbook starts over
+        state.clear()
+        state.update(query=(handle.fingerprint, query, surname, combo_source), cursors={1: None})
+        st.session_state.page = 1
+
+    cursors = state["cursors"]
+    page = max(1, int(st.session_state.get("page", 1)))
+    p = max(k for k in cursors if k <= page)
+    while True:
+        page_rs, next_cursor = generate_result_page_cached(handle, *query, page_size, cursors[p], surname, combo_source)
+        cursors[p + 1] = next_cursor
+        if p == page or next_cursor is None:
+            break
+        p += 1
+    st.session_state.page = p
+    return page_rs, next_cursor is not None
+
+# Results are columnar (ResultSet); full row dicts are only built for the cards on screen
+generation_mode = "OFF" if zodiac_name == ZODIAC_MATRIX else zodiac_filter_mode
+with dx.stage("generate"):
+    if lazy_pages:
+        rs, lazy_has_next = fetch_lazy_page((tuple(selected_patterns), zodiac_name, generation_mode), surname)
+    else:
+        query = (tuple(selected_patterns), zodiac_name, generation_mode, max_generate, engine, surname, combo_source)
+        rs = generate_result_set_cached(handle, *query)
+with dx.stage("pruning_counts"):
+    dx.update(pruning_counts_cached(handle, tuple(selected_patterns), zodiac_name, generation_mode, surname, combo_source))
+dx.count("generated", len(rs))
+
+def finish_run():
+    """Log this run's diagnostics and show the panel; call before every st.stop() and at the end."""
+    dx.emit(
+        run="script", patterns=len(selected_patterns), zodiac=zodiac_name, filter=zodiac_filter_mode,
+        engine="lazy" if lazy_pages else engine, max_rows=None if lazy_pages else max_generate,
+        combo_source=combo_source, search=bool(search.strip()),
+    )
+    if show_diagnostics:
+        render_diagnostics(dx)
+
+# Search + matrix filtering pick candidate ids; the table and the cards share the selection.
+# The search index is built once per result set (per page in lazy mode) and only when searching.
+ids = None
+if search.strip():
+    with dx.stage("search"):
+        index = SearchIndex(rs, db) if lazy_pages else search_index_cached(handle, *query)
+        hits = index.search(search)
+    if hits is not None:
+        ids = sorted(hits)
+        dx.count("rejected_search", len(rs) - len(ids))
+
+if zodiac_name == ZODIAC_MATRIX and zodiac_filter_mode != "OFF":
+    must_pass = matrix_zodiacs or ZODIAC_ORDER
+    combine = all if matrix_zodiacs else any
+    with dx.stage("matrix_filter"):
+        before = len(rs) if ids is None else len(ids)
+        ids = [
+            k for k in (range(len(rs)) if ids is None else ids)
+            if combine(result_matrix_passes(rs, k, db, z, zodiac_filter_mode) for z in must_pass)
+        ]
+    dx.count("rejected_matrix", before - len(ids))
+
+with dx.stage("frame"):
+    if ids is not None:
+        rs = rs.select(ids)
+    df = result_frame(rs, db)
+
+if df.empty and search.strip():
+    st.info(f"No names match “{search.strip()}”.")
+    finish_run()
+    st.stop()
 if df.empty:
-    st.warning("No results found. Check Excel strokes availability, requested tuples, pattern filters, or destiny total filters.")
+    st.warning("No results found. Check Excel strokes availability, stroke combinations, pattern filters, or destiny total filters.")
+    finish_run()
     st.stop()
 
-if search.strip():
-    q = search.strip().lower()
-    df = df[
-        df["Name"].astype(str).str.lower().str.contains(q) |
-        df["Pinyin"].astype(str).str.lower().str.contains(q)
-    ]
+# Capped results arrive sorted by name (display-order generation); lazy pages stay
+# in generation order so the cursor sequence is stable.
+with dx.stage("dedupe"):
+    before = len(df)
+    df = df.drop_duplicates(subset=["Name", "Pinyin", "PatternComputed", "DestinyTotal"]).reset_index(drop=True)
+dx.count("rejected_duplicate", before - len(df))
+dx.count("shown", len(df))
 
 # Summary
 c1, c2, c3 = st.columns([1.2, 1, 1])
-c1.metric("Results", f"{len(df)}")
+c1.metric("Results (this page)" if lazy_pages else "Results", f"{len(df)}")
 c2.metric("Patterns", f"{df['PatternComputed'].nunique()}")
 c3.metric("Destiny Totals", f"{df['DestinyTotal'].nunique()}")
 
 st.divider()
 
-with st.expander("📋 Table view / Export"):
+# ============================================================
+# TABLE / EXPORT (fragment)
+# Opening/closing the expander reruns only this fragment; the table is
+# rendered only while it is open and the CSV is built on download.
+# ============================================================
+def table_columns() -> list:
     base_cols = ["PatternComputed", "Name", "Pinyin", "DestinyTotal", "DestinyElement", "PatternCalc"]
     extra_cols = []
     if lang in ("English", "Both"):
@@ -255,159 +491,264 @@ with st.expander("📋 Table view / Export"):
         else:
             extra_cols += ["DestinyMeaning_EN", "DestinyMeaning_ZH"]
 
-    show_cols = base_cols + extra_cols
-    st.dataframe(df[show_cols], height=360)
-    csv = df[show_cols].to_csv(index=False).encode("utf-8-sig")
-    st.download_button("Download CSV", data=csv, file_name="name_results.csv", mime="text/csv")
+    if zodiac_name == ZODIAC_MATRIX:
+        extra_cols += ZODIAC_ORDER  # 2nd/3rd verdict per rule set, e.g. 吉/—
+    return base_cols + extra_cols
+
+def report_signature(df: pd.DataFrame) -> tuple:
+    """What a built PDF report depends on: the loaded DB, the meaning language and the table rows."""
+    digest = hashlib.sha1(pd.util.hash_pandas_object(df, index=False).values.tobytes()).hexdigest()
+    return handle.fingerprint, lang, digest
+
+def discard_pdf_report(keep: Optional[tuple] = None):
+    """Delete the built report (state and temp file) unless it was built for signature `keep`."""
+    report = st.session_state.get("_report_pdf")
+    if report is None or report[0] == keep:
+        return
+    del st.session_state["_report_pdf"]
+    if os.path.exists(report[1]):
+        os.remove(report[1])
+
+def build_pdf_report(rs, df: pd.DataFrame, signature: tuple):
+    """Render every row of the table into a temp file (export_pdf: parallel parts + merge), with a progress bar."""
+    discard_pdf_report()
+    bar = st.progress(0.0, text="Preparing rows…")
+    rows = result_rows(rs, db, by_char, df["_rid"].astype(int).tolist())
+    with tempfile.NamedTemporaryFile(prefix="name_report_", suffix=".pdf", delete=False) as fh:
+        path = fh.name
+    export_pdf(rows, path, lang_mode=lang, progress=lambda fraction, text: bar.progress(fraction, text=text))
+    st.session_state["_report_pdf"] = (signature, path)
+
+@st.fragment
+def render_table(rs, df: pd.DataFrame, dx: Diagnostics):
+    # a report built for other rows (query, search, reload) or language is never offered
+    signature = report_signature(df) if "_report_pdf" in st.session_state else None
+    discard_pdf_report(keep=signature)
+    table = st.expander("📋 Table view / Export", key="table_view", on_change="rerun")
+    if not table.open:
+        return
+    show_cols = table_columns()
+    with fragment_stage(dx, "table"), table:
+        st.dataframe(df[show_cols], height=360)
+        c1, c2, c3 = st.columns(3)
+        c1.download_button(
+            "Download CSV",
+            data=lambda: df[show_cols].to_csv(index=False).encode("utf-8-sig"),
+            file_name="name_results.csv",
+            mime="text/csv",
+            on_click="ignore",
+        )
+        if c2.button(f"Build PDF report ({len(df)} names)", key="table_pdf", disabled=df.empty):
+            build_pdf_report(rs, df, signature or report_signature(df))
+        report = st.session_state.get("_report_pdf")
+        if report and os.path.exists(report[1]):
+            path = report[1]
+            c3.download_button(
+                "Download PDF report",
+                data=lambda: Path(path).read_bytes(),
+                file_name="name_report.pdf",
+                mime="application/pdf",
+                on_click="ignore",
+            )
+
+render_table(rs, df, dx)
 
 # ============================================================
-# NAME CARDS
+# FAVORITES (fragment)
+# Remove/clear rerun only this panel; the PDF is rendered on download.
 # ============================================================
-st.subheader("✨ Name Cards")
-st.caption("Expand each card to see 五格, 五行組合計算, 總格數理, and each character meaning. Save names to Favorites for comparison and PDF export.")
-
-# Apply the same search filter to rows (so cards match table)
-filtered_rows = rows
-if search.strip():
-    q = search.strip().lower()
-    filtered_rows = [
-        r for r in rows
-        if q in str(r.get("Name","")).lower() or q in str(r.get("Pinyin","")).lower()
-    ]
+@st.fragment
+def render_favorites_panel():
+    favorites = st.session_state.favorites
+    with st.expander(f"⭐ Favorites ({len(favorites)})"):
+        if not favorites:
+            st.caption("Save names from the cards below to compare them here and export a PDF.")
+            return
+        for n, f in enumerate(favorites):
+            c1, c2 = st.columns([5, 1])
+            c1.markdown(f"**{f['Name']}** · {f['Pinyin']} · {f['PatternComputed']} · 總格 {f['DestinyTotal']}")
+            c2.button("Remove", key=f"fav_remove_{n}_{f['Name']}", on_click=remove_favorite, args=(f["Name"],))
+        c1, c2 = st.columns([1, 1])
+        c1.download_button(
+            "Export PDF",
+            data=lambda: generate_pdf(list(favorites), lang_mode=lang).getvalue(),
+            file_name="favorite_names.pdf",
+            mime="application/pdf",
+            on_click="ignore",
+        )
+        c2.button("Clear all", key="fav_clear", on_click=clear_favorites)
 
-# Sort rows by chars (same as df sort)
-def name_sort_key(r):
-    n = str(r.get("Name",""))
-    return (n[0] if len(n)>0 else "", n[1] if len(n)>1 else "", n[2] if len(n)>2 else "")
-
-filtered_rows = sorted(filtered_rows, key=name_sort_key)
-
-# =========================
-# PAGINATION
-# =========================
-total = len(filtered_rows)
-
-# top bar
-start, end = render_pagination_bar(total, page_size, key_prefix="top")
-for i, r in enumerate(filtered_rows[start:end], start=start):
-
-    fg = r["FiveGrids"]
+# ============================================================
+# NAME CARDS (fragment)
+# Page turns and Save rerun only the card list. Titles come from the
+# table frame; a card's full row and body are built only while it is
+# expanded (expanders track open state and rerun the fragment).
+# ============================================================
+def save_favorite(row: dict, rid: int):
+    # callbacks can't draw inside a fragment rerun; the card shows the outcome
+    st.session_state["_saved"] = (rid, add_favorite(row))
 
+def card_title(r) -> str:
+    if lang == "English":
+        return f"{r['Name']} · {r['Pinyin']} · Total {r['DestinyTotal']} · Pattern {r['PatternComputed']}"
+    if lang == "Chinese":
+        return f"{r['Name']} · {r['Pinyin']} · 總格 {r['DestinyTotal']} · 組合 {r['PatternComputed']}"
+    return f"{r['Name']} · {r['Pinyin']} · Total/總格 {r['DestinyTotal']} · Pattern/組合 {r['PatternComputed']}"
+
+def render_card_body(r: dict, rid: int):
+    colA, colB = st.columns([1, 5])
+    with colA:
+        st.button("⭐ Save", key=f"save_{rid}_{r['Name']}", on_click=save_favorite, args=(r, rid))
+        saved = st.session_state.pop("_saved", None)
+        if saved and saved[0] == rid:
+            st.success("Saved to favorites!") if saved[1] else st.info("Already in favorites.")
+    with colB:
+        st.write("")
+
+    # Five grids
     if lang == "English":
-        title = f"{r['Name']} · {r['Pinyin']} · Total {r['DestinyTotal']} · Pattern {r['PatternComputed']}"
+        st.markdown("### 🧭 Five Grids (Heaven · Personality · Earth · Total)")
     elif lang == "Chinese":
-        title = f"{r['Name']} · {r['Pinyin']} · 總格 {r['DestinyTotal']} · 組合 {r['PatternComputed']}"
-    else:
-        title = f"{r['Name']} · {r['Pinyin']} · Total/總格 {r['DestinyTotal']} · Pattern/組合 {r['PatternComputed']}"
-
-    with st.expander(title):
-        colA, colB = st.columns([1, 5])
-        with colA:
-            st.session_state["_btn_counter"] += 1
-            btn_key = f"save_{r['Name']}_{st.session_state['_btn_counter']}"
-            if st.button("⭐ Save", key=f"save_{r['Name']}_{i}_{r.get('PatternComputed','')}_{r.get('DestinyTotal','')}"):
-                ok = add_favorite(r)
-                st.success("Saved to favorites!") if ok else st.info("Already in favorites.")
-        with colB:
-            st.write("")
-
-        # Five grids
-        if lang == "English":
-            st.markdown("### 🧭 Five Grids (Heaven · Personality · Earth · Total)")
-        elif lang == "Chinese":
-            st.markdown("### 🧭 五格（天格・人格・地格・總格）")
+        st.markdown("### 🧭 五格（天格・人格・地格・總格）")
+        if len(surname["char"]) > 1:
+            st.caption("天格：複姓兩字相加 ｜ 人格：姓2+名1 ｜ 地格：名1+名2 ｜ 總格：四字總和（總格不加1）")
+        else:
             st.caption("天格：姓+1 ｜ 人格：姓+名1 ｜ 地格：名1+名2 ｜ 總格：三字總和（總格不加1）")
+    else:
+        st.markdown("### 🧭 Five Grids 五格（Heaven・Personality・Earth・Total）")
+        if len(surname["char"]) > 1:
+            st.caption("Heaven 天格：both surname chars ｜ Personality 人格：surname 2 + 名1 ｜ Earth 地格：名1+名2 ｜ Total 總格：sum (NO +1 / 不加1)")
         else:
-            st.markdown("### 🧭 Five Grids 五格（Heaven・Personality・Earth・Total）")
             st.caption("Heaven 天格：surname + 1 ｜ Personality 人格：surname + 名1 ｜ Earth 地格：名1+名2 ｜ Total 總格：sum (NO +1 / 不加1)")
 
-        fg = r["FiveGrids"]
-        cols = st.columns(4)
-        for i, key in enumerate(["天格", "人格", "地格", "總格"]):
-            strokes, elem = fg[key]
+    fg = r["FiveGrids"]
+    cols = st.columns(4)
+    for i, key in enumerate(["天格", "人格", "地格", "總格"]):
+        strokes, elem = fg[key]
 
+        if lang == "English":
+            label_map = {"天格": "Heaven Grid", "人格": "Personality Grid", "地格": "Earth Grid", "總格": "Total Grid"}
+            label = label_map[key]
+        elif lang == "Chinese":
+            label = key
+        else:
+            label_map = {
+                "天格": "Heaven Grid 天格",
+                "人格": "Personality Grid 人格",
+                "地格": "Earth Grid 地格",
+                "總格": "Total Grid 總格",
+            }
+            label = label_map[key]
+
+        cols[i].metric(label=label, value=str(strokes), delta=elem, help=five_grid_tooltip(key, lang))
+
+    st.divider()
+
+    left, right = st.columns([1.05, 1.35])
+    with left:
+        st.markdown("#### 🔢 Calculations")
+        st.write(f"**Pattern calc (+1 rule):** {r['PatternCalc']}")
+        st.write(f"**Destiny total (no +1):** {r['DestinyTotal']} → 五行: **{r['DestinyElement']}**")
+
+    with right:
+        st.markdown("#### 📖 Meanings")
+        if lang == "English":
+            st.markdown("**Pattern Meaning (EN)**")
+            st.write(r.get("PatternMeaning_EN", "") or "—")
+        elif lang == "Chinese":
+            st.markdown("**組合含義（中文）**")
+            st.write(r.get("PatternMeaning_ZH", "") or "—")
+        else:
+            st.markdown("**Pattern Meaning (EN)**")
+            st.write(r.get("PatternMeaning_EN", "") or "—")
+            st.markdown("**組合含義（中文）**")
+            st.write(r.get("PatternMeaning_ZH", "") or "—")
+
+        if show_destiny:
+            st.markdown(f"**Destiny Meaning 總格數理（{r['DestinyTotal']}）**")
             if lang == "English":
-                label_map = {"天格": "Heaven Grid", "人格": "Personality Grid", "地格": "Earth Grid", "總格": "Total Grid"}
-                label = label_map[key]
-            elif lang == "Chinese":
-                label = key
-            else:
-                label_map = {
-                    "天格": "Heaven Grid 天格",
-                    "人格": "Personality Grid 人格",
-                    "地格": "Earth Grid 地格",
-                    "總格": "Total Grid 總格",
-                }
-                label = label_map[key]
-
-            cols[i].metric(label=label, value=str(strokes), delta=elem, help=five_grid_tooltip(key, lang))
-
-        st.divider()
-
-        left, right = st.columns([1.05, 1.35])
-        with left:
-            st.markdown("#### 🔢 Calculations")
-            st.write(f"**Pattern calc (+1 rule):** {r['PatternCalc']}")
-            st.write(f"**Destiny total (no +1):** {r['DestinyTotal']} → 五行: **{r['DestinyElement']}**")
-
-        with right:
-            st.markdown("#### 📖 Meanings")
-            if lang == "English":
-                st.markdown("**Pattern Meaning (EN)**")
-                st.write(r.get("PatternMeaning_EN", "") or "—")
+                st.success(r.get("DestinyMeaning_EN", "Not defined."))
             elif lang == "Chinese":
-                st.markdown("**組合含義（中文）**")
-                st.write(r.get("PatternMeaning_ZH", "") or "—")
+                st.success(r.get("DestinyMeaning_ZH", "（未定義）"))
             else:
-                st.markdown("**Pattern Meaning (EN)**")
-                st.write(r.get("PatternMeaning_EN", "") or "—")
-                st.markdown("**組合含義（中文）**")
-                st.write(r.get("PatternMeaning_ZH", "") or "—")
-
-            if show_destiny:
-                st.markdown(f"**Destiny Meaning 總格數理（{r['DestinyTotal']}）**")
-                if lang == "English":
-                    st.success(r.get("DestinyMeaning_EN", "Not defined."))
-                elif lang == "Chinese":
-                    st.success(r.get("DestinyMeaning_ZH", "（未定義）"))
-                else:
-                    st.success(r.get("DestinyMeaning_EN", "Not defined."))
-                    st.info(r.get("DestinyMeaning_ZH", "（未定義）"))
-
-        st.divider()
-        st.markdown("### 🔤 Character Details（每個字：拼音・筆畫・五行・含義）")
-
-        if zodiac_name != "None":
-            z = r.get("ZodiacCheck", {}) or {}
-            checks = z.get("checks") or []
-            if len(checks) >= 3:
-                c2 = checks[1]  # 2nd char
-                c3 = checks[2]  # 3rd char
-
-        zodiac_checks = (r.get("ZodiacCheck", {}) or {}).get("checks", [])
-
-        for idx, ch in enumerate(r["CharDetails"]):
-            z = zodiac_checks[idx] if idx < len(zodiac_checks) else {"status": "neutral", "matched": ""}
+                st.success(r.get("DestinyMeaning_EN", "Not defined."))
+                st.info(r.get("DestinyMeaning_ZH", "（未定義）"))
+
+    st.divider()
+    st.markdown("### 🔤 Character Details（每個字：拼音・筆畫・五行・含義）")
+
+    if zodiac_name != "None":
+        z = r.get("ZodiacCheck", {}) or {}
+        checks = z.get("checks") or []
+        if len(checks) >= 3:
+            c2 = checks[1]  # 2nd char
+            c3 = checks[2]  # 3rd char
 
+    zodiac_checks = (r.get("ZodiacCheck", {}) or {}).get("checks", [])
+
+    for idx, ch in enumerate(r["CharDetails"]):
+        z = zodiac_checks[idx] if idx < len(zodiac_checks) else {"status": "neutral", "matched": ""}
+
+        st.markdown(
+            f"**{ch.get('char','')}** · *{ch.get('pinyin','')}* · {ch.get('strokes','')} strokes · "
+            f"Element: {element_badge(ch.get('element',''))} · 马年:",
+            unsafe_allow_html=True
+        )
+
+        if zodiac_name == ZODIAC_MATRIX:
             st.markdown(
-                f"**{ch.get('char','')}** · *{ch.get('pinyin','')}* · {ch.get('strokes','')} strokes · "
-                f"Element: {element_badge(ch.get('element',''))} · 马年:",
+                " ".join(
+                    f"{zn}: " + zodiac_badge(**zodiac_check(ch, zn))
+                    for zn in ZODIAC_ORDER
+                ),
                 unsafe_allow_html=True
             )
-
+        else:
             st.markdown(
                 zodiac_badge(z.get("status", "neutral"), z.get("matched", "")),
                 unsafe_allow_html=True
             )
 
-            if lang == "English":
-                st.write(f"English: {ch.get('meaning_en','') or '—'}")
-            elif lang == "Chinese":
-                st.write(f"中文: {ch.get('meaning_zh','') or '—'}")
-            else:
-                st.write(f"English: {ch.get('meaning_en','') or '—'}")
-                st.write(f"中文: {ch.get('meaning_zh','') or '—'}")
+        if lang == "English":
+            st.write(f"English: {ch.get('meaning_en','') or '—'}")
+        elif lang == "Chinese":
+            st.write(f"中文: {ch.get('meaning_zh','') or '—'}")
+        else:
+            st.write(f"English: {ch.get('meaning_en','') or '—'}")
+            st.write(f"中文: {ch.get('meaning_zh','') or '—'}")
+
+        st.write("")
+
+@st.fragment
+def render_cards(rs, df: pd.DataFrame, dx: Diagnostics):
+    with fragment_stage(dx, "cards") as dx:
+        render_card_list(rs, df, dx)
+
+def render_card_list(rs, df: pd.DataFrame, dx: Diagnostics):
+    render_favorites_panel()
+
+    if lazy_pages:
+        # rs already holds just this page; Next/Previous fetch the page in a full rerun
+        start, _ = render_pagination_bar(None, page_size, key_prefix="top", has_next=lazy_has_next)
+        page_df = df
+    else:
+        start, end = render_pagination_bar(len(df), page_size, key_prefix="top")
+        page_df = df.iloc[start:end]
+
+    for r in page_df.to_dict("records"):
+        rid = int(r["_rid"])  # candidate id in rs
+        card = st.expander(card_title(r), key=f"card_{rid}_{r['Name']}", on_change="rerun")
+        if card.open:
+            with card:
+                with dx.stage("card_rows"):
+                    row = result_rows(rs, db, by_char, [rid])[0]
+                render_card_body(row, rid)
+
+    render_pagination_bar(None if lazy_pages else len(df), page_size, key_prefix="bottom", has_next=lazy_pages and lazy_has_next)
+
+st.subheader("✨ Name Cards")
+st.caption("Expand each card to see 五格, 五行組合計算, 總格數理, and each character meaning. Save names to Favorites for comparison and PDF export.")
 
-            st.write("")
-            
-render_pagination_bar(total, page_size, key_prefix="bottom")
+# Cards follow the table: same dedupe, order and search, via the "_rid" candidate ids
+render_cards(rs, df, dx)
+finish_run()
@@ -0,0 +1,84 @@
+"""
+Batch generation over several surnames vs one generate_result_set per surname.
+
+    python benchmarks/bench_batch.py [--patterns all] [--repeat 3]
+
+Surnames are every config.SURNAMES preset plus two custom ones that share
+a preset's stroke counts (so generate_batch reuses that group's arrays).
+Every surname's batch view must equal a separate generate_result_set call
+for that surname: same candidates in the same order, same surname, same
+table rows. Checked for every ZODIAC_OPTIONS x filter mode x order; the
+script exits non-zero on the first mismatch.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import EXCEL_PATH, REQUESTED_COMBOS, SURNAMES, ZODIAC_OPTIONS  # noqa: E402
+from logic import (  # noqa: E402
+    ALL_PATTERNS, ZODIAC_FILTER_MODES, custom_surname, generate_batch, generate_result_set, load_db_raw, result_frame,
+)
+
+COLUMNS = ("second", "third", "pattern", "destiny", "zodiac")
+
+
+def columns(rs):
+    return tuple(tuple(getattr(rs, c)) for c in COLUMNS)
+
+
+def best_of(repeat, fn):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--excel", default=EXCEL_PATH)
+    ap.add_argument("--patterns", default="all", help="'all' or 'requested'")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    db, by_strokes, _ = load_db_raw(args.excel)
+    patterns = list(ALL_PATTERNS) if args.patterns == "all" else list(REQUESTED_COMBOS)
+    surnames = list(SURNAMES.values()) + [
+        custom_surname("高", "gāo", "10"),         # same strokes as 洪
+        custom_surname("歐冶", "ōu yě", "15,17"),  # same strokes as 歐陽
+    ]
+
+    for order in ("display", "generation"):
+        for zodiac in ZODIAC_OPTIONS:
+            for mode in ZODIAC_FILTER_MODES:
+                batch = generate_batch(db, by_strokes, surnames, patterns, zodiac, mode, max_rows=2000, order=order)
+                if list(batch) != [s["char"] for s in surnames]:
+                    sys.exit(f"MISMATCH: batch keys {list(batch)}")
+                for s in surnames:
+                    alone = generate_result_set(db, by_strokes, patterns, zodiac, mode, max_rows=2000, surname=s,
+                                                order=order)
+                    view = batch[s["char"]]
+                    if (columns(view) != columns(alone) or view.surname != alone.surname
+                            or not result_frame(view, db).equals(result_frame(alone, db))):
+                        sys.exit(f"MISMATCH surname={s['char']} zodiac={zodiac} mode={mode} order={order}")
+
+    for max_rows in (2000, None):
+        one_by_one = best_of(args.repeat, lambda: [
+            generate_result_set(db, by_strokes, patterns, "Horse", "EXCLUDE_XIONG", max_rows=max_rows, surname=s)
+            for s in surnames])
+        batched = best_of(args.repeat, lambda: generate_batch(
+            db, by_strokes, surnames, patterns, "Horse", "EXCLUDE_XIONG", max_rows=max_rows))
+        sizes = {s["char"]: len(rs) for s, rs in zip(surnames, generate_batch(
+            db, by_strokes, surnames, patterns, "Horse", "EXCLUDE_XIONG", max_rows=max_rows).values())}
+        print(f"max_rows={max_rows!s:<5} {len(surnames)} surnames  one by one {one_by_one * 1000:8.1f} ms  "
+              f"batch {batched * 1000:8.1f} ms  names {sizes}")
+
+    print("OK: batch views match per-surname generation")
+
+
+if __name__ == "__main__":
+    main()
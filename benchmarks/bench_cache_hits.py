@@ -0,0 +1,45 @@
+"""
+Cache-hit latency of the fingerprint-keyed result cache.
+
+    python benchmarks/bench_cache_hits.py [--repeat 200]
+
+A hit hashes only the handle fingerprint + query and returns the shared
+ResultSet, so the timings should stay flat as max_rows grows.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import EXCEL_PATH, REQUESTED_COMBOS  # noqa: E402
+from logic import generate_result_set_cached, load_db_handle  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--excel", default=EXCEL_PATH)
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+
+    handle = load_db_handle(args.excel)
+    patterns = tuple(REQUESTED_COMBOS)
+    print(f"DB {handle.fingerprint[:12]} · {len(handle.db)} characters")
+
+    for max_rows in (100, 1000, 5000, None):
+        query = (handle, patterns, "Horse", "EXCLUDE_XIONG", max_rows)
+        t0 = time.perf_counter()
+        first = generate_result_set_cached(*query)
+        miss = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            hit = generate_result_set_cached(*query)
+        per_hit = (time.perf_counter() - t0) / args.repeat
+        assert hit is first, "cache hit must return the shared ResultSet"
+        print(f"max_rows={str(max_rows):<5} {len(first):>6} names  miss {miss * 1000:7.1f} ms  hit {per_hit * 1e6:7.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
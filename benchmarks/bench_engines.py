@@ -0,0 +1,87 @@
+"""
+Python vs NumPy vs process-pool vs SQLite-catalog generation engines: equivalence check + timing.
+
+    python benchmarks/bench_engines.py [--repeat 5]
+
+Every ZODIAC_OPTIONS x filter mode x combo source combination must yield exactly the
+same candidates, in the same order, from every engine, and display order
+must be the name-sorted prefix of generation order; the script exits
+non-zero on the first mismatch.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import EXCEL_PATH, REQUESTED_COMBOS, ZODIAC_OPTIONS  # noqa: E402
+from engine_parallel import shared_pool  # noqa: E402
+from logic import generate_result_set, load_db_handle, open_db_catalog  # noqa: E402
+
+FILTER_MODES = ["OFF", "EXCLUDE_XIONG", "REQUIRE_JI"]
+COMBO_SOURCES = ["solver", "requested"]
+ORDERS = ["display", "generation"]
+ENGINES = ["python", "numpy", "parallel", "sqlite"]
+COLUMNS = ("second", "third", "pattern", "destiny", "zodiac")
+
+
+def columns(rs):
+    return tuple(tuple(getattr(rs, c)) for c in COLUMNS)
+
+
+def best_of(repeat, fn):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--excel", default=EXCEL_PATH)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    handle = load_db_handle(args.excel)
+    db, by_strokes = handle.db, handle.by_strokes
+    catalog = open_db_catalog(handle)
+    engines = ENGINES if catalog is not None else ENGINES[:-1]
+    pool = shared_pool(handle)
+    patterns = list(REQUESTED_COMBOS)
+
+    # display order must equal a stable name sort of generation order, truncated after sorting
+    for order in ORDERS:
+        for max_rows in (None, 500):
+            full = generate_result_set(db, by_strokes, patterns, "Horse", "EXCLUDE_XIONG", order="generation")
+            ids = sorted(range(len(full)), key=lambda k: (db[full.second[k]]["char"], db[full.third[k]]["char"]))
+            expected = columns(full.select(ids[:max_rows])) if order == "display" else columns(full.select(range(len(full))[:max_rows]))
+            for engine in engines:
+                got = columns(generate_result_set(
+                    db, by_strokes, patterns, "Horse", "EXCLUDE_XIONG", max_rows=max_rows, engine=engine, order=order,
+                    catalog=catalog, pool=pool))
+                if got != expected:
+                    sys.exit(f"ORDER MISMATCH order={order} max_rows={max_rows} engine={engine}")
+
+    for source in COMBO_SOURCES:
+        for zodiac in ZODIAC_OPTIONS:
+            for mode in FILTER_MODES:
+                run = {
+                    engine: (lambda e=engine: generate_result_set(
+                        db, by_strokes, patterns, zodiac, mode, engine=e, combo_source=source, catalog=catalog, pool=pool))
+                    for engine in engines
+                }
+                results = {engine: columns(fn()) for engine, fn in run.items()}
+                for engine, got in results.items():
+                    if got != results["python"]:
+                        sys.exit(f"MISMATCH source={source} zodiac={zodiac} mode={mode} engine={engine}")
+                timings = "  ".join(f"{e} {best_of(args.repeat, fn) * 1000:7.1f} ms" for e, fn in run.items())
+                print(f"{source:<9} {zodiac:<8} {mode:<14} {len(results['python'][0]):>7} names  {timings}")
+
+    print("OK: engines produce identical result sets")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Hot reload vs cold load of an edited workbook: equivalence check + timing.
+
+    python benchmarks/bench_hot_reload.py [--seed 0]
+
+Works on a copy of the workbook in a temporary directory (which also
+holds the snapshot and result caches). A set of queries is served, then
+the copy is edited one step at a time: a meaning, a pinyin, a zodiac
+cell, a stroke count, an added row, a deleted row. After each edit the
+watcher's reloaded DB must equal a cold load of the file, and every
+served query must return exactly what a fresh generation returns,
+whether its cached result set was carried over or regenerated. Meaning
+and pinyin edits must carry every result set. The script exits non-zero
+on the first mismatch.
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openpyxl import load_workbook  # noqa: E402
+
+from config import EXCEL_PATH, REQUESTED_COMBOS  # noqa: E402
+from hot_reload import RECORD_FIELDS, WorkbookWatcher  # noqa: E402
+from logic import (  # noqa: E402
+    generate_result_set, load_db_handle, persistent_result_set, served_queries, warmup_queries,
+)
+
+COLUMNS = ("second", "third", "pattern", "destiny", "zodiac")
+
+
+def content(handle):
+    """The DB as plain values (record identity and snapshot/parse origin don't matter)."""
+    key = lambda c: tuple(c[f] for f in RECORD_FIELDS)  # noqa: E731
+    return (
+        [key(c) for c in handle.db],
+        {s: [key(c) for c in bucket] for s, bucket in handle.by_strokes.items() if bucket},
+        {ch: key(c) for ch, c in handle.by_char.items()},
+    )
+
+
+def candidates(rs, handle):
+    """Candidates as characters, so result sets over different db lists compare."""
+    db = handle.db
+    return [(db[a]["char"], db[b]["char"], p, d, z)
+            for a, b, p, d, z in zip(*(getattr(rs, c) for c in COLUMNS))]
+
+
+def edit(path, rng, step):
+    wb = load_workbook(path)
+    ws = wb.active
+    rows = [r for r in range(2, ws.max_row + 1) if isinstance(ws.cell(r, 3).value, (int, float))]
+    r = rng.choice(rows)
+    if step == "meaning":
+        ws.cell(r, 6).value = f"{ws.cell(r, 6).value or ''} (revised)"
+    elif step == "pinyin":
+        ws.cell(r, 2).value = f"{ws.cell(r, 2).value}n"
+    elif step == "zodiac cell":
+        cells = [ws.cell(k, 5).value for k in rows if ws.cell(k, 5).value]
+        ws.cell(r, 5).value = rng.choice(cells) if not ws.cell(r, 5).value else None
+    elif step == "strokes":
+        ws.cell(r, 3).value = int(ws.cell(r, 3).value) + 1
+    elif step == "add row":
+        ws.append(["龘", "dá", 48, "火", "", "added row", "新增"])
+    elif step == "delete row":
+        ws.delete_rows(r)
+    wb.save(path)
+    return ws.cell(r, 1).value if step != "add row" else "龘"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--excel", default=EXCEL_PATH)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    source = os.path.abspath(args.excel)
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # snapshot + result cache paths in config are relative
+        path = os.path.join(tmp, os.path.basename(source))
+        shutil.copyfile(source, path)
+        watcher = WorkbookWatcher(path, interval=None)
+
+        queries = [
+            (tuple(REQUESTED_COMBOS), zodiac, mode, max_rows, None, combo_source)
+            for zodiac, mode in warmup_queries() for max_rows in (500, None) for combo_source in ("solver", "requested")
+        ]
+        for q in queries:
+            persistent_result_set(watcher.handle, q[0], q[1], q[2], q[3], surname=q[4], combo_source=q[5])
+        print(f"{len(watcher.handle.db)} characters · {len(queries)} queries served")
+
+        for step in ("meaning", "pinyin", "zodiac cell", "strokes", "add row", "delete row"):
+            char = edit(path, rng, step)
+            os.utime(path, ns=(time.time_ns(), time.time_ns() + 1))  # same-second saves still change the stamp
+
+            t0 = time.perf_counter()
+            cold = load_db_handle(path, snapshot_dir=None)
+            cold_s = time.perf_counter() - t0
+            if not watcher.poll():
+                sys.exit(f"MISMATCH: {step} edit was not picked up")
+            handle, info = watcher.handle, watcher.last_reload
+
+            if content(handle) != content(cold) or handle.fingerprint != cold.fingerprint:
+                sys.exit(f"MISMATCH: reloaded DB differs from a cold load after the {step} edit")
+            if step in ("meaning", "pinyin") and info["dropped"]:
+                sys.exit(f"MISMATCH: a {step} edit dropped {info['dropped']} result sets")
+
+            t0 = time.perf_counter()
+            for q in queries:
+                rs = persistent_result_set(handle, q[0], q[1], q[2], q[3], surname=q[4], combo_source=q[5])
+                fresh = generate_result_set(cold.db, cold.by_strokes, list(q[0]), q[1], q[2], q[3], surname=q[4],
+                                            combo_source=q[5])
+                if candidates(rs, handle) != candidates(fresh, cold):
+                    sys.exit(f"MISMATCH: {step} edit, query {q[1:]}")
+            serve_s = time.perf_counter() - t0
+            if len(served_queries(handle.fingerprint)) != len(queries):
+                sys.exit("MISMATCH: served queries were not recorded for the new DB")
+
+            print(f"{step:<12} {char!s:<3} buckets {info['changed_strokes']!s:<10} affecting results "
+                  f"{info['generation_strokes']!s:<10} | cold load {cold_s * 1000:6.1f} ms  hot reload "
+                  f"{info['seconds'] * 1000:6.1f} ms + carry {info['carry_seconds'] * 1000:5.1f} ms | "
+                  f"kept {info['carried']:>2}  regenerated {info['dropped']:>2} ({serve_s * 1000:.0f} ms to serve all + check)")
+        os.chdir(os.path.dirname(source))
+
+    print("OK: hot reloads match cold loads and fresh generation")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Scaling of the process-pool engine with the worker count.
+
+    python benchmarks/bench_parallel.py [--workers 1,2,4,8] [--replicate 4] [--repeat 3]
+
+Runs one large query (all 125 patterns by default) serially and on
+pools of each size, checks every result set is identical to the serial
+one, and prints the speedup. --replicate N copies each workbook row N
+times under distinct names to grow the catalog (the product grows ~N^2).
+Pool start-up (spawn + shipping the DB to each worker) is timed
+separately: pools are long-lived, so queries do not pay it.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import EXCEL_PATH, REQUESTED_COMBOS  # noqa: E402
+from engine_parallel import generate_result_set_parallel, open_pool  # noqa: E402
+from logic import ALL_PATTERNS, display_key, generate_result_set, load_db_raw  # noqa: E402
+
+COLUMNS = ("second", "third", "pattern", "destiny", "zodiac")
+
+
+def columns(rs):
+    return tuple(tuple(getattr(rs, c)) for c in COLUMNS)
+
+
+def replicate(db, n):
+    """db repeated n times (copy k > 0 gets a suffixed char) with matching display-sorted buckets."""
+    out = [c if k == 0 else dict(c, char=f"{c['char']}{k}") for k in range(n) for c in db]
+    by_strokes = {}
+    for c in out:
+        by_strokes.setdefault(c["strokes"], []).append(c)
+    for bucket in by_strokes.values():
+        bucket.sort(key=display_key)
+    return out, by_strokes
+
+
+def best_of(repeat, fn):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--excel", default=EXCEL_PATH)
+    ap.add_argument("--workers", default=None, help="comma-separated pool sizes (default: 1, 2, 4, ... up to the CPU count)")
+    ap.add_argument("--replicate", type=int, default=2)
+    ap.add_argument("--patterns", default="all", help="'all' or 'requested'")
+    ap.add_argument("--zodiac", default="Horse")
+    ap.add_argument("--filter", default="EXCLUDE_XIONG", dest="filter_mode")
+    ap.add_argument("--order", default="display", choices=["display", "generation"])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    if args.workers:
+        sizes = [int(w) for w in args.workers.split(",")]
+    else:
+        cpus = os.cpu_count() or 1
+        sizes = sorted({min(2 ** k, cpus) for k in range(cpus.bit_length() + 1)})
+
+    db, by_strokes, _ = load_db_raw(args.excel)
+    db, by_strokes = replicate(db, args.replicate)
+    patterns = list(ALL_PATTERNS) if args.patterns == "all" else list(REQUESTED_COMBOS)
+    query = dict(zodiac_name=args.zodiac, zodiac_filter_mode=args.filter_mode, order=args.order)
+    print(f"{len(db)} characters · {len(patterns)} patterns · {args.zodiac}/{args.filter_mode} · {args.order} order · "
+          f"{os.cpu_count()} CPUs")
+
+    serial, expected = best_of(args.repeat, lambda: generate_result_set(db, by_strokes, patterns, **query))
+    expected = columns(expected)
+    print(f"serial      {serial * 1000:8.1f} ms  {len(expected[0]):>9,} names")
+
+    for workers in sizes:
+        t0 = time.perf_counter()
+        pool = open_pool(db, by_strokes, workers)
+        list(pool.map(time.sleep, [0.05] * workers))  # keeps every worker busy once, so all of them start
+        startup = time.perf_counter() - t0
+        try:
+            elapsed, rs = best_of(args.repeat, lambda: generate_result_set_parallel(
+                db, by_strokes, patterns, pool=pool, workers=workers, **query))
+        finally:
+            pool.shutdown()
+        if columns(rs) != expected:
+            sys.exit(f"MISMATCH with {workers} workers")
+        print(f"{workers:>2} workers  {elapsed * 1000:8.1f} ms  speedup {serial / elapsed:5.2f}x  "
+              f"(pool start-up {startup * 1000:.0f} ms)")
+
+    print("OK: parallel result sets match the serial engine")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+PDF export: line breaking and full report rendering.
+
+    python benchmarks/bench_pdf.py [--favorites 50,300,1000] [--lang Both] [--workers 4]
+
+Every wrapped line must fit its width (unless it is a single glyph) and
+no line may start with closing punctuation; the script exits non-zero
+otherwise. The largest size is also exported to disk with export_pdf,
+serially and with --workers processes (the parallel path needs pypdf),
+then exported again: every block must come from the cache the first
+export filled, and both reports must have identical pages.
+Incremental re-export: a cold export, the same export again, and one with
+--grow extra names appended, reporting block cache hits and misses; the
+warm report must match the cold one page for page (checked with pypdf).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DESTINY_MEANINGS, EXCEL_PATH, REQUESTED_COMBOS  # noqa: E402
+from logic import generate_result_set, load_db_handle, result_rows  # noqa: E402
+from pdf_export import (  # noqa: E402
+    _NO_LINE_START, _glyph, block_cache_stats, break_lines, clear_block_cache, export_pdf, generate_pdf,
+)
+
+WIDTHS = (120, 300, 455)
+
+
+def check_breaks(texts):
+    lines = 0
+    t0 = time.perf_counter()
+    for width in WIDTHS:
+        for text in texts:
+            for ln in break_lines(text, width):
+                lines += 1
+                if len(ln) > 1 and sum(_glyph(ch, "Helvetica")[1] * 10 for ch in ln) > width + 1e-6:
+                    sys.exit(f"OVERFLOW at width {width}: {ln!r}")
+                if ln[:1] in _NO_LINE_START:
+                    sys.exit(f"LINE STARTS WITH PUNCTUATION: {ln!r}")
+    return lines, time.perf_counter() - t0
+
+
+def page_streams(pdf: bytes):
+    """Decoded content stream of every page (None without pypdf: the check is skipped)."""
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return None
+    return [page.get_contents().get_data() for page in PdfReader(BytesIO(pdf)).pages]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--excel", default=EXCEL_PATH)
+    ap.add_argument("--favorites", default="50,300,1000")
+    ap.add_argument("--lang", default="Both", choices=["English", "Chinese", "Both"])
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--grow", type=int, default=10, help="names appended for the incremental re-export")
+    args = ap.parse_args()
+
+    handle = load_db_handle(args.excel)
+    texts = [c.get(k) or "" for c in handle.db for k in ("meaning_en", "meaning_zh")]
+    texts += [m[k] for m in DESTINY_MEANINGS.values() for k in ("en", "zh")]
+    lines, elapsed = check_breaks(texts)
+    print(f"break_lines: {len(texts) * len(WIDTHS)} texts -> {lines} lines in {elapsed * 1000:.1f} ms")
+
+    sizes = [int(n) for n in args.favorites.split(",")]
+    rs = generate_result_set(handle.db, handle.by_strokes, list(REQUESTED_COMBOS), max_rows=max(sizes) + args.grow)
+    rows = result_rows(rs, handle.db, handle.by_char, list(range(len(rs))))
+    grown, rows = rows, rows[:max(sizes)]
+    for n in sizes:
+        clear_block_cache()
+        t0 = time.perf_counter()
+        pdf = generate_pdf(rows[:n], lang_mode=args.lang).getvalue()
+        elapsed = time.perf_counter() - t0
+        print(f"{min(n, len(rows)):>5} favorites  {elapsed * 1000:8.1f} ms  {len(pdf) / 1024:8.0f} KiB")
+
+    clear_block_cache()
+    reports = []
+    for label, favorites in (("cold", rows), ("warm", rows), (f"+{len(grown) - len(rows)} names", grown)):
+        before = block_cache_stats()
+        t0 = time.perf_counter()
+        reports.append(generate_pdf(favorites, lang_mode=args.lang).getvalue())
+        elapsed = time.perf_counter() - t0
+        after = block_cache_stats()
+        print(f"incremental {label:>10}: {elapsed * 1000:8.1f} ms  {after['hits'] - before['hits']:>5} cached  "
+              f"{after['misses'] - before['misses']:>5} laid out")
+    if page_streams(reports[0]) != page_streams(reports[1]):
+        sys.exit("MISMATCH between the cold and the warm report")
+
+    exports = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in sorted({1, args.workers}):
+            clear_block_cache()
+            path = os.path.join(tmp, f"report{workers}.pdf")
+            t0 = time.perf_counter()
+            pages = export_pdf(rows, path, lang_mode=args.lang, workers=workers)
+            elapsed = time.perf_counter() - t0
+            exports[workers] = page_streams(Path(path).read_bytes())
+            before = block_cache_stats()
+            t0 = time.perf_counter()
+            export_pdf(rows, path, lang_mode=args.lang, workers=workers)
+            again = time.perf_counter() - t0
+            print(f"export_pdf {len(rows)} names, {workers} worker(s): {elapsed * 1000:8.1f} ms  {pages} pages  "
+                  f"{os.path.getsize(path) / 1024:.0f} KiB  (again: {again * 1000:.1f} ms)")
+            if block_cache_stats()["misses"] != before["misses"]:
+                sys.exit(f"MISMATCH: the {workers}-worker export left blocks out of the block cache")
+    if len({repr(pages) for pages in exports.values()}) > 1:
+        sys.exit("MISMATCH: the parallel report's pages differ from the serial one")
+
+    print("OK: every line fits and follows the punctuation rules")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Memory per candidate: list of make_row() dicts vs columnar ResultSet.
+
+    python benchmarks/bench_result_store.py [--zodiac Horse] [--mode OFF]
+
+Reports retained heap (tracemalloc) and the pickled size that
+st.cache_data stores/copies on every cache hit.
+"""
+import argparse
+import os
+import pickle
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import EXCEL_PATH, REQUESTED_COMBOS  # noqa: E402
+from logic import generate_result_set, generate_rows, load_db_raw  # noqa: E402
+
+
+def measure(label, fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    pickled = len(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+    n = max(1, len(result))
+    print(
+        f"{label:<12} {len(result):>7} names  {elapsed * 1000:8.1f} ms  "
+        f"heap {retained / n:9.1f} B/name  pickle {pickled / n:9.1f} B/name"
+    )
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--excel", default=EXCEL_PATH)
+    ap.add_argument("--zodiac", default="None")
+    ap.add_argument("--mode", default="OFF")
+    args = ap.parse_args()
+
+    db, by_strokes, by_char = load_db_raw(args.excel)
+    patterns = list(REQUESTED_COMBOS)
+
+    rows = measure("dict rows", lambda: generate_rows(by_strokes, by_char, patterns, args.zodiac, args.mode))
+    rs = measure("ResultSet", lambda: generate_result_set(db, by_strokes, patterns, args.zodiac, args.mode))
+    assert len(rows) == len(rs)
+    print(f"ResultSet array payload: {rs.nbytes() / max(1, len(rs)):.1f} B/name")
+
+
+if __name__ == "__main__":
+    main()
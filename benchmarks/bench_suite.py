@@ -0,0 +1,225 @@
+"""
+Stage timings and peak memory on synthetic character catalogs, saved as JSON.
+
+    python benchmarks/bench_suite.py [--sizes 1000,10000,100000] [--out bench.json]
+    python benchmarks/bench_suite.py --sizes 1000,10000 --out new.json --compare old.json
+
+Each catalog is sampled from the real workbook: every synthetic character
+copies a random row (pinyin, strokes, element, zodiac cell, meanings), so
+stroke buckets and zodiac cells keep their real distribution; only the
+characters are new (CJK codepoints in order, suffixed once they run out).
+The catalog is written to a temporary .xlsx and loaded like the real one.
+
+Per catalog: workbook parse, snapshot load, raw check_zodiac_tokens over
+every cell vs the precompiled index, and generate_pdf on --pdf-rows names.
+Per --settings entry (patterns:zodiac:filter mode): generate_rows, the
+ResultSet engine in display and generation order, and the app's steps
+(DataFrame, dedupe, search index build, search). Generation is capped at
+--max-rows, as in the app.
+
+Times are the best of --repeat runs; peak memory is the tracemalloc peak
+of one extra run (--no-memory skips it). With --compare, every stage is
+matched against an earlier JSON file and the script exits non-zero if one
+got slower than --threshold times the old time.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openpyxl import Workbook  # noqa: E402
+
+from config import EXCEL_PATH, REQUESTED_COMBOS  # noqa: E402
+from logic import (  # noqa: E402
+    ALL_PATTERNS, generate_result_set, generate_rows, load_db_raw, result_frame, result_rows,
+)
+from pdf_export import clear_block_cache, generate_pdf  # noqa: E402
+from rules.zodiac_rules import ZODIAC_ORDER, build_zodiac_index, check_zodiac_tokens  # noqa: E402
+from search_index import SearchIndex, strip_tones  # noqa: E402
+
+# CJK Unified Ideographs, Extension A, Extensions B-F
+CJK_RANGES = ((0x4E00, 0xA000), (0x3400, 0x4DC0), (0x20000, 0x2A6E0), (0x2A700, 0x2EBE1))
+DEDUPE = ["Name", "Pinyin", "PatternComputed", "DestinyTotal"]
+NOISE_FLOOR = 0.001  # seconds; faster stages are too noisy to flag
+
+
+def synthetic_chars():
+    for k in range(10 ** 6):
+        for lo, hi in CJK_RANGES:
+            for cp in range(lo, hi):
+                yield chr(cp) if k == 0 else f"{chr(cp)}{k}"
+
+
+def synthetic_catalog(templates, size, seed):
+    rng = random.Random(seed)
+    keys = ("pinyin", "strokes", "element", "zodiac_cell", "meaning_en", "meaning_zh")
+    return [
+        [ch] + [t[k] for k in keys]
+        for ch, t in zip(synthetic_chars(), (rng.choice(templates) for _ in range(size)))
+    ]
+
+
+def write_xlsx(rows, path):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+
+
+def measure(fn, repeat, memory):
+    """(best seconds, tracemalloc peak bytes or None, last result)."""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        result = None  # let the previous result go before the next run
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return best, peak, result
+
+
+def parse_settings(text):
+    settings = []
+    for item in text.split(","):
+        patterns, zodiac, mode = item.split(":")
+        settings.append((patterns, zodiac, mode))
+    return settings
+
+
+def run_catalog(templates, size, settings, args, tmp):
+    records = []
+
+    def stage(setting, name, fn, items=None):
+        seconds, peak, result = measure(fn, args.repeat, args.memory)
+        n = items(result) if items else None
+        records.append({"catalog": size, "setting": setting, "stage": name,
+                        "seconds": seconds, "peak_bytes": peak, "items": n})
+        mem = f"{peak / 2 ** 20:9.1f} MiB" if peak is not None else ""
+        print(f"  {setting:<32} {name:<22} {seconds * 1000:10.1f} ms {mem}"
+              + (f"  {n:>9,} items" if n is not None else ""))
+        return result
+
+    rows = synthetic_catalog(templates, size, args.seed)
+    path = os.path.join(tmp, f"catalog{size}.xlsx")
+    t0 = time.perf_counter()
+    write_xlsx(rows, path)
+    print(f"{size:,} characters ({os.path.getsize(path) / 2 ** 20:.1f} MiB xlsx, written in "
+          f"{time.perf_counter() - t0:.1f} s)")
+
+    snapshots = os.path.join(tmp, f"snapshots{size}")
+    db, by_strokes, by_char = stage("catalog", "load_xlsx", lambda: load_db_raw(path, snapshot_dir=None),
+                                    lambda r: len(r[0]))
+    load_db_raw(path, snapshot_dir=snapshots)  # writes the snapshot
+    stage("catalog", "load_snapshot", lambda: load_db_raw(path, snapshot_dir=snapshots), lambda r: len(r[0]))
+    cells = [c["zodiac_cell"] for c in db]
+    stage("catalog", "check_zodiac_tokens", lambda: [check_zodiac_tokens(z, cell) for z in ZODIAC_ORDER for cell in cells],
+          len)
+    stage("catalog", "build_zodiac_index", lambda: build_zodiac_index(db))
+
+    for patterns, zodiac, mode in settings:
+        setting = f"{patterns}:{zodiac}:{mode}"
+        selected = list(ALL_PATTERNS) if patterns == "all" else list(REQUESTED_COMBOS)
+        query = (selected, zodiac, mode, args.max_rows)
+        stage(setting, "generate_rows", lambda: generate_rows(by_strokes, by_char, *query), len)
+        stage(setting, "result_set_generation", lambda: generate_result_set(db, by_strokes, *query, order="generation"),
+              len)
+        rs = stage(setting, "result_set_display", lambda: generate_result_set(db, by_strokes, *query), len)
+        df = stage(setting, "frame", lambda: result_frame(rs, db), len)
+        stage(setting, "dedupe", lambda: df.drop_duplicates(subset=DEDUPE).reset_index(drop=True), len)
+        index = stage(setting, "search_index", lambda: SearchIndex(rs, db), lambda r: r.size)
+        term = strip_tones(db[rs.second[len(rs) // 2]]["pinyin"]) if len(rs) else "hong"
+        stage(setting, "search", lambda: index.search(term), lambda r: len(r or ()))
+
+    rs = generate_result_set(db, by_strokes, list(REQUESTED_COMBOS), max_rows=args.pdf_rows)
+    favorites = result_rows(rs, db, by_char, list(range(len(rs))))
+
+    def pdf():
+        clear_block_cache()  # time the full layout, not the cache
+        return generate_pdf(favorites).getbuffer().nbytes
+
+    stage("catalog", "generate_pdf", pdf, lambda _: len(favorites))
+    return records
+
+
+def compare(records, baseline_path, threshold):
+    with open(baseline_path, encoding="utf-8") as fh:
+        old = {(r["catalog"], r["setting"], r["stage"]): r for r in json.load(fh)["records"]}
+    regressions = []
+    print(f"\nvs {baseline_path}:")
+    for r in records:
+        base = old.get((r["catalog"], r["setting"], r["stage"]))
+        if base is None:
+            continue
+        ratio = r["seconds"] / max(base["seconds"], 1e-9)
+        mem = ""
+        if r["peak_bytes"] is not None and base.get("peak_bytes"):
+            mem = f"  memory {r['peak_bytes'] / base['peak_bytes']:5.2f}x"
+        slow = ratio > threshold and max(r["seconds"], base["seconds"]) >= NOISE_FLOOR
+        print(f"  {r['catalog']:>7,} {r['setting']:<32} {r['stage']:<22} time {ratio:5.2f}x{mem}"
+              + ("  <-- REGRESSION" if slow else ""))
+        if slow:
+            regressions.append(f"{r['catalog']} {r['setting']} {r['stage']} {ratio:.2f}x")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--excel", default=EXCEL_PATH, help="workbook the synthetic rows are sampled from")
+    ap.add_argument("--sizes", default="1000,10000,100000")
+    ap.add_argument("--settings", default="requested:None:OFF,requested:Horse:EXCLUDE_XIONG,"
+                                          "requested:Horse:REQUIRE_JI,all:All:OFF",
+                    help="comma-separated patterns:zodiac:filter (patterns = requested | all)")
+    ap.add_argument("--max-rows", type=int, default=20000)
+    ap.add_argument("--pdf-rows", type=int, default=50)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--no-memory", dest="memory", action="store_false")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default=None, help="write the results as JSON")
+    ap.add_argument("--compare", default=None, help="earlier JSON results to check for regressions")
+    ap.add_argument("--threshold", type=float, default=1.25)
+    args = ap.parse_args()
+
+    templates, _, _ = load_db_raw(args.excel)
+    settings = parse_settings(args.settings)
+    records = []
+    t0 = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(n) for n in args.sizes.split(",")):
+            records += run_catalog(templates, size, settings, args, tmp)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": vars(args),
+        "seconds": time.perf_counter() - t0,
+        "records": records,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=1)
+        print(f"wrote {len(records)} records to {args.out}")
+
+    if args.compare:
+        regressions = compare(records, args.compare, args.threshold)
+        if regressions:
+            sys.exit("REGRESSION: " + "; ".join(regressions))
+        print(f"OK: no stage slower than {args.threshold}x")
+
+
+if __name__ == "__main__":
+    main()
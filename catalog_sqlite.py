@@ -0,0 +1,195 @@
+import os
+import sqlite3
+import time
+from typing import Iterable, Iterator, Optional, Sequence, Tuple
+
+from rules.zodiac_rules import ZODIAC_ORDER, compile_zodiac_cell, zodiac_code
+
+# ============================================================
+# SQLITE CATALOG (optional backend)
+# The character DB as one SQLite file: a row per loaded workbook row
+# (id = position in the loaded db list, so ResultSet indexes work
+# unchanged) with its per-zodiac status precomputed into z_<zodiac>
+# columns. Indexes on (strokes, char, id), (strokes, z_<zodiac>) and
+# element let a whole (pattern, s2, s3) query run as one indexed join
+# that already drops filtered characters; several processes can read
+# the same file. Keyed by the workbook fingerprint like db_snapshot.
+# Opening a catalog touches it; importing one removes the catalogs no
+# process has opened for a while (another process may still be serving
+# an older workbook, e.g. the API server next to a hot-reloaded app).
+# The catalog is built from the loaded DB, which stays resident (rows,
+# search and the other engines read the in-memory records): it speeds
+# up and shares the join, it does not reduce the process's memory.
+# ============================================================
+CATALOG_VERSION = "1"
+
+_TEXT_FIELDS = ("char", "pinyin", "element", "zodiac_cell", "meaning_en", "meaning_zh")
+
+
+def zodiac_column(zodiac_name: str) -> str:
+    return "z_" + zodiac_name.lower()
+
+
+def catalog_path(fingerprint: str, catalog_dir: str) -> str:
+    return os.path.join(catalog_dir, f"catalog.{fingerprint[:16]}.sqlite")
+
+
+def import_catalog(rows: Iterable[dict], path: str, fingerprint: str) -> int:
+    """Write a catalog from character records (a loaded db list). Atomic; returns the row count."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+
+    z_cols = [zodiac_column(z) for z in ZODIAC_ORDER]
+    conn = sqlite3.connect(tmp)
+    try:
+        with conn:
+            conn.execute(
+                "CREATE TABLE chars (id INTEGER PRIMARY KEY, strokes INTEGER NOT NULL, zodiac_mask INTEGER NOT NULL, "
+                + ", ".join(f"{f} TEXT NOT NULL" for f in _TEXT_FIELDS) + ", "
+                + ", ".join(f"{c} INTEGER NOT NULL" for c in z_cols) + ")"
+            )
+            conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+            compiled = {}
+            placeholders = ", ".join("?" * (3 + len(_TEXT_FIELDS) + len(z_cols)))
+
+            def records():
+                for i, c in enumerate(rows):
+                    cell = c.get("zodiac_cell", "") or ""
+                    if cell not in compiled:
+                        compiled[cell] = compile_zodiac_cell(cell)[1]
+                    mask = compiled[cell]
+                    yield (
+                        (i, int(c["strokes"]), mask)
+                        + tuple("" if c.get(f) is None else str(c[f]) for f in _TEXT_FIELDS)
+                        + tuple(zodiac_code(mask, z) for z in ZODIAC_ORDER)
+                    )
+
+            conn.executemany(f"INSERT INTO chars VALUES ({placeholders})", records())
+            conn.execute("CREATE INDEX chars_strokes ON chars (strokes, char, id)")
+            conn.execute("CREATE INDEX chars_element ON chars (element)")
+            for col in z_cols:
+                conn.execute(f"CREATE INDEX chars_strokes_{col} ON chars (strokes, {col}, char, id)")
+            conn.executemany(
+                "INSERT INTO meta VALUES (?, ?)",
+                [("fingerprint", fingerprint), ("version", CATALOG_VERSION)],
+            )
+            n = conn.execute("SELECT COUNT(*) FROM chars").fetchone()[0]
+    finally:
+        conn.close()
+    os.replace(tmp, path)  # atomic: concurrent processes never open a half-built catalog
+    return n
+
+
+def remove_stale_catalogs(keep_path: str, catalog_dir: str, min_age: float) -> None:
+    """
+    Delete the other catalogs in catalog_dir (one is left behind per workbook
+    edit or hot reload) that nobody opened in the last min_age seconds.
+    """
+    try:
+        names = os.listdir(catalog_dir)
+    except OSError:
+        return
+    cutoff = time.time() - min_age
+    for name in names:
+        full = os.path.join(catalog_dir, name)
+        if name.startswith("catalog.") and name.endswith(".sqlite") and full != keep_path:
+            try:
+                if os.path.getmtime(full) < cutoff:
+                    os.remove(full)  # open read-only connections keep working on POSIX
+            except OSError:
+                pass
+
+
+def open_catalog(path: str, fingerprint: str) -> Optional[sqlite3.Connection]:
+    """Read-only connection, or None if the file is missing, stale or from another version."""
+    if not os.path.exists(path):
+        return None
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        meta = dict(conn.execute("SELECT key, value FROM meta"))
+    except sqlite3.Error:
+        return None
+    if meta.get("fingerprint") != fingerprint or meta.get("version") != CATALOG_VERSION:
+        conn.close()
+        return None
+    try:
+        os.utime(path)  # in use: keeps remove_stale_catalogs away from it
+    except OSError:
+        pass
+    return conn
+
+
+def stroke_values(conn: sqlite3.Connection) -> Tuple[int, ...]:
+    return tuple(s for (s,) in conn.execute("SELECT DISTINCT strokes FROM chars ORDER BY strokes"))
+
+
+def _passes_sql(col: Optional[str], zodiac_filter_mode: str) -> str:
+    # col None = rule set without a column: every status is neutral (0)
+    expr = col or "0"
+    if zodiac_filter_mode == "REQUIRE_JI":
+        return f"{expr} = 1"
+    if zodiac_filter_mode == "EXCLUDE_XIONG":
+        return f"{expr} != 2"
+    return "1"
+
+
+def _pair_filter_sql(zodiac_name: str, zodiac_filter_mode: str, matrix_name: str) -> str:
+    """SQL twin of logic.pair_accepted over chars a (2nd) and b (3rd)."""
+    if zodiac_name == "None" or zodiac_filter_mode == "OFF":
+        return "1"
+    if zodiac_name == matrix_name:
+        return " OR ".join(
+            f"({_passes_sql('a.' + zodiac_column(z), zodiac_filter_mode)} AND "
+            f"{_passes_sql('b.' + zodiac_column(z), zodiac_filter_mode)})"
+            for z in ZODIAC_ORDER
+        )
+    col = zodiac_column(zodiac_name) if zodiac_name in ZODIAC_ORDER else None
+    return (
+        f"{_passes_sql(col and 'a.' + col, zodiac_filter_mode)} AND "
+        f"{_passes_sql(col and 'b.' + col, zodiac_filter_mode)}"
+    )
+
+
+def query_pairs(
+    conn: sqlite3.Connection,
+    combos: Sequence[Tuple[int, int, int, int]],
+    zodiac_name: str,
+    zodiac_filter_mode: str,
+    matrix_name: str,
+    max_rows: Optional[int] = None,
+    order: str = "display",
+) -> Iterator[Tuple[int, int, int, int, int]]:
+    """
+    combos: (pattern id, s2, s3, destiny total) in generation order.
+    Yields (pattern id, 2nd id, 3rd id, destiny total, packed zodiac codes) in the
+    same order as logic.iter_pairs_display (order="display") or logic.iter_pairs.
+    """
+    conn.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS combos "
+        "(ord INTEGER PRIMARY KEY, p INTEGER, s2 INTEGER, s3 INTEGER, destiny INTEGER)"
+    )
+    conn.execute("DELETE FROM temp.combos")
+    conn.executemany("INSERT INTO temp.combos VALUES (?, ?, ?, ?, ?)", [(k,) + tuple(c) for k, c in enumerate(combos)])
+
+    if zodiac_name in ZODIAC_ORDER:
+        col = zodiac_column(zodiac_name)
+        codes = f"a.{col} | (b.{col} << 2)"
+    else:
+        codes = "0"
+    # buckets are (char, id)-sorted, so these reproduce the Python walk exactly
+    order_by = (
+        "a.char, b.char, k.ord, a.id, b.id" if order == "display"
+        else "k.ord, a.char, a.id, b.char, b.id"
+    )
+    sql = (
+        f"SELECT k.p, a.id, b.id, k.destiny, {codes} FROM temp.combos k "
+        "JOIN chars a ON a.strokes = k.s2 "
+        "JOIN chars b ON b.strokes = k.s3 "
+        f"WHERE {_pair_filter_sql(zodiac_name, zodiac_filter_mode, matrix_name)} "
+        f"ORDER BY {order_by} LIMIT ?"
+    )
+    yield from conn.execute(sql, (-1 if max_rows is None else max_rows,))
+
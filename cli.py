@@ -0,0 +1,223 @@
+"""
+Headless bulk export: every matching name, streamed to a file in chunks.
+
+    python cli.py out.csv
+    python cli.py out.jsonl --surname 陳 --zodiac Horse --filter EXCLUDE_XIONG
+    python cli.py out.parquet --surname 歐陽 --strokes 15,17 --pinyin "ōu yáng" --patterns all
+    python cli.py out.csv --patterns 木木木,木火土 --limit 100000 --chunk-size 5000
+    python cli.py out.csv --surnames 洪,陳,歐陽 --zodiac Horse --filter EXCLUDE_XIONG
+
+Memory stays bounded by --chunk-size: candidates are generated lazily
+(logic.iter_result_chunks) and each chunk is written and dropped. There
+is no row cap unless --limit is given. Duplicate rows are dropped in both
+orders. --surnames writes several preset surnames into one file in one
+batch (logic.generate_batch): surnames with the same stroke counts share
+one generation. Batch mode holds each stroke group's result set in
+memory, and --limit applies per surname. Parquet needs pyarrow.
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Iterator, List, Optional
+
+from config import COMBO_SOURCE, EXCEL_PATH, PATTERN_MEANINGS, SURNAMES, ZODIAC_OPTIONS
+from logic import (
+    ALL_PATTERNS, ZODIAC_FILTER_MODES, custom_surname, distinct_result_ids, generate_batch, iter_result_chunks,
+    load_db_raw, result_frame,
+)
+from result_store import ResultSet
+
+FORMATS = ("csv", "jsonl", "parquet")
+
+
+# ============================================================
+# ARGUMENTS
+# ============================================================
+def parse_surname(args) -> dict:
+    if args.strokes is None:
+        if args.surname not in SURNAMES:
+            sys.exit(f"Unknown surname preset {args.surname!r}; pass --strokes (and --pinyin) for a custom surname. "
+                     f"Presets: {', '.join(SURNAMES)}")
+        return SURNAMES[args.surname]
+    try:
+        return custom_surname(args.surname, args.pinyin or "", args.strokes)
+    except ValueError as exc:
+        sys.exit(str(exc))
+
+
+def parse_surnames(text: str) -> List[dict]:
+    names = [s.strip() for s in text.replace("，", ",").split(",") if s.strip()]
+    unknown = [s for s in names if s not in SURNAMES]
+    if unknown or not names:
+        sys.exit(f"Unknown surname preset(s): {', '.join(unknown) or '(none given)'}. Presets: {', '.join(SURNAMES)}")
+    return [SURNAMES[s] for s in dict.fromkeys(names)]
+
+
+def parse_patterns(text: str) -> List[str]:
+    if text == "all":
+        return list(ALL_PATTERNS)
+    patterns = list(dict.fromkeys(p.strip() for p in text.replace("，", ",").split(",") if p.strip()))
+    unknown = [p for p in patterns if p not in ALL_PATTERNS]
+    if unknown:
+        sys.exit(f"Unknown pattern(s): {', '.join(unknown)} (three of 木火土金水, or 'all')")
+    return patterns
+
+
+def at_least(minimum: int):
+    """argparse type: an int >= minimum."""
+    def parse(text: str) -> int:
+        try:
+            value = int(text)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid int value: {text!r}")
+        if value < minimum:
+            raise argparse.ArgumentTypeError(f"must be at least {minimum}, got {value}")
+        return value
+    return parse
+
+
+def output_format(path: str, fmt: Optional[str]) -> str:
+    if fmt:
+        return fmt
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    if ext in FORMATS:
+        return ext
+    sys.exit(f"Cannot infer the format from {path!r}; pass --format {{{','.join(FORMATS)}}}")
+
+
+# ============================================================
+# WRITERS
+# One object per format: write(frame) per chunk, then close().
+# ============================================================
+class CsvWriter:
+    def __init__(self, path: str):
+        self.fh = open(path, "w", encoding="utf-8-sig", newline="")
+        self.header = True
+
+    def write(self, frame) -> None:
+        frame.to_csv(self.fh, header=self.header, index=False)
+        self.header = False
+
+    def close(self) -> None:
+        self.fh.close()
+
+
+class JsonlWriter:
+    def __init__(self, path: str):
+        self.fh = open(path, "w", encoding="utf-8")
+
+    def write(self, frame) -> None:
+        frame.to_json(self.fh, orient="records", lines=True, force_ascii=False)
+
+    def close(self) -> None:
+        self.fh.close()
+
+
+class ParquetWriter:
+    def __init__(self, path: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            sys.exit("Parquet output needs pyarrow (pip install pyarrow)")
+        self.pa, self.pq = pa, pq
+        self.path = path
+        self.writer = None
+
+    def write(self, frame) -> None:
+        table = self.pa.Table.from_pandas(frame, preserve_index=False)
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, table.schema)  # one row group per chunk
+        self.writer.write_table(table)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+
+WRITERS = {"csv": CsvWriter, "jsonl": JsonlWriter, "parquet": ParquetWriter}
+
+
+def batch_chunks(db, by_strokes, surnames, patterns, args) -> Iterator[ResultSet]:
+    """generate_batch over every surname; each one's distinct rows, cut to --limit, in --chunk-size pieces."""
+    batch = generate_batch(
+        db, by_strokes, surnames, patterns, args.zodiac, args.filter_mode,
+        combo_source=args.combo_source, order=args.order,
+    )
+    for rs in batch.values():
+        ids = distinct_result_ids(rs, db)[:args.limit]
+        for i in range(0, len(ids), args.chunk_size):
+            yield rs.select(ids[i:i + args.chunk_size])
+
+
+def progress(written: int, started: float, done: bool = False) -> None:
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    line = f"{written:>10,} names · {elapsed:7.1f} s · {written / elapsed:>10,.0f} names/s"
+    print(("\r" + line) + ("\n" if done else ""), end="", file=sys.stderr, flush=True)
+
+
+# ============================================================
+# MAIN
+# ============================================================
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("output", help="output file (.csv, .jsonl or .parquet)")
+    ap.add_argument("--format", choices=FORMATS, help="default: from the output extension")
+    ap.add_argument("--excel", default=EXCEL_PATH)
+    ap.add_argument("--surname", default=next(iter(SURNAMES)), help="preset from config.SURNAMES, or custom with --strokes")
+    ap.add_argument("--strokes", help="custom surname strokes per character, e.g. 15,17")
+    ap.add_argument("--pinyin", help="custom surname pinyin, e.g. 'ōu yáng'")
+    ap.add_argument("--surnames", help="comma-separated presets, generated in one batch into one file (e.g. 洪,陳,歐陽)")
+    ap.add_argument("--patterns", default=",".join(PATTERN_MEANINGS), help="comma-separated, or 'all' for all 125")
+    ap.add_argument("--zodiac", default="None", choices=ZODIAC_OPTIONS)
+    ap.add_argument("--filter", default="OFF", choices=ZODIAC_FILTER_MODES, dest="filter_mode")
+    ap.add_argument("--combo-source", default=COMBO_SOURCE, choices=["solver", "requested"])
+    ap.add_argument("--order", default="display", choices=["display", "generation"],
+                    help="display = sorted by name (default); generation = stroke-pair order, slightly faster")
+    ap.add_argument("--limit", type=at_least(0), help="stop after this many names (default: all)")
+    ap.add_argument("--chunk-size", type=at_least(1), default=10000)
+    ap.add_argument("--quiet", action="store_true", help="no progress readout")
+    args = ap.parse_args(argv)
+
+    fmt = output_format(args.output, args.format)
+    if args.surnames and args.strokes is not None:
+        sys.exit("--surnames takes presets only; export a custom surname with --surname/--strokes on its own")
+    surnames = parse_surnames(args.surnames) if args.surnames else [parse_surname(args)]
+    surname = surnames[0]
+    patterns = parse_patterns(args.patterns)
+
+    db, by_strokes, _ = load_db_raw(args.excel)
+    if args.surnames:
+        chunks = batch_chunks(db, by_strokes, surnames, patterns, args)
+    else:
+        chunks = iter_result_chunks(
+            db, by_strokes, patterns, args.zodiac, args.filter_mode,
+            chunk_size=args.chunk_size,
+            max_rows=args.limit,
+            surname=surname,
+            combo_source=args.combo_source,
+            order=args.order,
+        )
+
+    started = time.perf_counter()
+    written = 0
+    writer = WRITERS[fmt](args.output)
+    try:
+        for rs in chunks:
+            writer.write(result_frame(rs, db).drop(columns="_rid"))
+            written += len(rs)
+            if not args.quiet:
+                progress(written, started)
+        if not written:
+            # still leave a valid file (CSV header / Parquet schema) for an empty result
+            writer.write(result_frame(ResultSet(patterns, args.zodiac, args.filter_mode, surname=surname), db).drop(columns="_rid"))
+    finally:
+        writer.close()
+    if not args.quiet:
+        progress(written, started, done=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
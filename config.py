@@ -1,5 +1,49 @@
 EXCEL_PATH = "Chinese Characters.xlsx"
 
+# compiled binary copies of the workbook (db_snapshot.py); None disables
+SNAPSHOT_DIR = ".db_cache"
+
+# hot reload (hot_reload.py): how often the app checks the workbook for edits, in seconds;
+# None = only when a page is rerun
+WORKBOOK_POLL_SECONDS = 2.0
+
+# SQLite character catalog for the "sqlite" generation engine (catalog_sqlite.py); None disables
+CATALOG_DIR = ".db_cache"
+# catalogs of other workbook versions are deleted once no process has opened them for this long
+CATALOG_STALE_SECONDS = 3600
+
+# persistent result cache shared by all server processes (result_cache.py); None disables
+RESULT_CACHE_PATH = ".db_cache/results.sqlite"
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# precompute the default query for every ZODIAC_OPTIONS x filter mode at app startup
+RESULT_CACHE_WARMUP = True
+
+# in-process app caches (logic.*_cached), entries per cached function, least recently used dropped first
+APP_RESULT_SETS = 32     # result sets and their search indexes
+APP_RESULT_PAGES = 256   # lazy-mode result pages and pruning counters (small)
+
+# process pool for the "parallel" generation engine (engine_parallel.py); None = one worker per CPU
+PARALLEL_WORKERS = None
+
+# large PDF reports (pdf_export.export_pdf): names per part rendered by each worker process;
+# None = one worker per CPU. Parts are merged with pypdf when it is installed, else rendered serially.
+PDF_CHUNK_SIZE = 100
+PDF_WORKERS = None
+# laid-out favorite blocks kept for incremental re-exports (pdf_export.favorite_block)
+PDF_BLOCK_CACHE_SIZE = 5000
+
+# per-run stage timings and pruning counters (diagnostics.py): one JSON log line per app run
+# on stderr at this level; None disables the log (the sidebar panel still works)
+DIAGNOSTICS_LOG_LEVEL = "INFO"
+
+# JSON API server (api_server.py)
+API_HOST = "127.0.0.1"
+API_PORT = 8765
+API_WORKERS = 4          # generation threads; slow queries queue here, not on the event loop
+API_RESULT_SETS = 32     # result sets (and their search indexes) kept in memory, LRU
+API_MAX_ROWS = 500       # default max_rows per query ("all" = uncapped)
+API_MAX_LIMIT = 1000     # rows returned per response
+
 FIRST_CHAR = {
     "char": "洪",
     "pinyin": "hóng",
@@ -7,6 +51,18 @@ FIRST_CHAR = {
     "strokes": 10
 }
 
+# Surname presets (FIRST_CHAR shape). Compound surnames (複姓) list one
+# stroke count per character; 天格 is then the sum of both, not +1.
+# Element is left blank where the workbook has no entry for the character.
+SURNAMES = {
+    "洪": FIRST_CHAR,
+    "陳": {"char": "陳", "pinyin": "chén", "element": "", "strokes": 16},
+    "林": {"char": "林", "pinyin": "lín", "element": "", "strokes": 8},
+    "黃": {"char": "黃", "pinyin": "huáng", "element": "", "strokes": 12},
+    "歐陽": {"char": "歐陽", "pinyin": "ōu yáng", "element": "", "strokes": [15, 17]},
+    "司馬": {"char": "司馬", "pinyin": "sī mǎ", "element": "", "strokes": [5, 10]},
+}
+
 DESTINY_MEANINGS = {
     16: {
         "zh": "（吉）能夠克己助人而敦厚雅量，安富會榮而福壽雙全。女性則能益夫興家而子孫榮昌，並且賢淑而理家有方。",
@@ -56,6 +112,11 @@ PATTERN_MEANINGS = {
     }
 }
 
+# Where generation gets its (s2, s3) stroke pairs (logic.combo_table):
+#   "solver"    = every pair in the DB's stroke range that fits the pattern
+#   "requested" = only the hand-picked REQUESTED_COMBOS below
+COMBO_SOURCE = "solver"
+
 REQUESTED_COMBOS = {
     "木木木": [(11, 10), (1, 20), (11, 20), (21, 10), (21, 21)],
     "木木土": [(21, 14), (1, 5), (11, 24), (11, 4), (21, 34), (31, 24)],
@@ -112,4 +173,7 @@ ZODIAC_RULES = {
     },
 }
 
-ZODIAC_OPTIONS = ["None", "Horse", "Monkey", "Chicken", "Pig"]
+# "All" = matrix mode: one generation pass evaluates every rule set in ZODIAC_RULES
+ZODIAC_MATRIX = "All"
+
+ZODIAC_OPTIONS = ["None", "Horse", "Monkey", "Chicken", "Pig", ZODIAC_MATRIX]
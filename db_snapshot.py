@@ -0,0 +1,240 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+# ============================================================
+# COMPILED DB SNAPSHOT
+# Binary copy of the parsed workbook so new processes skip openpyxl
+# entirely. Keyed by the SHA-256 of the workbook bytes: any edit to the
+# .xlsx produces a new snapshot. Reading maps the file only while it is
+# decoded: every process gets its own dicts (nothing stays mapped or
+# shared), and a truncated or garbled file is deleted so the next load
+# rewrites it.
+#
+# Layout (little-endian):
+#   header   : magic, version, workbook sha256, counts
+#   strings  : u32 offsets[n_strings + 1] + utf-8 blob (interned)
+#   columns  : strokes u16[n] ; element/char/pinyin/zodiac/en/zh u32[n]
+#   by_strokes: u32 (strokes, start, count)[n_buckets] + u32 order[n]
+#   by_char  : u32 (char string id, record id)[n_chars]
+#   meta     : utf-8 JSON (the load report recorded at parse time)
+# ============================================================
+SNAPSHOT_MAGIC = b"CNDB"
+SNAPSHOT_VERSION = 3
+
+_HEADER = struct.Struct("<4sHH32sIIIIII")
+_STRING_FIELDS = ("element", "char", "pinyin", "zodiac_cell", "meaning_en", "meaning_zh")
+# what decoding a damaged file raises (bad offsets, short sections, broken utf-8/JSON)
+_CORRUPT = (struct.error, ValueError, IndexError, TypeError, UnicodeDecodeError, BufferError)
+
+
+def workbook_fingerprint(excel_path: str) -> str:
+    h = hashlib.sha256()
+    with open(excel_path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def snapshot_path(excel_path: str, fingerprint: str, snapshot_dir: str) -> str:
+    base = os.path.basename(excel_path)
+    return os.path.join(snapshot_dir, f"{base}.{fingerprint[:16]}.cndb")
+
+
+def _aligned(buf: bytearray) -> None:
+    # keep every section 4-byte aligned so memoryview.cast works
+    buf.extend(b"\0" * (-len(buf) % 4))
+
+
+def write_snapshot(
+    path: str,
+    fingerprint: str,
+    db: List[dict],
+    by_strokes: Dict[int, List[dict]],
+    by_char: Dict[str, dict],
+    meta: Optional[Dict[str, Any]] = None,
+) -> None:
+    strings: List[str] = []
+    string_ids: Dict[str, int] = {}
+
+    def sid(value) -> int:
+        s = "" if value is None else str(value)
+        if s not in string_ids:
+            string_ids[s] = len(strings)
+            strings.append(s)
+        return string_ids[s]
+
+    n = len(db)
+    strokes_col = array("H", (c["strokes"] for c in db))
+    str_cols = {f: array("I", (sid(c[f]) for c in db)) for f in _STRING_FIELDS}
+
+    # by_strokes is stored in its in-memory bucket order (sorted for display, see logic.parse_workbook)
+    record_ids = {id(c): i for i, c in enumerate(db)}
+    bucket_table = array("I")
+    order = array("I")
+    for s in sorted(by_strokes):
+        bucket_table.extend((s, len(order), len(by_strokes[s])))
+        order.extend(record_ids[id(c)] for c in by_strokes[s])
+
+    char_table = array("I")
+    for ch, rec in by_char.items():
+        char_table.extend((sid(ch), record_ids[id(rec)]))
+
+    blob = bytearray()
+    offsets = array("I", [0])
+    for s in strings:
+        blob.extend(s.encode("utf-8"))
+        offsets.append(len(blob))
+
+    body = bytearray()
+    body.extend(offsets.tobytes())
+    body.extend(blob)
+    _aligned(body)
+    body.extend(strokes_col.tobytes())
+    _aligned(body)
+    for f in _STRING_FIELDS:
+        body.extend(str_cols[f].tobytes())
+    body.extend(bucket_table.tobytes())
+    body.extend(order.tobytes())
+    body.extend(char_table.tobytes())
+    meta_blob = json.dumps(meta or {}, ensure_ascii=False).encode("utf-8")
+    body.extend(meta_blob)
+
+    header = _HEADER.pack(
+        SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, bytes.fromhex(fingerprint),
+        n, len(strings), len(blob), len(by_strokes), len(by_char), len(meta_blob),
+    )
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(header)
+        fh.write(body)
+    os.replace(tmp, path)  # atomic: concurrent workers never see a half-written file
+
+
+def _decode(mm: mmap.mmap, n: int, n_strings: int, blob_len: int, n_buckets: int, n_chars: int, meta_len: int):
+    # every view of mm is released on the way out, also when decoding
+    # fails (a traceback keeps this frame alive), so the caller can close it
+    views: List[memoryview] = []
+    try:
+        return _decode_views(mm, views, n, n_strings, blob_len, n_buckets, n_chars, meta_len)
+    finally:
+        for v in reversed(views):
+            v.release()
+
+
+def _decode_views(mm, views, n, n_strings, blob_len, n_buckets, n_chars, meta_len):
+    def slice_(start: int, stop: int) -> memoryview:
+        if stop > len(mm):
+            raise ValueError("snapshot is truncated")
+        views.append(views[0][start:stop])
+        return views[-1]
+
+    views.append(memoryview(mm))
+    pos = _HEADER.size
+
+    def take(fmt: str, count: int) -> memoryview:
+        nonlocal pos
+        size = struct.calcsize(fmt) * count
+        views.append(slice_(pos, pos + size).cast(fmt))
+        pos += size
+        return views[-1]
+
+    offsets = take("I", n_strings + 1)
+    blob = slice_(pos, pos + blob_len)
+    pos += blob_len
+    pos += -pos % 4
+    strings = [
+        sys.intern(str(blob[offsets[i]:offsets[i + 1]], "utf-8"))
+        for i in range(n_strings)
+    ]
+    strokes_col = take("H", n)
+    pos += -pos % 4
+    str_cols = {f: take("I", n) for f in _STRING_FIELDS}
+    bucket_table = take("I", n_buckets * 3)
+    order = take("I", n)
+    char_table = take("I", n_chars * 2)
+    meta = json.loads(str(slice_(pos, pos + meta_len), "utf-8"))
+
+    db = [
+        {
+            "char": strings[str_cols["char"][i]],
+            "pinyin": strings[str_cols["pinyin"][i]],
+            "strokes": strokes_col[i],
+            "element": strings[str_cols["element"][i]],
+            "zodiac_cell": strings[str_cols["zodiac_cell"][i]],
+            "meaning_en": strings[str_cols["meaning_en"][i]],
+            "meaning_zh": strings[str_cols["meaning_zh"][i]],
+        }
+        for i in range(n)
+    ]
+
+    by_strokes = {}
+    for b in range(n_buckets):
+        s, start, count = bucket_table[3 * b:3 * b + 3]
+        by_strokes[s] = [db[order[k]] for k in range(start, start + count)]
+
+    by_char = {
+        strings[char_table[2 * k]]: db[char_table[2 * k + 1]]
+        for k in range(n_chars)
+    }
+    return db, by_strokes, by_char, meta
+
+
+def read_snapshot(path: str, fingerprint: str) -> Optional[Tuple[List[dict], dict, dict, dict]]:
+    """
+    Decode a snapshot into (db, by_strokes, by_char, meta); the file is
+    closed before returning. Returns None if the file is missing, stale
+    or from another format version, and deletes it if it is corrupt.
+    """
+    try:
+        fh = open(path, "rb")
+    except OSError:
+        return None
+
+    with fh:
+        try:
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            mm = None
+        if mm is not None:
+            try:
+                with mm:
+                    return _read_mapped(mm, fingerprint)
+            except _CORRUPT:
+                pass
+    try:
+        os.remove(path)  # the next load rewrites it from the workbook
+    except OSError:
+        pass
+    return None
+
+
+def _read_mapped(mm: mmap.mmap, fingerprint: str):
+    if len(mm) < _HEADER.size:
+        return None
+    magic, version, _, digest, *counts = _HEADER.unpack_from(mm, 0)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or digest.hex() != fingerprint:
+        return None
+    return _decode(mm, *counts)
+
+
+def remove_stale_snapshots(excel_path: str, keep_path: str, snapshot_dir: str) -> None:
+    prefix = os.path.basename(excel_path) + "."
+    try:
+        names = os.listdir(snapshot_dir)
+    except OSError:
+        return
+    for name in names:
+        full = os.path.join(snapshot_dir, name)
+        if name.startswith(prefix) and name.endswith(".cndb") and full != keep_path:
+            try:
+                os.remove(full)
+            except OSError:
+                pass
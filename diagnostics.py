@@ -0,0 +1,78 @@
+import json
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+# ============================================================
+# RUN DIAGNOSTICS
+# One Diagnostics per app run (or fragment rerun): wall time per stage,
+# in the order the stages finished, and counters. Stages may nest
+# ("cards" includes "card_rows", listed first) and a repeated stage adds up.
+# emit() writes the run as one JSON line on the "namegen.diagnostics"
+# logger, so runs can be aggregated with any log tooling (jq, a log
+# shipper); configure_logging() points that logger at stderr. Events
+# outside a run (a failed hot reload) go to the same logger via log_event.
+# ============================================================
+LOGGER = logging.getLogger("namegen.diagnostics")
+
+
+class Diagnostics:
+    __slots__ = ("stages", "counters", "emitted")
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}  # seconds
+        self.counters: Dict[str, int] = {}
+        self.emitted = False
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - t0
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def update(self, counters: Dict[str, int]) -> None:
+        for name, n in counters.items():
+            self.count(name, n)
+
+    def record(self, **context: Any) -> Dict[str, Any]:
+        return {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            **context,
+            "stages_ms": {name: round(s * 1000, 2) for name, s in self.stages.items()},
+            "counters": dict(self.counters),
+        }
+
+    def emit(self, **context: Any) -> Dict[str, Any]:
+        """Log the run as one JSON line (context first: run, query, ...); returns the record."""
+        record = self.record(**context)
+        LOGGER.info(json.dumps(record, ensure_ascii=False, default=str))
+        self.emitted = True
+        return record
+
+
+def log_event(event: str, level: int = logging.WARNING, **context: Any) -> Dict[str, Any]:
+    """Log one event as a JSON line in the same shape as a run record; returns the record."""
+    record = {"ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "event": event, **context}
+    LOGGER.log(level, json.dumps(record, ensure_ascii=False, default=str))
+    return record
+
+
+def configure_logging(level: Optional[str] = "INFO") -> None:
+    """Send diagnostics lines to stderr, bare (one JSON object per line); None turns them off. Idempotent."""
+    if level is None:
+        LOGGER.disabled = True
+        return
+    LOGGER.disabled = False
+    LOGGER.setLevel(level)
+    LOGGER.propagate = False
+    if not LOGGER.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        LOGGER.addHandler(handler)
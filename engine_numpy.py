@@ -0,0 +1,149 @@
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import COMBO_SOURCE, FIRST_CHAR, PATTERN_TOTAL_FILTERS, ZODIAC_MATRIX
+from logic import combo_table, display_key, stroke_to_element, surname_strokes
+from result_store import ResultSet
+from rules.zodiac_rules import STATUS_JI, STATUS_XIONG, ZODIAC_ORDER
+
+# ============================================================
+# NUMPY ENGINE
+# Vectorized twin of logic.iter_pairs: per logic.combo_table entry the
+# (second, third) product is a broadcast boolean mask instead of a
+# Python double loop. Produces the same candidates in the same order
+# (bucket order, row-major), so max_rows truncation matches too.
+# order="display" stable-sorts by the 2nd/3rd characters' dense ranks,
+# matching logic.iter_pairs_display's k-way merge.
+# Select it with logic.generate_result_set(..., engine="numpy").
+# ============================================================
+FRAME_COLUMNS = ["second", "third", "pattern", "destiny", "zodiac"]
+
+# element of a stroke count depends only on its last digit
+_ELEMENT_BY_DIGIT = np.array([stroke_to_element(d) for d in range(10)], dtype=object)
+
+
+def _elements(strokes: np.ndarray) -> np.ndarray:
+    return _ELEMENT_BY_DIGIT[strokes % 10]
+
+
+def _combo_mask(pattern_key: str, first: tuple, combos: np.ndarray) -> np.ndarray:
+    """Pattern (+1 rule) and PATTERN_TOTAL_FILTERS checks for every (s2, s3) at once."""
+    s2, s3 = combos[:, 0], combos[:, 1]
+    tian = first[0] + 1 if len(first) == 1 else sum(first)
+    computed = _elements(np.full_like(s2, tian)) + _elements(first[-1] + s2) + _elements(s2 + s3)
+    ok = computed == pattern_key
+    allowed = PATTERN_TOTAL_FILTERS.get(pattern_key)
+    if allowed:
+        ok &= np.isin(sum(first) + s2 + s3, list(allowed))
+    return ok
+
+
+def _passes(codes: np.ndarray, zodiac_filter_mode: str) -> np.ndarray:
+    if zodiac_filter_mode == "REQUIRE_JI":
+        return codes == STATUS_JI
+    if zodiac_filter_mode == "EXCLUDE_XIONG":
+        return codes != STATUS_XIONG
+    return np.ones(codes.shape, dtype=bool)
+
+
+def _codes(masks: np.ndarray, zodiac_name: str) -> np.ndarray:
+    shift = 2 * ZODIAC_ORDER.index(zodiac_name)
+    return (masks >> shift) & 0b11
+
+
+def _pair_mask(m2: np.ndarray, m3: np.ndarray, zodiac_name: str, zodiac_filter_mode: str) -> Optional[np.ndarray]:
+    """(len(m2), len(m3)) acceptance mask for the 2nd + 3rd filter; None = accept all."""
+    if zodiac_name == "None" or zodiac_filter_mode == "OFF":
+        return None
+    if zodiac_name == ZODIAC_MATRIX:
+        out = np.zeros((len(m2), len(m3)), dtype=bool)
+        for z in ZODIAC_ORDER:
+            out |= _passes(_codes(m2, z), zodiac_filter_mode)[:, None] & _passes(_codes(m3, z), zodiac_filter_mode)[None, :]
+        return out
+    if zodiac_name not in ZODIAC_ORDER:
+        return None  # unknown rule set: every status is neutral
+    return (
+        _passes(_codes(m2, zodiac_name), zodiac_filter_mode)[:, None]
+        & _passes(_codes(m3, zodiac_name), zodiac_filter_mode)[None, :]
+    )
+
+
+def generate_frame(
+    db: List[dict],
+    by_strokes: dict,
+    selected_patterns: List[str],
+    zodiac_name: str = "None",
+    zodiac_filter_mode: str = "OFF",
+    max_rows: Optional[int] = None,
+    surname: Optional[dict] = None,
+    combo_source: str = COMBO_SOURCE,
+    order: str = "display",  # display | generation
+) -> pd.DataFrame:
+    """
+    DataFrame of char indexes into db, one row per candidate:
+    second, third, pattern (index into selected_patterns), destiny, zodiac
+    (packed 2nd | 3rd << 2 codes for a single rule set, else 0).
+    """
+    index_of = {id(c): i for i, c in enumerate(db)}
+    bucket_idx = {s: np.fromiter((index_of[id(c)] for c in b), dtype=np.int64, count=len(b)) for s, b in by_strokes.items()}
+    masks = np.fromiter((c.get("zodiac_mask", 0) for c in db), dtype=np.int64, count=len(db))
+    single = zodiac_name in ZODIAC_ORDER
+    first = surname_strokes(surname or FIRST_CHAR)
+    display = order == "display"
+
+    parts = []
+    total = 0
+    for p, pattern_key in enumerate(selected_patterns):
+        combos = np.array(combo_table(pattern_key, first, by_strokes, combo_source), dtype=np.int64).reshape(-1, 2)
+        if not len(combos):
+            continue
+        for s2, s3 in combos[_combo_mask(pattern_key, first, combos)]:
+            seconds = bucket_idx.get(int(s2))
+            thirds = bucket_idx.get(int(s3))
+            if seconds is None or thirds is None or not len(seconds) or not len(thirds):
+                continue
+
+            ok = _pair_mask(masks[seconds], masks[thirds], zodiac_name, zodiac_filter_mode)
+            if ok is None:
+                ii, jj = np.divmod(np.arange(len(seconds) * len(thirds)), len(thirds))
+            else:
+                ii, jj = np.nonzero(ok)  # row-major = product(seconds, thirds) order
+
+            if max_rows is not None and not display:  # display order truncates after the sort
+                ii, jj = ii[:max_rows - total], jj[:max_rows - total]
+            a, b = seconds[ii], thirds[jj]
+            zodiac = (_codes(masks[a], zodiac_name) | _codes(masks[b], zodiac_name) << 2) if single else np.zeros(len(a), dtype=np.int64)
+            parts.append(pd.DataFrame({
+                "second": a,
+                "third": b,
+                "pattern": p,
+                "destiny": sum(first) + int(s2) + int(s3),
+                "zodiac": zodiac,
+            }))
+            total += len(a)
+            if not display and max_rows is not None and total >= max_rows:
+                return pd.concat(parts, ignore_index=True)
+
+    if not parts:
+        return pd.DataFrame({c: pd.Series(dtype=np.int64) for c in FRAME_COLUMNS})
+    frame = pd.concat(parts, ignore_index=True)
+    if display:
+        _, rank = np.unique(np.array([display_key(c) for c in db]), return_inverse=True)
+        seq = np.lexsort((rank[frame["third"].to_numpy()], rank[frame["second"].to_numpy()]))  # stable
+        frame = frame.take(seq[:max_rows]).reset_index(drop=True)
+    return frame
+
+
+def frame_to_result_set(
+    frame: pd.DataFrame,
+    selected_patterns: List[str],
+    zodiac_name: str,
+    zodiac_filter_mode: str,
+    surname: Optional[dict] = None,
+) -> ResultSet:
+    rs = ResultSet(selected_patterns, zodiac_name, zodiac_filter_mode, surname)
+    for col, dtype in (("second", np.uint32), ("third", np.uint32), ("pattern", np.uint8), ("destiny", np.uint16), ("zodiac", np.uint8)):
+        getattr(rs, col).frombytes(frame[col].to_numpy(dtype=dtype).tobytes())
+    return rs
@@ -0,0 +1,217 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from config import COMBO_SOURCE, FIRST_CHAR, PARALLEL_WORKERS, ZODIAC_MATRIX
+from logic import (
+    DbHandle, combo_table, display_key, filter_bucket, pair_accepted, resolve_stroke_pair, surname_strokes,
+)
+from result_store import ResultSet
+from rules.zodiac_rules import zodiac_code
+
+# ============================================================
+# PARALLEL ENGINE
+# The (pattern, s2, s3) stroke-pair products are independent, so the
+# serial walk of logic.iter_pairs is split into shards and run on a
+# process pool. Each worker receives the DB once (pool initializer) and
+# keeps its own zodiac-filtered buckets; a task is a contiguous run of
+# shards in generation order and comes back as a ResultSet blob.
+# Concatenating the tasks in submission order reproduces generation
+# order exactly; display order is then the same stable (2nd char, 3rd
+# char) sort the numpy engine uses, so every engine returns identical
+# result sets. Select it with logic.generate_result_set(..., engine="parallel").
+# ============================================================
+TASKS_PER_WORKER = 4  # more, smaller tasks even out shards of very different sizes
+
+
+class Shard(NamedTuple):
+    pattern: int  # index into selected_patterns
+    s2: int
+    s3: int
+    destiny: int
+    pairs: int  # size of the filtered bucket product (work estimate)
+
+
+def default_workers() -> int:
+    return PARALLEL_WORKERS or os.cpu_count() or 1
+
+
+def plan_shards(
+    by_strokes: dict,
+    selected_patterns: List[str],
+    zodiac_name: str,
+    zodiac_filter_mode: str,
+    first: Tuple[int, ...],
+    combo_source: str = COMBO_SOURCE,
+) -> List[Shard]:
+    """Every (pattern, s2, s3) with candidates, in generation order (same skips as logic._stroke_pair_streams)."""
+    sizes: Dict[int, int] = {}
+    shards = []
+    for p, pattern_key in enumerate(selected_patterns):
+        for s2, s3 in combo_table(pattern_key, first, by_strokes, combo_source):
+            verdict = resolve_stroke_pair(pattern_key, first, s2, s3)
+            if verdict is None:
+                continue
+            for s in (s2, s3):
+                if s not in sizes:
+                    sizes[s] = len(filter_bucket(by_strokes.get(s, []), zodiac_name, zodiac_filter_mode))
+            if sizes[s2] and sizes[s3]:
+                shards.append(Shard(p, s2, s3, verdict.destiny_total, sizes[s2] * sizes[s3]))
+    return shards
+
+
+def split_tasks(shards: List[Shard], n_tasks: int) -> List[List[Shard]]:
+    """Contiguous runs of roughly equal work, so concatenating task results keeps generation order."""
+    total = sum(s.pairs for s in shards)
+    target = max(1, total // max(1, n_tasks))
+    tasks, current, weight = [], [], 0
+    for shard in shards:
+        current.append(shard)
+        weight += shard.pairs
+        if weight >= target:
+            tasks.append(current)
+            current, weight = [], 0
+    if current:
+        tasks.append(current)
+    return tasks
+
+
+# ------------------------------------------------------------
+# worker side
+# ------------------------------------------------------------
+_WORKER: Dict[str, object] = {}
+
+
+def _init_worker(db: List[dict], by_strokes: dict) -> None:
+    # db and by_strokes arrive in one pickle, so bucket entries are still the db's dicts
+    _WORKER["db"] = db
+    _WORKER["by_strokes"] = by_strokes
+    _WORKER["index_of"] = {id(c): i for i, c in enumerate(db)}
+    _WORKER["buckets"] = {}
+
+
+def _run_task(selected_patterns: Tuple[str, ...], zodiac_name: str, zodiac_filter_mode: str,
+              shards: List[Shard]) -> bytes:
+    by_strokes = _WORKER["by_strokes"]
+    index_of = _WORKER["index_of"]
+    buckets = _WORKER["buckets"].setdefault((zodiac_name, zodiac_filter_mode), {})
+    single = zodiac_name not in ("None", ZODIAC_MATRIX)
+
+    def bucket(strokes: int) -> List[dict]:
+        if strokes not in buckets:
+            buckets[strokes] = filter_bucket(by_strokes.get(strokes, []), zodiac_name, zodiac_filter_mode)
+        return buckets[strokes]
+
+    out = ResultSet(selected_patterns, zodiac_name, zodiac_filter_mode)
+    for shard in shards:
+        thirds = bucket(shard.s3)
+        for second in bucket(shard.s2):
+            m2 = second.get("zodiac_mask", 0)
+            for third in thirds:
+                if pair_accepted(second, third, zodiac_name, zodiac_filter_mode):
+                    codes = zodiac_code(m2, zodiac_name) | zodiac_code(third.get("zodiac_mask", 0), zodiac_name) << 2 if single else 0
+                    out.append(index_of[id(second)], index_of[id(third)], shard.pattern, shard.destiny, codes)
+    return out.to_bytes()
+
+
+# ------------------------------------------------------------
+# parent side
+# ------------------------------------------------------------
+def open_pool(db: List[dict], by_strokes: dict, workers: Optional[int] = None) -> ProcessPoolExecutor:
+    # spawn, not fork: the app process runs threads (warm-up, Streamlit) that fork would copy mid-lock
+    return ProcessPoolExecutor(
+        max_workers=workers or default_workers(),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(db, by_strokes),
+    )
+
+
+_POOLS: Dict[Tuple[str, int], ProcessPoolExecutor] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def shared_pool(handle: DbHandle, workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """One long-lived pool per (DB fingerprint, worker count); pools for older fingerprints are shut down."""
+    workers = workers or default_workers()
+    key = (handle.fingerprint, workers)
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            for old in [k for k in _POOLS if k[0] != handle.fingerprint]:
+                _POOLS.pop(old).shutdown(wait=False, cancel_futures=True)
+            pool = _POOLS[key] = open_pool(handle.db, handle.by_strokes, workers)
+        return pool
+
+
+def discard_pool(pool: ProcessPoolExecutor) -> None:
+    """Forget a pool (e.g. after BrokenProcessPool) so shared_pool() starts a fresh one."""
+    with _POOLS_LOCK:
+        for key in [k for k, v in _POOLS.items() if v is pool]:
+            del _POOLS[key]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _display_sort(rs: ResultSet, db: List[dict], max_rows: Optional[int]) -> ResultSet:
+    _, rank = np.unique(np.array([display_key(c) for c in db]), return_inverse=True)
+    second = np.frombuffer(rs.second, dtype=np.uint32)
+    third = np.frombuffer(rs.third, dtype=np.uint32)
+    seq = np.lexsort((rank[third], rank[second]))  # stable: ties keep generation order
+    return rs.select(seq[:max_rows].tolist())
+
+
+def generate_result_set_parallel(
+    db: List[dict],
+    by_strokes: dict,
+    selected_patterns: List[str],
+    zodiac_name: str = "None",
+    zodiac_filter_mode: str = "OFF",
+    max_rows: Optional[int] = None,
+    surname: Optional[dict] = None,
+    combo_source: str = COMBO_SOURCE,
+    order: str = "display",  # display | generation
+    pool: Optional[ProcessPoolExecutor] = None,
+    workers: Optional[int] = None,
+) -> ResultSet:
+    """
+    Same candidates, same order as logic.generate_result_set(engine="python").
+    pool must have been opened on this db (open_pool / shared_pool); without
+    one a temporary pool of `workers` processes is started and shut down.
+    """
+    if pool is None:
+        with open_pool(db, by_strokes, workers) as temp:
+            return generate_result_set_parallel(
+                db, by_strokes, selected_patterns, zodiac_name, zodiac_filter_mode, max_rows,
+                surname, combo_source, order, pool=temp, workers=workers,
+            )
+
+    selected_patterns = tuple(selected_patterns)
+    first = surname_strokes(surname or FIRST_CHAR)
+    shards = plan_shards(by_strokes, list(selected_patterns), zodiac_name, zodiac_filter_mode, first, combo_source)
+    n_tasks = (workers or default_workers()) * TASKS_PER_WORKER
+    futures = [
+        pool.submit(_run_task, selected_patterns, zodiac_name, zodiac_filter_mode, task)
+        for task in split_tasks(shards, n_tasks)
+    ]
+
+    rs = ResultSet(selected_patterns, zodiac_name, zodiac_filter_mode, surname=surname)
+    early_stop = order == "generation" and max_rows is not None
+    try:
+        for k, future in enumerate(futures):
+            rs.extend(ResultSet.from_bytes(future.result()))
+            if early_stop and len(rs) >= max_rows:
+                for rest in futures[k + 1:]:
+                    rest.cancel()
+                break
+    except BrokenProcessPool:
+        discard_pool(pool)
+        raise
+
+    if order == "display":
+        return _display_sort(rs, db, max_rows)
+    return rs.select(range(min(len(rs), max_rows))) if early_stop else rs
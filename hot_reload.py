@@ -0,0 +1,244 @@
+import os
+import threading
+import time
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from config import FIRST_CHAR, SNAPSHOT_DIR, WORKBOOK_POLL_SECONDS
+from db_snapshot import remove_stale_snapshots, snapshot_path, workbook_fingerprint, write_snapshot
+from diagnostics import log_event
+from logic import (
+    DbHandle, combo_table, display_key, forget_served_queries, iter_workbook_rows, load_db_handle,
+    new_load_report, record_served_query, result_cache, result_cache_key, served_queries,
+)
+from rules.zodiac_rules import build_zodiac_index
+
+# ============================================================
+# HOT RELOAD
+# An edited workbook is diffed against the loaded DB instead of being
+# rebuilt: every row identical to a loaded record reuses that record
+# (zodiac index included), stroke buckets whose members didn't change
+# are reused as-is and by_char is patched for the touched characters.
+# The result is a new DbHandle (new fingerprint) sharing everything
+# unchanged with the old one: handles stay read-only, so runs still
+# holding the old handle are never torn.
+#
+# A ResultSet depends only on the (char, zodiac cell) sequence of the
+# stroke buckets its query touches. Cached result sets whose buckets
+# kept that sequence are re-indexed to the new db and stored under the
+# new fingerprint (carry_result_sets); only the others are regenerated.
+# Pinyin and meaning fixes therefore invalidate nothing. Search indexes,
+# SQLite catalogs and worker pools are per fingerprint and are rebuilt
+# on first use from the carried result sets.
+# ============================================================
+RECORD_FIELDS = ("char", "pinyin", "strokes", "element", "zodiac_cell", "meaning_en", "meaning_zh")
+
+
+class DbDiff(NamedTuple):
+    added: int    # rows with no identical record in the old DB (new or edited)
+    removed: int  # old records no row matches any more (deleted or edited)
+    reused: int
+    changed_strokes: FrozenSet[int]     # buckets whose members changed
+    generation_strokes: FrozenSet[int]  # buckets whose (char, zodiac cell) sequence changed
+
+
+def _record_key(c: dict) -> tuple:
+    return tuple(c[f] for f in RECORD_FIELDS)
+
+
+def _generation_signature(bucket: List[dict]) -> tuple:
+    return tuple((c["char"], c["zodiac_cell"]) for c in bucket)
+
+
+def reload_db_handle(old: DbHandle, excel_path: str, snapshot_dir: Optional[str] = SNAPSHOT_DIR,
+                     fingerprint: Optional[str] = None) -> Tuple[DbHandle, DbDiff]:
+    """Re-read excel_path and patch old's indexes (see HOT RELOAD); same result as load_db_handle."""
+    t0 = time.perf_counter()
+    fingerprint = fingerprint or workbook_fingerprint(excel_path)
+    report = new_load_report()
+
+    unused: Dict[tuple, List[dict]] = {}
+    for c in reversed(old.db):
+        unused.setdefault(_record_key(c), []).append(c)  # pop() hands them out in sheet order
+
+    db, fresh = [], []
+    seen_rows: Dict[str, List[int]] = {}
+    for c in iter_workbook_rows(excel_path, report):
+        seen_rows.setdefault(c["char"], []).append(c.pop("_row"))
+        same = unused.get(_record_key(c))
+        if same:
+            c = same.pop()
+        else:
+            fresh.append(c)
+        db.append(c)
+    removed = [c for records in unused.values() for c in records]
+    build_zodiac_index(fresh)
+
+    changed = {c["strokes"] for c in fresh} | {c["strokes"] for c in removed}
+    members: Dict[int, List[dict]] = {}
+    for c in db:
+        members.setdefault(c["strokes"], []).append(c)
+    by_strokes = {}
+    for s, bucket in members.items():
+        old_bucket = old.by_strokes.get(s)
+        if s not in changed and len({display_key(c) for c in bucket}) == len(bucket):
+            by_strokes[s] = old_bucket  # same members, no duplicate characters: same order
+            continue
+        bucket.sort(key=display_key)  # stable: duplicate characters keep sheet order
+        if old_bucket is not None and len(old_bucket) == len(bucket) and all(a is b for a, b in zip(old_bucket, bucket)):
+            bucket = old_bucket
+        else:
+            changed.add(s)  # members, or the order of duplicate characters, changed
+        by_strokes[s] = bucket
+    changed |= set(old.by_strokes) - set(by_strokes)
+
+    touched = {c["char"] for c in fresh} | {c["char"] for c in removed}
+    by_char = dict(old.by_char)
+    for ch in touched:
+        by_char.pop(ch, None)
+    for c in db:
+        if c["char"] in touched:
+            by_char[c["char"]] = c  # last row wins
+
+    generation = frozenset(
+        s for s in changed
+        if _generation_signature(old.by_strokes.get(s, [])) != _generation_signature(by_strokes.get(s, []))
+    )
+    diff = DbDiff(len(fresh), len(removed), len(db) - len(fresh), frozenset(changed), generation)
+
+    report["duplicates"] = [{"char": ch, "rows": rows} for ch, rows in seen_rows.items() if len(rows) > 1]
+    report["parse_seconds"] = time.perf_counter() - t0
+    report["fingerprint"] = fingerprint
+    if snapshot_dir:
+        path = snapshot_path(excel_path, fingerprint, snapshot_dir)
+        try:
+            write_snapshot(path, fingerprint, db, by_strokes, by_char, meta=report)
+            remove_stale_snapshots(excel_path, path, snapshot_dir)
+        except OSError:
+            pass  # read-only deploy: keep serving from the reloaded DB
+    report = dict(report, source="reload", reload={
+        "added": diff.added, "removed": diff.removed, "reused": diff.reused,
+        "changed_strokes": sorted(diff.changed_strokes), "generation_strokes": sorted(diff.generation_strokes),
+    })
+    return DbHandle(fingerprint, db, by_strokes, by_char, report), diff
+
+
+def _touched_strokes(by_strokes: dict, query: tuple) -> Tuple[tuple, set]:
+    """(combo tables, stroke counts they reference) of a served query over by_strokes."""
+    selected_patterns, _, _, _, surname, combo_source = query
+    combos = tuple(combo_table(p, surname or FIRST_CHAR, by_strokes, combo_source) for p in selected_patterns)
+    return combos, {s for table in combos for pair in table for s in pair}
+
+
+def carry_result_sets(old: DbHandle, new: DbHandle, diff: DbDiff) -> Tuple[int, int]:
+    """
+    Store every result set served for old that the reload can't have
+    changed under new's fingerprint, re-indexed to new.db; returns
+    (carried, dropped). Needs the on-disk result cache.
+    """
+    queries = served_queries(old.fingerprint)
+    cache = result_cache()
+    if cache is None:
+        return 0, len(queries)
+
+    old_index = {id(c): i for i, c in enumerate(old.db)}
+    new_index = {id(c): i for i, c in enumerate(new.db)}
+    index_map = [0] * len(old.db)
+    for s, bucket in old.by_strokes.items():
+        if s not in diff.generation_strokes:  # same chars in the same order, maybe other meanings
+            for a, b in zip(bucket, new.by_strokes[s]):
+                index_map[old_index[id(a)]] = new_index[id(b)]
+
+    carried = 0
+    for key, query in queries.items():
+        combos, strokes = _touched_strokes(new.by_strokes, query)
+        if strokes & diff.generation_strokes or combos != _touched_strokes(old.by_strokes, query)[0]:
+            continue
+        rs = cache.get(key)
+        if rs is None:
+            continue  # evicted meanwhile
+        new_key = result_cache_key(new.fingerprint, *query)
+        cache.put(new_key, rs.remap_chars(index_map))
+        record_served_query(new.fingerprint, new_key, query)
+        carried += 1
+    forget_served_queries(old.fingerprint)
+    return carried, len(queries) - carried
+
+
+def _stamp(path: str) -> Tuple[int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+class WorkbookWatcher:
+    """
+    The current DbHandle of one workbook. poll() (cheap: one stat) hot
+    reloads it when the file changed; start() polls every `interval`
+    seconds on a daemon thread so the reload is usually done before the
+    next request needs it. A workbook that fails to load (half-saved, a
+    bad cell) is logged and kept in last_error; the loaded DB stays in
+    service and the file is retried once it changes again.
+    """
+
+    def __init__(self, excel_path: str, snapshot_dir: Optional[str] = SNAPSHOT_DIR,
+                 interval: Optional[float] = WORKBOOK_POLL_SECONDS):
+        self.excel_path = excel_path
+        self.snapshot_dir = snapshot_dir
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stamp = _stamp(excel_path)
+        self.handle = load_db_handle(excel_path, snapshot_dir)
+        self.last_reload: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[Dict[str, Any]] = None
+
+    def poll(self) -> bool:
+        """Reload if the workbook changed since the last load; True when the handle was replaced."""
+        try:
+            stamp = _stamp(self.excel_path)
+        except OSError:
+            return False  # mid-replace (editors save via rename): keep serving the loaded DB
+        if stamp == self._stamp:
+            return False
+        with self._lock:
+            if stamp == self._stamp:
+                return False  # another thread reloaded it
+            try:
+                fingerprint = workbook_fingerprint(self.excel_path)
+                if fingerprint == self.handle.fingerprint:
+                    self._stamp = stamp  # touched, not edited
+                    return False
+                t0 = time.perf_counter()
+                handle, diff = reload_db_handle(self.handle, self.excel_path, self.snapshot_dir, fingerprint)
+                reloaded = time.perf_counter()
+                carried, dropped = carry_result_sets(self.handle, handle, diff)
+            except OSError:
+                return False  # unreadable right now: retried on the next poll
+            except Exception as exc:  # half-saved or malformed workbook; never kill the watcher or the run
+                self._stamp = stamp
+                self.last_error = log_event(
+                    "hot_reload_failed", workbook=self.excel_path, error=f"{type(exc).__name__}: {exc}",
+                    serving=self.handle.fingerprint,
+                )
+                return False
+            self.handle, self._stamp, self.last_error = handle, stamp, None
+            self.last_reload = dict(
+                handle.report["reload"], carried=carried, dropped=dropped, at=time.strftime("%H:%M:%S"),
+                seconds=reloaded - t0, carry_seconds=time.perf_counter() - reloaded,
+            )
+            return True
+
+    def current(self) -> DbHandle:
+        self.poll()
+        return self.handle
+
+    def start(self) -> Optional[threading.Thread]:
+        if not self.interval:
+            return None
+
+        def run():
+            while True:
+                time.sleep(self.interval)
+                self.poll()
+
+        worker = threading.Thread(target=run, name="workbook-watcher", daemon=True)
+        worker.start()
+        return worker
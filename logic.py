@@ -1,12 +1,38 @@
+import base64
+import hashlib
+import heapq
+import json
+import sqlite3
+import threading
+import time
+import pandas as pd
 import streamlit as st
 from openpyxl import load_workbook
-from itertools import product
-from typing import Dict, List, Tuple, Any, Optional
+from collections import Counter
+from itertools import islice
+from functools import lru_cache
+from typing import Dict, List, Tuple, Any, Optional, Iterator, NamedTuple
 
-from rules.zodiac_rules import check_zodiac_tokens
+from rules.zodiac_rules import (
+    ZODIAC_ORDER, STATUS_NAMES, build_zodiac_index, zodiac_check, zodiac_code,
+    passes_zodiac_filter, pair_passes, passes_any_zodiac,
+)
+from result_store import ResultSet
+from result_cache import ResultCache
+from catalog_sqlite import (
+    catalog_path, import_catalog, open_catalog, query_pairs, remove_stale_catalogs,
+    stroke_values as catalog_stroke_values,
+)
+from search_index import SearchIndex
+from db_snapshot import (
+    workbook_fingerprint, snapshot_path, read_snapshot,
+    write_snapshot, remove_stale_snapshots,
+)
 from config import (
     FIRST_CHAR, DESTINY_MEANINGS, PATTERN_MEANINGS,
-    REQUESTED_COMBOS, PATTERN_TOTAL_FILTERS
+    REQUESTED_COMBOS, PATTERN_TOTAL_FILTERS, SNAPSHOT_DIR, ZODIAC_MATRIX, COMBO_SOURCE,
+    RESULT_CACHE_PATH, RESULT_CACHE_MAX_BYTES, ZODIAC_OPTIONS, CATALOG_DIR, APP_RESULT_SETS, APP_RESULT_PAGES,
+    ZODIAC_RULES, CATALOG_STALE_SECONDS,
 )
 
 # ============================================================
@@ -24,14 +50,45 @@ def stroke_to_element(strokes: int) -> str:
         return "金"
     return "水"
 
+# ============================================================
+# SURNAME
+# A surname spec has FIRST_CHAR's shape; compound surnames (複姓) give
+# one stroke count per character, e.g.
+#   {"char": "歐陽", "pinyin": "ōu yáng", "strokes": [15, 17], "element": ""}
+# Stroke math takes `first` as an int (single surname), a stroke
+# sequence or a spec, normalised by surname_strokes().
+# ============================================================
+def surname_strokes(first) -> Tuple[int, ...]:
+    if isinstance(first, dict):
+        first = first["strokes"]
+    if isinstance(first, int):
+        return (first,)
+    return tuple(int(s) for s in first)
+
+def custom_surname(chars: str, pinyin: str, strokes_text: str) -> dict:
+    """Surname spec from user input, e.g. ("歐陽", "ōu yáng", "15,17"); ValueError if it doesn't fit."""
+    chars = chars.strip()
+    try:
+        strokes = [int(x) for x in strokes_text.replace("，", ",").split(",") if x.strip()]
+    except ValueError:
+        strokes = []
+    if not 1 <= len(chars) <= 2 or len(strokes) != len(chars):
+        raise ValueError("A custom surname needs 1–2 characters and one stroke count per character.")
+    return {"char": chars, "pinyin": pinyin.strip(), "element": "", "strokes": strokes if len(strokes) > 1 else strokes[0]}
+
+def _tian_ge(f: Tuple[int, ...]) -> int:
+    # single surname: surname + 1 ; compound surname: sum of both characters
+    return f[0] + 1 if len(f) == 1 else sum(f)
+
 # ============================================================
 # 五格 (天格/人格/地格/總格)
 # ============================================================
-def compute_five_grids(first: int, second: int, third: int) -> Dict[str, Tuple[int, str]]:
-    tian = first + 1
-    ren = first + second
+def compute_five_grids(first, second: int, third: int) -> Dict[str, Tuple[int, str]]:
+    f = surname_strokes(first)
+    tian = _tian_ge(f)
+    ren = f[-1] + second
     di = second + third
-    zong = first + second + third  # NO +1
+    zong = sum(f) + second + third  # NO +1
     return {
         "天格": (tian, stroke_to_element(tian)),
         "人格": (ren, stroke_to_element(ren)),
@@ -42,14 +99,16 @@ def compute_five_grids(first: int, second: int, third: int) -> Dict[str, Tuple[i
 # ============================================================
 # Pattern elements (+1 rule)
 # ============================================================
-def compute_pattern_elements(first: int, second: int, third: int) -> Dict[str, Any]:
-    A = first + 1
-    B = first + second
+def compute_pattern_elements(first, second: int, third: int) -> Dict[str, Any]:
+    f = surname_strokes(first)
+    A = _tian_ge(f)
+    B = f[-1] + second
     C = second + third
+    a_text = f"{f[0]}+1" if len(f) == 1 else "+".join(str(x) for x in f)
     return {
         "calc_text": (
-            f"{first}+1={A}({stroke_to_element(A)}) · "
-            f"{first}+{second}={B}({stroke_to_element(B)}) · "
+            f"{a_text}={A}({stroke_to_element(A)}) · "
+            f"{f[-1]}+{second}={B}({stroke_to_element(B)}) · "
             f"{second}+{third}={C}({stroke_to_element(C)})"
         ),
         "elements": stroke_to_element(A) + stroke_to_element(B) + stroke_to_element(C),
@@ -63,55 +122,324 @@ def allowed_destiny_total(pattern_key: str, destiny_total: int) -> bool:
     allowed = PATTERN_TOTAL_FILTERS.get(pattern_key)
     return True if not allowed else destiny_total in allowed
 
+# ============================================================
+# COMBO SOLVER
+# Derives every (s2, s3) stroke pair that produces a three-element
+# pattern for a surname, over the stroke counts actually present in the
+# DB, instead of relying on the hand-written REQUESTED_COMBOS lists.
+# An element depends only on the last digit of a stroke sum, so the
+# candidate 3rd-character strokes are tabulated once per s2 residue.
+# Results are lru-cached per (pattern, surname strokes, stroke values).
+# ============================================================
+ELEMENTS = "木火土金水"
+ALL_PATTERNS: List[str] = [a + b + c for a in ELEMENTS for b in ELEMENTS for c in ELEMENTS]
+
+def stroke_values(by_strokes: dict) -> Tuple[int, ...]:
+    return tuple(sorted(s for s, bucket in by_strokes.items() if bucket))
+
+@lru_cache(maxsize=None)
+def solve_combos(pattern_key: str, first: Tuple[int, ...], strokes: Tuple[int, ...]) -> Tuple[Tuple[int, int], ...]:
+    """All (s2, s3) over `strokes` whose 天格/人格/地格 elements spell pattern_key and pass PATTERN_TOTAL_FILTERS."""
+    if len(pattern_key) != 3 or stroke_to_element(_tian_ge(first)) != pattern_key[0]:
+        return ()
+
+    # element-by-stroke-sum: for each s2 residue, the s3 values whose 地格 has the 3rd element
+    thirds_by_residue = [
+        [s3 for s3 in strokes if stroke_to_element(r + s3) == pattern_key[2]]
+        for r in range(10)
+    ]
+    allowed = PATTERN_TOTAL_FILTERS.get(pattern_key)
+    base = sum(first)
+
+    out = []
+    for s2 in strokes:
+        if stroke_to_element(first[-1] + s2) != pattern_key[1]:
+            continue
+        for s3 in thirds_by_residue[s2 % 10]:
+            if not allowed or base + s2 + s3 in allowed:
+                out.append((s2, s3))
+    return tuple(out)
+
+def combo_table(pattern_key: str, first, by_strokes: dict, combo_source: str = COMBO_SOURCE) -> Tuple[Tuple[int, int], ...]:
+    """(s2, s3) pairs to search for a pattern: "solver" (derived) or "requested" (config.REQUESTED_COMBOS)."""
+    return combo_table_for_strokes(pattern_key, first, stroke_values(by_strokes), combo_source)
+
+def combo_table_for_strokes(pattern_key: str, first, strokes: Tuple[int, ...],
+                            combo_source: str = COMBO_SOURCE) -> Tuple[Tuple[int, int], ...]:
+    """combo_table() over an explicit set of stroke counts (e.g. from the SQLite catalog)."""
+    if combo_source == "requested":
+        return tuple(REQUESTED_COMBOS.get(pattern_key, ()))
+    if combo_source != "solver":
+        raise ValueError(f"Unknown combo source: {combo_source!r} (expected 'solver' or 'requested')")
+    return solve_combos(pattern_key, surname_strokes(first), strokes)
+
+# ============================================================
+# STROKE-PAIR VERDICT
+# Everything in a result row except the characters themselves depends
+# only on (pattern, surname strokes, s2, s3). Resolve it once per stroke
+# pair: None rejects the whole (s2, s3) bucket up front, otherwise every
+# accepted row shares this one immutable object's grids/strings.
+# Treat five_grids as read-only: it is shared by every row of the pair
+# and by every surname with the same stroke counts.
+# ============================================================
+class StrokePairVerdict(NamedTuple):
+    pattern_key: str
+    destiny_total: int
+    destiny_element: str
+    pattern_calc: str
+    five_grids: Dict[str, Tuple[int, str]]
+    destiny_meaning_en: str
+    destiny_meaning_zh: str
+    pattern_meaning_en: str
+    pattern_meaning_zh: str
+
+def resolve_stroke_pair(pattern_key: str, first, s2: int, s3: int) -> Optional[StrokePairVerdict]:
+    return _resolve_stroke_pair(pattern_key, surname_strokes(first), s2, s3)
+
+@lru_cache(maxsize=None)
+def _resolve_stroke_pair(pattern_key: str, first: Tuple[int, ...], s2: int, s3: int) -> Optional[StrokePairVerdict]:
+    destiny_total = sum(first) + s2 + s3  # NO +1
+    if not allowed_destiny_total(pattern_key, destiny_total):
+        return None
+
+    pat = compute_pattern_elements(first, s2, s3)
+    if pat["elements"] != pattern_key:
+        return None
+    return _build_verdict(pat, first, s2, s3)
+
+def _build_verdict(pat: Dict[str, Any], first: Tuple[int, ...], s2: int, s3: int) -> StrokePairVerdict:
+    pattern_key = pat["elements"]
+    destiny_total = sum(first) + s2 + s3
+    return StrokePairVerdict(
+        pattern_key=pattern_key,
+        destiny_total=destiny_total,
+        destiny_element=stroke_to_element(destiny_total),
+        pattern_calc=pat["calc_text"],
+        five_grids=compute_five_grids(first, s2, s3),
+        destiny_meaning_en=DESTINY_MEANINGS.get(destiny_total, {}).get("en", "Not defined."),
+        destiny_meaning_zh=DESTINY_MEANINGS.get(destiny_total, {}).get("zh", "（未定義）"),
+        pattern_meaning_en=PATTERN_MEANINGS.get(pattern_key, {}).get("en", ""),
+        pattern_meaning_zh=PATTERN_MEANINGS.get(pattern_key, {}).get("zh", ""),
+    )
+
 # ============================================================
 # LOAD DB
 # Excel mapping:
 # row[0]=char row[1]=pinyin row[2]=strokes row[3]=element
 # row[4]=ZODIAC CELL (single source for ALL zodiac filtering)
 # row[5]=meaning_en row[6]=meaning_zh
+#
+# The parsed DB is compiled once into a binary snapshot keyed by the
+# workbook hash (see db_snapshot.py); later processes decode that
+# instead of re-parsing the .xlsx. A corrupt snapshot is deleted by
+# read_snapshot and rewritten here from the workbook.
 # ============================================================
-def load_db_raw(excel_path: str):
-    wb = load_workbook(excel_path)
-    ws = wb.active
+def load_db_raw(excel_path: str, snapshot_dir: Optional[str] = SNAPSHOT_DIR):
+    db, by_strokes, by_char, _ = load_db_with_report(excel_path, snapshot_dir)
+    return db, by_strokes, by_char
 
-    db = []
-    for row in ws.iter_rows(min_row=1, values_only=True):
-        try:
-            char = row[0]
-            pinyin = row[1]
-            strokes = int(row[2])
-            element = row[3]
-
-            zodiac_cell = row[4] if len(row) > 4 else ""   # ✅ ONLY row[4]
-            meaning_en = row[5] if len(row) > 5 else ""    # ✅ shifted
-            meaning_zh = row[6] if len(row) > 6 else ""    # ✅ shifted
-
-            if char and pinyin and strokes and element is not None:
-                db.append({
-                    "char": char,
-                    "pinyin": pinyin,
-                    "strokes": strokes,
-                    "element": element,
-                    "zodiac_cell": zodiac_cell or "",
-                    "meaning_en": meaning_en or "",
-                    "meaning_zh": meaning_zh or "",
-                })
-        except:
-            continue
+def load_db_with_report(excel_path: str, snapshot_dir: Optional[str] = SNAPSHOT_DIR):
+    """
+    Same as load_db_raw, plus the load report (see new_load_report).
+    A snapshot hit returns the report recorded when the workbook was parsed,
+    with source/parse_seconds describing this load.
+    """
+    if not snapshot_dir:
+        return parse_workbook(excel_path)
+
+    t0 = time.perf_counter()
+    fingerprint = workbook_fingerprint(excel_path)
+    path = snapshot_path(excel_path, fingerprint, snapshot_dir)
+    cached = read_snapshot(path, fingerprint)
+    if cached is not None:
+        db, by_strokes, by_char, report = cached
+        build_zodiac_index(db)
+        report = dict(report, source="snapshot", parse_seconds=time.perf_counter() - t0, fingerprint=fingerprint)
+        return db, by_strokes, by_char, report
+
+    db, by_strokes, by_char, report = parse_workbook(excel_path)
+    try:
+        write_snapshot(path, fingerprint, db, by_strokes, by_char, meta=report)
+        remove_stale_snapshots(excel_path, path, snapshot_dir)
+    except OSError:
+        pass  # read-only deploy: keep serving from the parsed workbook
+    report["fingerprint"] = fingerprint
+    return db, by_strokes, by_char, report
+
+# ============================================================
+# DB HANDLE
+# The loaded DB plus the workbook's content fingerprint. Streamlit
+# caches hash a handle by its fingerprint only (HANDLE_HASH), so a
+# cache lookup never walks the character records, and cache_resource
+# hands back the shared result object instead of an unpickled copy.
+# Everything reachable from a handle or a cached result is shared by
+# every session: treat it as read-only.
+# ============================================================
+class DbHandle(NamedTuple):
+    fingerprint: str
+    db: List[dict]
+    by_strokes: Dict[int, List[dict]]
+    by_char: Dict[str, dict]
+    report: Dict[str, Any]
+
+HANDLE_HASH = {DbHandle: lambda h: h.fingerprint}
+
+def load_db_handle(excel_path: str, snapshot_dir: Optional[str] = SNAPSHOT_DIR) -> DbHandle:
+    db, by_strokes, by_char, report = load_db_with_report(excel_path, snapshot_dir)
+    fingerprint = report.get("fingerprint") or workbook_fingerprint(excel_path)
+    return DbHandle(fingerprint, db, by_strokes, by_char, report)
+
+def new_load_report() -> Dict[str, Any]:
+    return {
+        "source": "xlsx",
+        "rows_read": 0,
+        "rows_loaded": 0,
+        "blank_rows": 0,
+        "rejected": [],      # [{"row": 12, "reason": "..."}]
+        "duplicates": [],    # [{"char": "義", "rows": [40, 388]}]  last row wins in by_char
+        "parse_seconds": 0.0,
+    }
+
+def _reject_reason(row: tuple) -> Optional[str]:
+    def cell(i):
+        return row[i] if len(row) > i else None
+
+    if not cell(0):
+        return "missing character (col A)"
+    if not cell(1):
+        return "missing pinyin (col B)"
+    try:
+        strokes = int(cell(2))
+    except (TypeError, ValueError):
+        return f"strokes not a number (col C): {cell(2)!r}"
+    if not strokes:
+        return "strokes is 0 (col C)"
+    if cell(3) is None:
+        return "missing element (col D)"
+    return None
+
+def iter_workbook_rows(excel_path: str, report: Optional[Dict[str, Any]] = None) -> Iterator[dict]:
+    """
+    Stream character records from the workbook (read-only, values only),
+    so the sheet itself is never held in memory. Rejected rows are recorded
+    in `report` with their 1-based sheet row number instead of being dropped silently.
+    """
+    if report is None:
+        report = new_load_report()
+
+    wb = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        for row_no, row in enumerate(ws.iter_rows(min_row=1, values_only=True), start=1):
+            report["rows_read"] += 1
+            if not any(v is not None and v != "" for v in row):
+                report["blank_rows"] += 1
+                continue
+
+            reason = _reject_reason(row)
+            if reason:
+                report["rejected"].append({"row": row_no, "reason": reason})
+                continue
 
+            report["rows_loaded"] += 1
+            yield {
+                "char": row[0],
+                "pinyin": row[1],
+                "strokes": int(row[2]),
+                "element": row[3],
+                "zodiac_cell": (row[4] if len(row) > 4 else "") or "",   # ✅ ONLY row[4]
+                "meaning_en": (row[5] if len(row) > 5 else "") or "",    # ✅ shifted
+                "meaning_zh": (row[6] if len(row) > 6 else "") or "",    # ✅ shifted
+                "_row": row_no,
+            }
+    finally:
+        wb.close()  # read-only workbooks keep the zip open until closed
+
+def parse_workbook(excel_path: str):
+    report = new_load_report()
+    t0 = time.perf_counter()
+
+    db = []
     by_strokes = {}
     by_char = {}
-    for c in db:
+    seen_rows: Dict[str, List[int]] = {}
+    for c in iter_workbook_rows(excel_path, report):
+        seen_rows.setdefault(c["char"], []).append(c.pop("_row"))
+        db.append(c)
         by_strokes.setdefault(c["strokes"], []).append(c)
         by_char[c["char"]] = c
+    for bucket in by_strokes.values():
+        bucket.sort(key=display_key)  # stable: duplicate characters keep sheet order
 
-    return db, by_strokes, by_char
+    report["duplicates"] = [
+        {"char": ch, "rows": rows} for ch, rows in seen_rows.items() if len(rows) > 1
+    ]
+    build_zodiac_index(db)
+    report["parse_seconds"] = time.perf_counter() - t0
+    return db, by_strokes, by_char, report
 
 # ============================================================
 # BUILD RESULT ROW
-# zodiac_name chooses rule set; we still read the same row[4] cell.
+# zodiac_name chooses rule set; statuses come from the per-character
+# index compiled from row[4] at load time (build_zodiac_index).
 # filter applies ONLY on 2nd + 3rd chars.
+#
+# zodiac_name == ZODIAC_MATRIX ("All") evaluates every rule set at once:
+# the row carries ZodiacMatrix and the filter keeps a name if it passes
+# under at least one rule set (narrow it later with matrix_passes).
 # ============================================================
+def zodiac_matrix(second: dict, third: dict) -> Dict[str, Dict[str, Any]]:
+    m2 = second.get("zodiac_mask", 0)
+    m3 = third.get("zodiac_mask", 0)
+    out = {}
+    for z in ZODIAC_ORDER:
+        c2, c3 = zodiac_code(m2, z), zodiac_code(m3, z)
+        out[z] = {
+            "second": STATUS_NAMES[c2],
+            "third": STATUS_NAMES[c3],
+            "codes": (c2, c3),
+        }
+    return out
+
+def matrix_passes(row: dict, zodiac_name: str, zodiac_filter_mode: str) -> bool:
+    """Re-apply the 2nd + 3rd filter for one rule set to a matrix-mode row (no regeneration)."""
+    cell = (row.get("ZodiacMatrix") or {}).get(zodiac_name)
+    if cell is None:
+        return True
+    return pair_passes(*cell["codes"], zodiac_filter_mode)
+
+def surname_details(by_char: dict, surname: Optional[dict] = None) -> List[dict]:
+    """CharDetails entries for the surname: the DB record when present, else built from the spec."""
+    surname = surname or FIRST_CHAR
+    strokes = surname_strokes(surname)
+    syllables = str(surname.get("pinyin", "")).split()
+    elements = str(surname.get("element", "") or "")
+    out = []
+    for i, ch in enumerate(surname["char"]):
+        out.append(by_char.get(ch) or {
+            "char": ch,
+            "pinyin": syllables[i] if i < len(syllables) else "",
+            "strokes": strokes[i] if i < len(strokes) else "",
+            "element": elements[i] if len(elements) == len(surname["char"]) else elements,
+            "meaning_en": "",
+            "meaning_zh": "",
+            "zodiac_cell": "",
+        })
+    return out
+
+def pair_accepted(second: dict, third: dict, zodiac_name: str, zodiac_filter_mode: str) -> bool:
+    """✅ zodiac filter ONLY on 2nd + 3rd (precompiled status codes)."""
+    if zodiac_name == "None" or zodiac_filter_mode == "OFF":
+        return True
+    m2 = second.get("zodiac_mask", 0)
+    m3 = third.get("zodiac_mask", 0)
+    if zodiac_name == ZODIAC_MATRIX:
+        return any(
+            pair_passes(zodiac_code(m2, z), zodiac_code(m3, z), zodiac_filter_mode)
+            for z in ZODIAC_ORDER
+        )
+    return pair_passes(zodiac_code(m2, zodiac_name), zodiac_code(m3, zodiac_name), zodiac_filter_mode)
+
 def make_row(
     requested_pattern_key: str,
     second: dict,
@@ -119,38 +447,29 @@ def make_row(
     by_char: dict,
     zodiac_name: str = "None",
     zodiac_filter_mode: str = "OFF",  # OFF | EXCLUDE_XIONG | REQUIRE_JI
+    verdict: Optional[StrokePairVerdict] = None,
+    surname: Optional[dict] = None,
 ) -> Optional[dict]:
-    first = FIRST_CHAR["strokes"]
-    s2 = second["strokes"]
-    s3 = third["strokes"]
-
-    destiny_total = first + s2 + s3  # NO +1
-    if not allowed_destiny_total(requested_pattern_key, destiny_total):
-        return None
+    surname = surname or FIRST_CHAR
+    if verdict is None:
+        verdict = resolve_stroke_pair(
+            requested_pattern_key, surname, second["strokes"], third["strokes"]
+        )
+        if verdict is None:
+            return None
 
-    pat = compute_pattern_elements(first, s2, s3)
-    computed_pattern = pat["elements"]
-    if computed_pattern != requested_pattern_key:
+    if not pair_accepted(second, third, zodiac_name, zodiac_filter_mode):
         return None
 
-    first_info = by_char.get(FIRST_CHAR["char"], {
-        "char": FIRST_CHAR["char"],
-        "pinyin": FIRST_CHAR["pinyin"],
-        "strokes": FIRST_CHAR["strokes"],
-        "element": FIRST_CHAR["element"],
-        "meaning_en": "",
-        "meaning_zh": "",
-        "zodiac_cell": "",
-    })
+    char_details = surname_details(by_char, surname) + [second, third]
 
-    char_details = [first_info, second, third]
+    matrix = zodiac_matrix(second, third) if zodiac_name == ZODIAC_MATRIX else None
 
-    # build zodiac checks from row[4]
     zodiac_checks = []
-    if zodiac_name != "None":
+    if zodiac_name not in ("None", ZODIAC_MATRIX):
         for ch in char_details:
             cell_text = ch.get("zodiac_cell", "")
-            res = check_zodiac_tokens(zodiac_name, cell_text)  # ✅ rule set chosen by zodiac_name
+            res = zodiac_check(ch, zodiac_name)  # ✅ rule set chosen by zodiac_name
             zodiac_checks.append({
                 "char": ch.get("char", ""),
                 "status": res.get("status", "neutral"),  # 吉 / 凶 / neutral
@@ -163,47 +482,221 @@ def make_row(
             for ch in char_details
         ]
 
-    # ✅ apply filter ONLY on 2nd + 3rd
-    if zodiac_name != "None" and zodiac_filter_mode != "OFF":
-        s2_status = zodiac_checks[1]["status"]
-        s3_status = zodiac_checks[2]["status"]
-
-        if zodiac_filter_mode == "REQUIRE_JI":
-            if s2_status != "吉" or s3_status != "吉":
-                return None
-
-        elif zodiac_filter_mode == "EXCLUDE_XIONG":
-            if s2_status == "凶" or s3_status == "凶":
-                return None
-
-    name = FIRST_CHAR["char"] + second["char"] + third["char"]
-    pinyin = f"{FIRST_CHAR['pinyin']} {second['pinyin']} {third['pinyin']}"
-    five_grids = compute_five_grids(first, s2, s3)
+    name = surname["char"] + second["char"] + third["char"]
+    pinyin = f"{surname['pinyin']} {second['pinyin']} {third['pinyin']}"
 
     return {
+        "Surname": surname["char"],
         "PatternRequested": requested_pattern_key,
-        "PatternComputed": computed_pattern,
+        "PatternComputed": verdict.pattern_key,
         "Name": name,
         "Pinyin": pinyin,
-        "FiveGrids": five_grids,
-        "PatternCalc": pat["calc_text"],
-        "DestinyTotal": destiny_total,
-        "DestinyElement": stroke_to_element(destiny_total),
-        "DestinyMeaning_EN": DESTINY_MEANINGS.get(destiny_total, {}).get("en", "Not defined."),
-        "DestinyMeaning_ZH": DESTINY_MEANINGS.get(destiny_total, {}).get("zh", "（未定義）"),
-        "PatternMeaning_EN": PATTERN_MEANINGS.get(computed_pattern, {}).get("en", ""),
-        "PatternMeaning_ZH": PATTERN_MEANINGS.get(computed_pattern, {}).get("zh", ""),
+        "FiveGrids": verdict.five_grids,
+        "PatternCalc": verdict.pattern_calc,
+        "DestinyTotal": verdict.destiny_total,
+        "DestinyElement": verdict.destiny_element,
+        "DestinyMeaning_EN": verdict.destiny_meaning_en,
+        "DestinyMeaning_ZH": verdict.destiny_meaning_zh,
+        "PatternMeaning_EN": verdict.pattern_meaning_en,
+        "PatternMeaning_ZH": verdict.pattern_meaning_zh,
         "CharDetails": char_details,
         "ZodiacCheck": {
             "zodiac": zodiac_name,
             "checks": zodiac_checks,
             "filter_mode": zodiac_filter_mode,
         },
+        "ZodiacMatrix": matrix,
     }
 
+def analyze_name(
+    second: dict,
+    third: dict,
+    by_char: dict,
+    zodiac_name: str = "None",
+    surname: Optional[dict] = None,
+) -> dict:
+    """
+    make_row() for any 2nd/3rd pair, whatever pattern its strokes give: the
+    full row, plus "DestinyAllowed" = whether PATTERN_TOTAL_FILTERS lets the
+    generator list it. No zodiac filtering; ZodiacCheck/ZodiacMatrix report the statuses.
+    """
+    first = surname_strokes(surname or FIRST_CHAR)
+    pat = compute_pattern_elements(first, second["strokes"], third["strokes"])
+    verdict = _build_verdict(pat, first, second["strokes"], third["strokes"])
+    row = make_row(verdict.pattern_key, second, third, by_char, zodiac_name, "OFF", verdict=verdict, surname=surname)
+    row["DestinyAllowed"] = allowed_destiny_total(verdict.pattern_key, verdict.destiny_total)
+    return row
+
 # ============================================================
 # GENERATE ROWS
 # ============================================================
+def filter_bucket(bucket: List[dict], zodiac_name: str, zodiac_filter_mode: str) -> List[dict]:
+    """Drop 2nd/3rd-position candidates the zodiac filter rejects, using only the status index."""
+    if zodiac_name == "None" or zodiac_filter_mode == "OFF":
+        return bucket
+    if zodiac_name == ZODIAC_MATRIX:
+        return [c for c in bucket if passes_any_zodiac(c.get("zodiac_mask", 0), zodiac_filter_mode)]
+    return [
+        c for c in bucket
+        if passes_zodiac_filter(zodiac_code(c.get("zodiac_mask", 0), zodiac_name), zodiac_filter_mode)
+    ]
+
+def display_key(c: dict) -> str:
+    """Sort key of a character in the results (names sort char by char; the surname is fixed)."""
+    return c["char"]
+
+def _stroke_pair_streams(
+    by_strokes: dict,
+    selected_patterns: List[str],
+    zodiac_name: str,
+    zodiac_filter_mode: str,
+    first: Tuple[int, ...],
+    buckets: Dict[int, List[dict]],
+    combo_source: str,
+    start: Tuple[int, int] = (0, 0),
+) -> Iterator[Tuple[int, int, StrokePairVerdict, List[dict], List[dict]]]:
+    """(p, c, verdict, seconds, thirds) for every (pattern, s2, s3) with candidates, from start = (p, c)."""
+    def bucket(strokes: int) -> List[dict]:
+        if strokes not in buckets:
+            buckets[strokes] = filter_bucket(by_strokes.get(strokes, []), zodiac_name, zodiac_filter_mode)
+        return buckets[strokes]
+
+    p0, c0 = start
+    for p in range(p0, len(selected_patterns)):
+        pattern_key = selected_patterns[p]
+        combos = combo_table(pattern_key, first, by_strokes, combo_source)
+        for c in range(c0 if p == p0 else 0, len(combos)):
+            s2, s3 = combos[c]
+            verdict = _resolve_stroke_pair(pattern_key, first, s2, s3)
+            if verdict is None:
+                continue  # whole (s2, s3) bucket rejected by pattern/destiny filters
+            seconds = bucket(s2)
+            thirds = bucket(s3)
+            if seconds and thirds:
+                yield p, c, verdict, seconds, thirds
+
+def iter_pairs(
+    by_strokes: dict,
+    selected_patterns: List[str],
+    zodiac_name: str = "None",
+    zodiac_filter_mode: str = "OFF",
+    start: Tuple[int, int, int, int] = (0, 0, 0, 0),
+    surname: Optional[dict] = None,
+    buckets: Optional[Dict[int, List[dict]]] = None,
+    combo_source: str = COMBO_SOURCE,
+) -> Iterator[Tuple[Tuple[int, int, int, int], StrokePairVerdict, dict, dict]]:
+    """
+    Walk the (pattern, s2, s3, second, third) space lazily, yielding
+    (position, verdict, second, third) for every accepted pair without
+    building rows. position indexes selected_patterns / combo_table() /
+    the zodiac-filtered buckets, so iteration can resume from any yielded
+    position (see generate_page).
+    `buckets` caches the zodiac-filtered stroke buckets; pass the same dict
+    to share them between calls with the same zodiac/filter (see generate_batch).
+    """
+    first = surname_strokes(surname or FIRST_CHAR)
+    if buckets is None:
+        buckets = {}
+
+    p0, c0, i0, j0 = start
+    streams = _stroke_pair_streams(
+        by_strokes, selected_patterns, zodiac_name, zodiac_filter_mode, first, buckets, combo_source, (p0, c0)
+    )
+    for p, c, verdict, seconds, thirds in streams:
+        resuming = (p, c) == (p0, c0)
+        for i in range(i0 if resuming else 0, len(seconds)):
+            second = seconds[i]
+            for j in range(j0 if resuming and i == i0 else 0, len(thirds)):
+                if pair_accepted(second, thirds[j], zodiac_name, zodiac_filter_mode):
+                    yield (p, c, i, j), verdict, second, thirds[j]
+
+# ============================================================
+# DISPLAY ORDER
+# Buckets are sorted by display_key at load, so each (pattern, s2, s3)
+# product walked row-major is already sorted by (2nd char, 3rd char).
+# A k-way merge of those streams yields every candidate in the order the
+# results are shown: max_rows keeps the first N names, not an arbitrary
+# N, and nothing has to be sorted afterwards. Ties (duplicate characters)
+# keep generation order, i.e. this is a stable sort of iter_pairs().
+# ============================================================
+def _runs(bucket: List[dict]) -> List[range]:
+    """Index ranges of equal display_key in a sorted bucket (duplicate characters form runs > 1)."""
+    out, start = [], 0
+    for k in range(1, len(bucket) + 1):
+        if k == len(bucket) or display_key(bucket[k]) != display_key(bucket[start]):
+            out.append(range(start, k))
+            start = k
+    return out
+
+def _pair_stream(p: int, c: int, verdict: StrokePairVerdict, seconds: List[dict], thirds: List[dict],
+                 zodiac_name: str, zodiac_filter_mode: str):
+    # row-major, except that equal 2nd chars are interleaved per 3rd char so the
+    # stream stays sorted when the workbook lists a character twice
+    third_runs = _runs(thirds)
+    for run_i in _runs(seconds):
+        for run_j in third_runs:
+            for i in run_i:
+                for j in run_j:
+                    if pair_accepted(seconds[i], thirds[j], zodiac_name, zodiac_filter_mode):
+                        yield (p, c, i, j), verdict, seconds[i], thirds[j]
+
+def _merge_key(item) -> Tuple[str, str]:
+    return display_key(item[2]), display_key(item[3])
+
+def iter_pairs_display(
+    by_strokes: dict,
+    selected_patterns: List[str],
+    zodiac_name: str = "None",
+    zodiac_filter_mode: str = "OFF",
+    surname: Optional[dict] = None,
+    buckets: Optional[Dict[int, List[dict]]] = None,
+    combo_source: str = COMBO_SOURCE,
+) -> Iterator[Tuple[Tuple[int, int, int, int], StrokePairVerdict, dict, dict]]:
+    """iter_pairs() in display order (not resumable: positions are per stream)."""
+    first = surname_strokes(surname or FIRST_CHAR)
+    if buckets is None:
+        buckets = {}
+    streams = [
+        _pair_stream(p, c, verdict, seconds, thirds, zodiac_name, zodiac_filter_mode)
+        for p, c, verdict, seconds, thirds in _stroke_pair_streams(
+            by_strokes, selected_patterns, zodiac_name, zodiac_filter_mode, first, buckets, combo_source
+        )
+    ]
+    return heapq.merge(*streams, key=_merge_key)
+
+def iter_candidates(
+    by_strokes: dict,
+    by_char: dict,
+    selected_patterns: List[str],
+    zodiac_name: str = "None",
+    zodiac_filter_mode: str = "OFF",
+    start: Tuple[int, int, int, int] = (0, 0, 0, 0),
+    surname: Optional[dict] = None,
+    combo_source: str = COMBO_SOURCE,
+    order: str = "generation",
+) -> Iterator[Tuple[Tuple[int, int, int, int], dict]]:
+    """iter_pairs() (or iter_pairs_display() for order="display") that builds the full result row for each accepted pair."""
+    if order == "display":
+        if start != (0, 0, 0, 0):
+            raise ValueError("Display order cannot resume from a position")
+        pairs = iter_pairs_display(
+            by_strokes, selected_patterns, zodiac_name, zodiac_filter_mode, surname=surname, combo_source=combo_source
+        )
+    else:
+        pairs = iter_pairs(
+            by_strokes, selected_patterns, zodiac_name, zodiac_filter_mode, start, surname=surname, combo_source=combo_source
+        )
+    for position, verdict, second, third in pairs:
+        r = make_row(
+            verdict.pattern_key, second, third, by_char,
+            zodiac_name=zodiac_name,
+            zodiac_filter_mode=zodiac_filter_mode,
+            verdict=verdict,
+            surname=surname,
+        )
+        if r:
+            yield position, r
+
 def generate_rows(
     by_strokes: dict,
     by_char: dict,
@@ -211,32 +704,596 @@ def generate_rows(
     zodiac_name: str = "None",
     zodiac_filter_mode: str = "OFF",
     max_rows: int | None = None, 
+    surname: Optional[dict] = None,
+    combo_source: str = COMBO_SOURCE,
+    order: str = "display",  # display | generation
 ) -> List[dict]:
-    rows = []
-    for pattern_key in selected_patterns:
-        for s2, s3 in REQUESTED_COMBOS.get(pattern_key, []):
-            seconds = by_strokes.get(s2, [])
-            thirds = by_strokes.get(s3, [])
-            if not seconds or not thirds:
-                continue
-            for second, third in product(seconds, thirds):
-                r = make_row(
-                    pattern_key, second, third, by_char,
-                    zodiac_name=zodiac_name,
-                    zodiac_filter_mode=zodiac_filter_mode,
-                )
-                if r:
-                    rows.append(r)
-                    if max_rows is not None and len(rows) >= max_rows:
-                        return rows
-    return rows
-
-@st.cache_data(show_spinner=False)
-def generate_rows_cached(by_strokes, by_char, selected_patterns, zodiac_name, zodiac_filter_mode, max_rows):
-    # by_strokes/by_char are dicts (pickleable) → cache works
-    return generate_rows(
+    candidates = iter_candidates(
+        by_strokes, by_char, list(selected_patterns),
+        zodiac_name=zodiac_name,
+        zodiac_filter_mode=zodiac_filter_mode,
+        surname=surname,
+        combo_source=combo_source,
+        order=order,
+    )
+    return [r for _, r in islice(candidates, max_rows)]
+
+# ============================================================
+# PAGED GENERATION
+# A cursor is an opaque token for "resume after this position". It is
+# bound to the query it came from; reusing it with other filters raises.
+# ============================================================
+def _query_signature(selected_patterns, zodiac_name: str, zodiac_filter_mode: str,
+                     surname: Optional[dict] = None, combo_source: str = COMBO_SOURCE) -> str:
+    surname = surname or FIRST_CHAR
+    raw = repr((tuple(selected_patterns), zodiac_name, zodiac_filter_mode, surname["char"], surname_strokes(surname), combo_source))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:10]
+
+def encode_cursor(position: Tuple[int, int, int, int], signature: str) -> str:
+    raw = ".".join(str(v) for v in position) + "." + signature
+    return base64.urlsafe_b64encode(raw.encode("ascii")).decode("ascii")
+
+def decode_cursor(cursor: str, signature: str) -> Tuple[int, int, int, int]:
+    try:
+        *position, sig = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("ascii").split(".")
+        p, c, i, j = (int(v) for v in position)
+    except ValueError as exc:  # binascii.Error is a ValueError
+        raise ValueError(f"Malformed cursor: {cursor!r}") from exc
+    if sig != signature:
+        raise ValueError("Cursor belongs to a different query (patterns/zodiac/filter changed).")
+    return p, c, i, j
+
+def generate_page(
+    by_strokes: dict,
+    by_char: dict,
+    selected_patterns: List[str],
+    zodiac_name: str = "None",
+    zodiac_filter_mode: str = "OFF",
+    page_size: int = 100,
+    cursor: Optional[str] = None,
+    surname: Optional[dict] = None,
+    combo_source: str = COMBO_SOURCE,
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Produce one page of rows plus the cursor for the next page
+    (None when the result space is exhausted). Only this page is built.
+    """
+    selected_patterns = list(selected_patterns)
+    signature = _query_signature(selected_patterns, zodiac_name, zodiac_filter_mode, surname, combo_source)
+    start = decode_cursor(cursor, signature) if cursor else (0, 0, 0, 0)
+
+    candidates = iter_candidates(
         by_strokes, by_char, selected_patterns,
         zodiac_name=zodiac_name,
         zodiac_filter_mode=zodiac_filter_mode,
-        max_rows=max_rows,
+        start=start,
+        surname=surname,
+        combo_source=combo_source,
+    )
+    page = list(islice(candidates, page_size + 1))  # one extra row = "is there a next page?"
+    if len(page) <= page_size:
+        return [r for _, r in page], None
+
+    next_position, _ = page[-1]
+    return [r for _, r in page[:page_size]], encode_cursor(next_position, signature)
+
+# ============================================================
+# COLUMNAR RESULTS (result_store.ResultSet)
+# Generation stores only char indexes + codes; row dicts/frames are
+# built on demand for the slice that is displayed or exported.
+# ============================================================
+def _append_pair(rs: ResultSet, index_of: Dict[int, int], pattern_id: int,
+                 verdict: StrokePairVerdict, second: dict, third: dict) -> None:
+    codes = 0
+    if rs.zodiac_name not in ("None", ZODIAC_MATRIX):
+        codes = (
+            zodiac_code(second.get("zodiac_mask", 0), rs.zodiac_name)
+            | zodiac_code(third.get("zodiac_mask", 0), rs.zodiac_name) << 2
+        )
+    rs.append(index_of[id(second)], index_of[id(third)], pattern_id, verdict.destiny_total, codes)
+
+def generate_result_set(
+    db: List[dict],
+    by_strokes: dict,
+    selected_patterns: List[str],
+    zodiac_name: str = "None",
+    zodiac_filter_mode: str = "OFF",
+    max_rows: int | None = None,
+    engine: str = "python",  # python | numpy | sqlite | parallel
+    surname: Optional[dict] = None,
+    buckets: Optional[Dict[int, List[dict]]] = None,
+    combo_source: str = COMBO_SOURCE,
+    order: str = "display",  # display | generation
+    catalog: Optional[sqlite3.Connection] = None,
+    pool: Optional[Any] = None,
+) -> ResultSet:
+    """
+    Same candidates, same order as generate_rows(), stored columnar.
+    engine="numpy" computes the product with broadcast masks (engine_numpy.py);
+    engine="sqlite" runs it as an indexed join on `catalog` (see open_db_catalog);
+    engine="parallel" shards it across a process pool (engine_parallel.py; `pool`
+    from engine_parallel.shared_pool, else a temporary one).
+    """
+    if order not in ("display", "generation"):
+        raise ValueError(f"Unknown order: {order!r} (expected 'display' or 'generation')")
+    selected_patterns = list(selected_patterns)
+    if engine == "numpy":
+        from engine_numpy import generate_frame, frame_to_result_set  # imports logic; avoid a cycle
+        frame = generate_frame(db, by_strokes, selected_patterns, zodiac_name, zodiac_filter_mode, max_rows,
+                               surname=surname, combo_source=combo_source, order=order)
+        return frame_to_result_set(frame, selected_patterns, zodiac_name, zodiac_filter_mode, surname=surname)
+    if engine == "sqlite":
+        if catalog is None:
+            raise ValueError("engine='sqlite' needs a catalog connection (see open_db_catalog)")
+        return generate_result_set_sqlite(
+            catalog, selected_patterns, zodiac_name, zodiac_filter_mode, max_rows, surname, combo_source, order
+        )
+    if engine == "parallel":
+        from engine_parallel import generate_result_set_parallel  # imports logic; avoid a cycle
+        return generate_result_set_parallel(db, by_strokes, selected_patterns, zodiac_name, zodiac_filter_mode, max_rows,
+                                            surname=surname, combo_source=combo_source, order=order, pool=pool)
+    if engine != "python":
+        raise ValueError(f"Unknown engine: {engine!r} (expected 'python', 'numpy', 'sqlite' or 'parallel')")
+
+    index_of = {id(c): i for i, c in enumerate(db)}
+    rs = ResultSet(selected_patterns, zodiac_name, zodiac_filter_mode, surname=surname)
+    walk = iter_pairs_display if order == "display" else iter_pairs
+    pairs = walk(by_strokes, selected_patterns, zodiac_name, zodiac_filter_mode,
+                 surname=surname, buckets=buckets, combo_source=combo_source)
+    for (p, _, _, _), verdict, second, third in islice(pairs, max_rows):
+        _append_pair(rs, index_of, p, verdict, second, third)
+    return rs
+
+# ============================================================
+# SQLITE CATALOG ENGINE (catalog_sqlite.py)
+# The stroke pairs and their verdicts are resolved here exactly as for
+# the other engines; the character product, zodiac filter and ordering
+# run inside SQLite, so no by_strokes buckets are needed.
+# ============================================================
+def open_db_catalog(handle: DbHandle, catalog_dir: Optional[str] = CATALOG_DIR) -> Optional[sqlite3.Connection]:
+    """Connection to the handle's catalog, importing it from the loaded DB on first use; None if disabled/unwritable."""
+    if not catalog_dir:
+        return None
+    path = catalog_path(handle.fingerprint, catalog_dir)
+    conn = open_catalog(path, handle.fingerprint)
+    if conn is None:
+        try:
+            import_catalog(handle.db, path, handle.fingerprint)
+        except (OSError, sqlite3.Error):
+            return None
+        remove_stale_catalogs(path, catalog_dir, CATALOG_STALE_SECONDS)
+        conn = open_catalog(path, handle.fingerprint)
+    return conn
+
+def generate_result_set_sqlite(
+    conn: sqlite3.Connection,
+    selected_patterns: List[str],
+    zodiac_name: str = "None",
+    zodiac_filter_mode: str = "OFF",
+    max_rows: int | None = None,
+    surname: Optional[dict] = None,
+    combo_source: str = COMBO_SOURCE,
+    order: str = "display",
+) -> ResultSet:
+    first = surname_strokes(surname or FIRST_CHAR)
+    strokes = catalog_stroke_values(conn)
+    combos = []
+    for p, pattern_key in enumerate(selected_patterns):
+        for s2, s3 in combo_table_for_strokes(pattern_key, first, strokes, combo_source):
+            verdict = _resolve_stroke_pair(pattern_key, first, s2, s3)
+            if verdict is not None:
+                combos.append((p, s2, s3, verdict.destiny_total))
+
+    rs = ResultSet(selected_patterns, zodiac_name, zodiac_filter_mode, surname=surname)
+    for p, second, third, destiny_total, codes in query_pairs(
+        conn, combos, zodiac_name, zodiac_filter_mode, ZODIAC_MATRIX, max_rows, order
+    ):
+        rs.append(second, third, p, destiny_total, codes)
+    return rs
+
+def generate_result_page(
+    db: List[dict],
+    by_strokes: dict,
+    selected_patterns: List[str],
+    zodiac_name: str = "None",
+    zodiac_filter_mode: str = "OFF",
+    page_size: int = 100,
+    cursor: Optional[str] = None,
+    surname: Optional[dict] = None,
+    combo_source: str = COMBO_SOURCE,
+) -> Tuple[ResultSet, Optional[str]]:
+    """generate_page() returning a columnar page; cursors are interchangeable."""
+    selected_patterns = list(selected_patterns)
+    signature = _query_signature(selected_patterns, zodiac_name, zodiac_filter_mode, surname, combo_source)
+    start = decode_cursor(cursor, signature) if cursor else (0, 0, 0, 0)
+
+    index_of = {id(c): i for i, c in enumerate(db)}
+    rs = ResultSet(selected_patterns, zodiac_name, zodiac_filter_mode, surname=surname)
+    pairs = iter_pairs(by_strokes, selected_patterns, zodiac_name, zodiac_filter_mode, start,
+                       surname=surname, combo_source=combo_source)
+    for position, verdict, second, third in pairs:
+        if len(rs) == page_size:
+            return rs, encode_cursor(position, signature)
+        _append_pair(rs, index_of, position[0], verdict, second, third)
+    return rs, None
+
+def _result_verdict(rs: ResultSet, k: int, db: List[dict]) -> StrokePairVerdict:
+    return resolve_stroke_pair(
+        rs.pattern_key(k), rs.surname or FIRST_CHAR,
+        db[rs.second[k]]["strokes"], db[rs.third[k]]["strokes"],
+    )
+
+def result_rows(rs: ResultSet, db: List[dict], by_char: dict, ids: Optional[List[int]] = None) -> List[dict]:
+    """Full make_row() dicts for the given candidate ids (default: all)."""
+    out = []
+    for k in (range(len(rs)) if ids is None else ids):
+        out.append(make_row(
+            rs.pattern_key(k), db[rs.second[k]], db[rs.third[k]], by_char,
+            zodiac_name=rs.zodiac_name,
+            zodiac_filter_mode=rs.zodiac_filter_mode,
+            verdict=_result_verdict(rs, k, db),
+            surname=rs.surname,
+        ))
+    return out
+
+def result_matrix_passes(rs: ResultSet, k: int, db: List[dict], zodiac_name: str, zodiac_filter_mode: str) -> bool:
+    """matrix_passes() for a stored candidate, read straight from the status masks."""
+    return pair_passes(
+        zodiac_code(db[rs.second[k]].get("zodiac_mask", 0), zodiac_name),
+        zodiac_code(db[rs.third[k]].get("zodiac_mask", 0), zodiac_name),
+        zodiac_filter_mode,
+    )
+
+def result_frame(rs: ResultSet, db: List[dict]) -> pd.DataFrame:
+    """
+    Table view of a result set: one row per candidate, "_rid" = candidate id.
+    Matrix-mode sets also get one 2nd/3rd verdict column per rule set (e.g. 吉/—).
+    """
+    short = {"neutral": "—"}
+    cols: Dict[str, list] = {k: [] for k in (
+        "_rid", "Name", "Pinyin", "PatternComputed", "DestinyTotal", "DestinyElement", "PatternCalc",
+        "PatternMeaning_EN", "PatternMeaning_ZH", "DestinyMeaning_EN", "DestinyMeaning_ZH",
+    )}
+    surname = rs.surname or FIRST_CHAR
+    matrix = rs.zodiac_name == ZODIAC_MATRIX
+    if matrix:
+        cols.update({z: [] for z in ZODIAC_ORDER})
+
+    for k in range(len(rs)):
+        second, third = db[rs.second[k]], db[rs.third[k]]
+        v = _result_verdict(rs, k, db)
+        cols["_rid"].append(k)
+        cols["Name"].append(surname["char"] + second["char"] + third["char"])
+        cols["Pinyin"].append(f"{surname['pinyin']} {second['pinyin']} {third['pinyin']}")
+        cols["PatternComputed"].append(v.pattern_key)
+        cols["DestinyTotal"].append(v.destiny_total)
+        cols["DestinyElement"].append(v.destiny_element)
+        cols["PatternCalc"].append(v.pattern_calc)
+        cols["PatternMeaning_EN"].append(v.pattern_meaning_en)
+        cols["PatternMeaning_ZH"].append(v.pattern_meaning_zh)
+        cols["DestinyMeaning_EN"].append(v.destiny_meaning_en)
+        cols["DestinyMeaning_ZH"].append(v.destiny_meaning_zh)
+        if matrix:
+            m2, m3 = second.get("zodiac_mask", 0), third.get("zodiac_mask", 0)
+            for z in ZODIAC_ORDER:
+                a, b = STATUS_NAMES[zodiac_code(m2, z)], STATUS_NAMES[zodiac_code(m3, z)]
+                cols[z].append(f"{short.get(a, a)}/{short.get(b, b)}")
+
+    return pd.DataFrame(cols)
+
+# ============================================================
+# CHUNKED STREAMING (cli.py)
+# The whole result space as a sequence of small ResultSets, so bulk
+# exports hold one chunk at a time instead of max_rows candidates.
+# Duplicate rows (same name, pinyin, pattern and destiny; see the app's
+# drop_duplicates) are dropped in both orders with O(1)-ish state: rows
+# are only remembered until the run that can repeat them ends. In display
+# order that is the current name (identical names are adjacent); in
+# generation order the current (pattern, s2, s3) stream, since a
+# duplicate has the same pattern and the same characters' strokes.
+# ============================================================
+def iter_result_chunks(
+    db: List[dict],
+    by_strokes: dict,
+    selected_patterns: List[str],
+    zodiac_name: str = "None",
+    zodiac_filter_mode: str = "OFF",
+    chunk_size: int = 10000,
+    max_rows: int | None = None,
+    surname: Optional[dict] = None,
+    combo_source: str = COMBO_SOURCE,
+    order: str = "display",
+    dedupe: bool = True,
+) -> Iterator[ResultSet]:
+    selected_patterns = list(selected_patterns)
+    walk = iter_pairs_display if order == "display" else iter_pairs
+    pairs = walk(by_strokes, selected_patterns, zodiac_name, zodiac_filter_mode, surname=surname, combo_source=combo_source)
+    index_of = {id(c): i for i, c in enumerate(db)}
+
+    def new_chunk() -> ResultSet:
+        return ResultSet(selected_patterns, zodiac_name, zodiac_filter_mode, surname=surname)
+
+    chunk = new_chunk()
+    emitted = 0
+    run_key, seen = None, set()
+    for (p, _, _, _), verdict, second, third in pairs:
+        if max_rows is not None and emitted >= max_rows:
+            break
+        if dedupe:
+            name = (second["char"], third["char"])
+            run = name if order == "display" else (p, second["strokes"], third["strokes"])
+            if run != run_key:
+                run_key, seen = run, set()
+            row_key = (name, second["pinyin"], third["pinyin"], verdict.pattern_key, verdict.destiny_total)
+            if row_key in seen:
+                continue
+            seen.add(row_key)
+        _append_pair(chunk, index_of, p, verdict, second, third)
+        emitted += 1
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = new_chunk()
+    if len(chunk):
+        yield chunk
+
+# ============================================================
+# BATCH (several surnames, one pass)
+# Surnames with the same stroke counts produce identical candidate
+# columns, so each stroke group is generated once and every surname in
+# it gets a view (ResultSet.with_surname) sharing those arrays. All
+# groups share the zodiac-filtered stroke buckets and the cached
+# stroke-pair verdicts.
+# ============================================================
+def generate_batch(
+    db: List[dict],
+    by_strokes: dict,
+    surnames: List[dict],
+    selected_patterns: List[str],
+    zodiac_name: str = "None",
+    zodiac_filter_mode: str = "OFF",
+    max_rows: int | None = None,
+    combo_source: str = COMBO_SOURCE,
+    order: str = "display",
+) -> Dict[str, ResultSet]:
+    """{surname char: ResultSet} in the order given."""
+    buckets: Dict[int, List[dict]] = {}
+    by_group: Dict[Tuple[int, ...], ResultSet] = {}
+    out = {}
+    for surname in surnames:
+        key = surname_strokes(surname)
+        if key not in by_group:
+            by_group[key] = generate_result_set(
+                db, by_strokes, selected_patterns,
+                zodiac_name=zodiac_name,
+                zodiac_filter_mode=zodiac_filter_mode,
+                max_rows=max_rows,
+                surname=surname,
+                buckets=buckets,
+                combo_source=combo_source,
+                order=order,
+            )
+        out[surname["char"]] = by_group[key].with_surname(surname)
+    return out
+
+def distinct_result_ids(rs: ResultSet, db: List[dict]) -> List[int]:
+    """Candidate ids of rs minus duplicate rows (same key as iter_result_chunks drops), in order."""
+    seen, ids = set(), []
+    for k in range(len(rs)):
+        second, third = db[rs.second[k]], db[rs.third[k]]
+        row_key = ((second["char"], third["char"]), second["pinyin"], third["pinyin"], rs.pattern_key(k), rs.destiny[k])
+        if row_key not in seen:
+            seen.add(row_key)
+            ids.append(k)
+    return ids
+
+# ============================================================
+# PRUNING COUNTERS
+# How the whole 2nd x 3rd candidate space of a query is cut down, per
+# filter, in the order generation applies them: destiny total, pattern
+# elements, (hand-picked lists only) the combo table, then the zodiac
+# filter on the 2nd + 3rd characters. Counted from stroke-bucket sizes
+# and per-bucket zodiac mask histograms, never by walking candidates,
+# so it costs a few ms whatever the result size. "accepted" equals the
+# uncapped result count.
+# ============================================================
+def pruning_counts(
+    by_strokes: dict,
+    selected_patterns: List[str],
+    zodiac_name: str = "None",
+    zodiac_filter_mode: str = "OFF",
+    surname: Optional[dict] = None,
+    combo_source: str = COMBO_SOURCE,
+) -> Dict[str, int]:
+    first = surname_strokes(surname or FIRST_CHAR)
+    strokes = stroke_values(by_strokes)
+    masks = {s: Counter(c.get("zodiac_mask", 0) for c in by_strokes[s]) for s in strokes}
+    elements = {(s2, s3): compute_pattern_elements(first, s2, s3)["elements"] for s2 in strokes for s3 in strokes}
+    verdicts: Dict[Tuple[int, int], bool] = {}
+
+    def zodiac_accepted(s2: int, s3: int) -> int:
+        n = 0
+        for m2, k2 in masks[s2].items():
+            for m3, k3 in masks[s3].items():
+                ok = verdicts.get((m2, m3))
+                if ok is None:
+                    ok = verdicts[m2, m3] = pair_accepted(
+                        {"zodiac_mask": m2}, {"zodiac_mask": m3}, zodiac_name, zodiac_filter_mode)
+                n += k2 * k3 if ok else 0
+        return n
+
+    counts = dict.fromkeys(
+        ("candidates", "rejected_destiny", "rejected_pattern", "rejected_combo_table", "rejected_zodiac", "accepted"), 0)
+    for pattern_key in selected_patterns:
+        table = set(combo_table(pattern_key, first, by_strokes, combo_source)) if combo_source == "requested" else None
+        for (s2, s3), pattern_elements in elements.items():
+            product = len(by_strokes[s2]) * len(by_strokes[s3])
+            counts["candidates"] += product
+            if not allowed_destiny_total(pattern_key, sum(first) + s2 + s3):
+                counts["rejected_destiny"] += product
+            elif pattern_elements != pattern_key:
+                counts["rejected_pattern"] += product
+            elif table is not None and (s2, s3) not in table:
+                counts["rejected_combo_table"] += product
+            else:
+                accepted = zodiac_accepted(s2, s3)
+                counts["accepted"] += accepted
+                counts["rejected_zodiac"] += product - accepted
+    return counts
+
+# ============================================================
+# PERSISTENT RESULTS (result_cache.ResultCache)
+# Second cache level below the in-process one: a miss there checks the
+# SQLite store shared by all processes before generating, and stores
+# what it generated. Keys hold the DB fingerprint and RULES_DIGEST (the
+# rule tables + RESULT_CACHE_VERSION), so neither an edited workbook nor
+# a deploy with other rules ever reads old results; those simply age out (LRU).
+# ============================================================
+ZODIAC_FILTER_MODES = ["OFF", "EXCLUDE_XIONG", "REQUIRE_JI"]
+RESULT_CACHE_VERSION = 1  # bump when the solver, generation or workbook parsing changes what a query returns
+RULES_DIGEST = hashlib.sha256(json.dumps(
+    [RESULT_CACHE_VERSION, PATTERN_TOTAL_FILTERS, REQUESTED_COMBOS, ZODIAC_RULES],
+    ensure_ascii=False, sort_keys=True, default=sorted,
+).encode("utf-8")).hexdigest()
+
+def result_cache_key(fingerprint: str, selected_patterns, zodiac_name: str, zodiac_filter_mode: str,
+                     max_rows: Optional[int], surname: Optional[dict] = None, combo_source: str = COMBO_SOURCE) -> str:
+    # engine is not part of the key: both engines produce identical result sets
+    raw = json.dumps(
+        [RULES_DIGEST, fingerprint, list(selected_patterns), zodiac_name, zodiac_filter_mode, max_rows,
+         surname or FIRST_CHAR, combo_source],
+        ensure_ascii=False, sort_keys=True,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+# Queries persistent_result_set answered, per DB fingerprint, so a hot
+# reload (hot_reload.py) knows which cached result sets it can carry over.
+SERVED_QUERIES_MAX = 1024
+_SERVED: Dict[str, Dict[str, tuple]] = {}
+_SERVED_LOCK = threading.Lock()
+
+def record_served_query(fingerprint: str, key: str, query: tuple) -> None:
+    with _SERVED_LOCK:
+        served = _SERVED.setdefault(fingerprint, {})
+        served.pop(key, None)
+        served[key] = query
+        while len(served) > SERVED_QUERIES_MAX:
+            del served[next(iter(served))]
+
+def served_queries(fingerprint: str) -> Dict[str, tuple]:
+    """{result cache key: (selected_patterns, zodiac_name, zodiac_filter_mode, max_rows, surname, combo_source)}"""
+    with _SERVED_LOCK:
+        return dict(_SERVED.get(fingerprint, {}))
+
+def forget_served_queries(fingerprint: str) -> None:
+    with _SERVED_LOCK:
+        _SERVED.pop(fingerprint, None)
+
+@lru_cache(maxsize=None)
+def result_cache(path: Optional[str] = RESULT_CACHE_PATH, max_bytes: int = RESULT_CACHE_MAX_BYTES) -> Optional[ResultCache]:
+    """Process-wide ResultCache for path; None when disabled or the location isn't writable."""
+    if not path:
+        return None
+    try:
+        return ResultCache(path, max_bytes)
+    except (OSError, sqlite3.Error):
+        return None
+
+def persistent_result_set(handle: DbHandle, selected_patterns, zodiac_name: str, zodiac_filter_mode: str,
+                          max_rows: Optional[int], engine: str = "python", surname: Optional[dict] = None,
+                          combo_source: str = COMBO_SOURCE) -> ResultSet:
+    """generate_result_set() through the on-disk cache (no Streamlit involved: safe in worker threads)."""
+    cache = result_cache()
+    key = result_cache_key(handle.fingerprint, selected_patterns, zodiac_name, zodiac_filter_mode, max_rows, surname, combo_source)
+    rs = cache.get(key) if cache else None
+    if rs is None:
+        catalog = open_db_catalog(handle) if engine == "sqlite" else None
+        if engine == "sqlite" and catalog is None:
+            engine = "python"  # catalog disabled or not writable: same results, in memory
+        pool = None
+        if engine == "parallel":
+            from engine_parallel import shared_pool
+            pool = shared_pool(handle)
+        try:
+            rs = generate_result_set(
+                handle.db, handle.by_strokes, selected_patterns,
+                zodiac_name=zodiac_name,
+                zodiac_filter_mode=zodiac_filter_mode,
+                max_rows=max_rows,
+                engine=engine,
+                surname=surname,
+                combo_source=combo_source,
+                catalog=catalog,
+                pool=pool,
+            )
+        finally:
+            if catalog is not None:
+                catalog.close()
+        if cache:
+            cache.put(key, rs)
+    elif rs.surname != surname:
+        rs = rs.with_surname(surname)  # stored under the equivalent spec (None = FIRST_CHAR)
+    if cache:
+        query = (tuple(selected_patterns), zodiac_name, zodiac_filter_mode, max_rows, surname, combo_source)
+        record_served_query(handle.fingerprint, key, query)
+    return rs
+
+def warmup_queries() -> List[Tuple[str, str]]:
+    """(zodiac, generation filter mode) pairs the app actually generates for (matrix mode generates unfiltered)."""
+    out = []
+    for zodiac_name in ZODIAC_OPTIONS:
+        modes = ["OFF"] if zodiac_name in ("None", ZODIAC_MATRIX) else ZODIAC_FILTER_MODES
+        out.extend((zodiac_name, mode) for mode in modes)
+    return out
+
+def warm_result_cache(handle: DbHandle, selected_patterns, max_rows: Optional[int],
+                      surname: Optional[dict] = None, combo_source: str = COMBO_SOURCE) -> int:
+    """Precompute every warmup_queries() combination into the on-disk cache; returns how many were generated."""
+    cache = result_cache()
+    if cache is None:
+        return 0
+    generated = 0
+    for zodiac_name, mode in warmup_queries():
+        key = result_cache_key(handle.fingerprint, selected_patterns, zodiac_name, mode, max_rows, surname, combo_source)
+        if cache.get(key) is None:
+            persistent_result_set(handle, selected_patterns, zodiac_name, mode, max_rows, "numpy", surname, combo_source)
+            generated += 1
+    return generated
+
+# Result caches key on (handle fingerprint, query) and return the shared ResultSet.
+# ResultSet.select()/with_surname() build new objects, so callers never mutate it.
+# Each keeps at most APP_RESULT_SETS / APP_RESULT_PAGES entries (evicted sets stay
+# in the on-disk result cache), so queries and hot reloads can't grow them unbounded.
+@st.cache_resource(show_spinner=False, hash_funcs=HANDLE_HASH, max_entries=APP_RESULT_SETS)
+def generate_result_set_cached(handle: DbHandle, selected_patterns, zodiac_name, zodiac_filter_mode, max_rows,
+                               engine="python", surname=None, combo_source=COMBO_SOURCE):
+    return persistent_result_set(
+        handle, selected_patterns, zodiac_name, zodiac_filter_mode, max_rows, engine, surname, combo_source,
+    )
+
+@st.cache_resource(show_spinner=False, hash_funcs=HANDLE_HASH, max_entries=APP_RESULT_PAGES)
+def generate_result_page_cached(handle: DbHandle, selected_patterns, zodiac_name, zodiac_filter_mode, page_size, cursor,
+                                surname=None, combo_source=COMBO_SOURCE):
+    return generate_result_page(
+        handle.db, handle.by_strokes, selected_patterns,
+        zodiac_name=zodiac_name,
+        zodiac_filter_mode=zodiac_filter_mode,
+        page_size=page_size,
+        cursor=cursor,
+        surname=surname,
+        combo_source=combo_source,
     )
+
+@st.cache_resource(show_spinner=False, hash_funcs=HANDLE_HASH, max_entries=APP_RESULT_SETS)
+def search_index_cached(handle: DbHandle, selected_patterns, zodiac_name, zodiac_filter_mode, max_rows,
+                        engine="python", surname=None, combo_source=COMBO_SOURCE):
+    """SearchIndex over generate_result_set_cached() with the same arguments (ids match that result set)."""
+    rs = generate_result_set_cached(
+        handle, selected_patterns, zodiac_name, zodiac_filter_mode, max_rows,
+        engine, surname, combo_source,
+    )
+    return SearchIndex(rs, handle.db)
+
+@st.cache_resource(show_spinner=False, hash_funcs=HANDLE_HASH, max_entries=APP_RESULT_PAGES)
+def pruning_counts_cached(handle: DbHandle, selected_patterns, zodiac_name, zodiac_filter_mode,
+                          surname=None, combo_source=COMBO_SOURCE) -> Dict[str, int]:
+    return pruning_counts(handle.by_strokes, list(selected_patterns), zodiac_name, zodiac_filter_mode, surname, combo_source)
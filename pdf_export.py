@@ -1,107 +1,568 @@
+import gc
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
 from io import BytesIO
+from itertools import accumulate, groupby
+from typing import Callable, Dict, List, Optional, Tuple
+
 from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
 from reportlab.pdfgen import canvas
 
-def _wrap_text(canvas_obj, text, x, y, max_width, line_height=14, font_name="Helvetica", font_size=10):
-    canvas_obj.setFont(font_name, font_size)
-    words = (text or "").split()
-    line = ""
+from config import PDF_BLOCK_CACHE_SIZE, PDF_CHUNK_SIZE, PDF_WORKERS
+
+# ============================================================
+# FONTS
+# Helvetica only covers cp1252, so every glyph it can't encode (CJK,
+# fullwidth punctuation, pinyin like ā/ǚ) is drawn with STSong-Light,
+# one of ReportLab's built-in Adobe CID fonts (no font file to ship;
+# GB coverage includes traditional characters and pinyin). Text is
+# split into runs per font; widths are cached per glyph and font.
+# ============================================================
+CJK_FONT = "STSong-Light"
+MARGIN_BOTTOM = 40
+
+# Kangxi radicals (⼈ U+2F08 ...) are drawn as the unified ideograph they equal (人)
+_KANGXI = {cp: unicodedata.normalize("NFKC", chr(cp)) for cp in range(0x2F00, 0x2FD6)}
+
+
+def _ensure_fonts() -> None:
+    if CJK_FONT not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(UnicodeCIDFont(CJK_FONT))
+
+
+@lru_cache(maxsize=None)
+def _glyph(ch: str, latin_font: str) -> Tuple[str, float]:
+    """(font that draws ch, advance width at 1pt)."""
+    _ensure_fonts()
+    try:
+        ch.encode("cp1252")
+        font = latin_font
+    except UnicodeEncodeError:
+        font = CJK_FONT
+    return font, pdfmetrics.stringWidth(ch, font, 1)
+
+
+def _font_runs(text: str, latin_font: str) -> List[Tuple[str, str]]:
+    return [(font, "".join(ch for ch, _ in group))
+            for font, group in groupby(((ch, _glyph(ch, latin_font)[0]) for ch in text), key=lambda t: t[1])]
+
+
+def _draw(canvas_obj, x, y, text, font_name="Helvetica", font_size=10) -> None:
+    """drawString with per-glyph font fallback (one text object; runs advance the cursor)."""
+    t = canvas_obj.beginText(x, y)
+    for font, run in _font_runs(text.translate(_KANGXI), font_name):
+        t.setFont(font, font_size)
+        t.textOut(run)
+    canvas_obj.drawText(t)
+
+
+# ============================================================
+# LINE BREAKING
+# Latin words break at spaces; CJK text may break between any two
+# characters, except that closing punctuation never starts a line and
+# opening punctuation never ends one. One pass over prefix widths: the
+# last allowed break is remembered, so each glyph width is looked up once
+# and only the characters carried over to a new line are rescanned.
+# ============================================================
+_NO_LINE_START = set("，。、；：？！）」』》〉】〕〗．…‥·・ー～%,.;:!?)]}")
+_NO_LINE_END = set("（「『《〈【〔〖([{")
+
+
+def _is_wide(ch: str) -> bool:
+    return ch >= "\u2e80"  # CJK radicals/ideographs, kana, fullwidth forms
+
+
+def _break_allowed(prev: str, cur: str) -> bool:
+    """May a line end between prev and cur?"""
+    if cur == " " or prev == " ":
+        return True
+    if not (_is_wide(prev) or _is_wide(cur)):
+        return False  # inside a Latin word
+    return cur not in _NO_LINE_START and prev not in _NO_LINE_END
+
+
+def break_lines(text: str, max_width: float, font_name: str = "Helvetica", font_size: float = 10) -> List[str]:
+    """Lines of text that each fit max_width points (a word wider than a line is split)."""
     lines = []
+    for para in (text or "").translate(_KANGXI).split("\n"):
+        n = len(para)
+        prefix = [0.0] + list(accumulate(_glyph(ch, font_name)[1] * font_size for ch in para))
+        start, brk = 0, None
+        while start < n and para[start] == " ":
+            start += 1
+        i = start
+        while i < n:
+            if i > start and _break_allowed(para[i - 1], para[i]):
+                brk = i
+            if para[i] == " " or i == start or prefix[i + 1] - prefix[start] <= max_width:
+                i += 1  # fits (trailing spaces never overflow)
+                continue
+            cut = brk if brk is not None else i
+            lines.append(para[start:cut].rstrip(" "))
+            start, brk = cut, None
+            while start < n and para[start] == " ":
+                start += 1
+            i = start  # rescan the carried-over characters on the new line
+        tail = para[start:].rstrip(" ")
+        if tail or not lines:
+            lines.append(tail)
+    return lines
 
-    for w in words:
-        test = (line + " " + w).strip()
-        if canvas_obj.stringWidth(test, font_name, font_size) <= max_width:
-            line = test
-        else:
-            if line:
-                lines.append(line)
-            line = w
 
-    if line:
-        lines.append(line)
+# ============================================================
+# REPORT LAYOUT
+# One canvas page flow shared by every export path. _ReportCanvas
+# numbers each page in its footer as it is finished; a part rendered
+# in parallel is told its first page number (see export_pdf).
+# ============================================================
+class _ReportCanvas(canvas.Canvas):
+    def __init__(self, *args, first_page: int = 1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.first_page = first_page
 
-    for ln in lines:
-        canvas_obj.drawString(x, y, ln)
-        y -= line_height
-    return y
+    def showPage(self):
+        _footer(self, self.first_page + self.getPageNumber() - 1)
+        super().showPage()
+
+
+def _footer(c, page_no: int) -> None:
+    c.setFont("Helvetica", 8)
+    c.drawCentredString(A4[0] / 2, 20, f"— {page_no} —")
 
-def generate_pdf(favorites, lang_mode="Both"):
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-    y = height - 40
 
+def _surnames(favorites) -> List[str]:
+    return list(dict.fromkeys(f.get("Surname", "") for f in favorites if f.get("Surname")))
+
+
+def _draw_title(c, surnames, y):
     c.setFont("Helvetica-Bold", 14)
     c.drawString(40, y, "Chinese Name Analysis Report")
     y -= 18
-    c.setFont("Helvetica", 10)
-    c.drawString(40, y, "Favorites comparison export (五格・五行組合・總格數理)")
-    y -= 24
+    _draw(c, 40, y, "Favorites comparison export (五格・五行組合・總格數理)")
+    y -= 14
+    if surnames:
+        _draw(c, 40, y, "Surname(s) 姓氏: " + ", ".join(surnames))
+        y -= 14
+    return y - 10
 
-    for idx, f in enumerate(favorites, start=1):
-        if y < 140:
-            c.showPage()
-            y = height - 40
 
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(40, y, f"{idx}. {f['Name']}  ({f['Pinyin']})")
-        y -= 16
+# ============================================================
+# FAVORITE BLOCKS
+# A favorite is laid out once into a block: the lines it draws, already
+# wrapped and split into font runs, each with the y it needs to fit on
+# the current page. Placing a block only replays it, so the layout
+# (line breaking and font runs, most of the rendering time) is cached
+# per (Name, lang_mode, LAYOUT_VERSION) and reused across exports as
+# long as the row's content is unchanged. Re-exporting a comparison set
+# that grew or changed lays out only the new or edited candidates; the
+# pages are reassembled from the blocks. Numbering and page breaks
+# depend on position, so they are applied at placement.
+# ============================================================
+LAYOUT_VERSION = 1  # bump whenever _layout_favorite draws something different
 
-        fg = f["FiveGrids"]
-        c.setFont("Helvetica", 10)
-        c.drawString(40, y, f"Pattern (組合): {f['PatternComputed']}   |   Total (總格): {f['DestinyTotal']} ({f['DestinyElement']})")
-        y -= 14
-        c.drawString(
-            40, y,
-            f"Five Grids 五格: 天格 {fg['天格'][0]}({fg['天格'][1]}) · 人格 {fg['人格'][0]}({fg['人格'][1]}) · "
-            f"地格 {fg['地格'][0]}({fg['地格'][1]}) · 總格 {fg['總格'][0]}({fg['總格'][1]})"
-        )
-        y -= 16
+Op = tuple  # ("text", x, size, runs) | ("head", x, size, runs) | ("label", x, text) | ("rule",)
+Block = Tuple[Tuple[Optional[float], float, Optional[Op]], ...]  # (need_y, dy, op) per line
 
-        c.setFont("Helvetica-Oblique", 10)
-        c.drawString(40, y, "Pattern calculation (+1 rule):")
-        y -= 14
-        c.setFont("Helvetica", 10)
-        y = _wrap_text(c, f.get("PatternCalc", ""), 50, y, max_width=width - 90, line_height=13)
+_BLOCKS: "OrderedDict[tuple, Tuple[tuple, Block]]" = OrderedDict()
+_BLOCKS_LOCK = threading.Lock()
+_BLOCK_STATS = {"hits": 0, "misses": 0}
+
+
+def _runs(text, font_name="Helvetica"):
+    return tuple(_font_runs(text.translate(_KANGXI), font_name))
+
+
+def _wrapped(items, text, x, max_width, line_height=14):
+    for ln in break_lines(text, max_width):
+        items.append((MARGIN_BOTTOM, line_height, ("text", x, 10, _runs(ln))))
 
-        y -= 6
-        c.setFont("Helvetica-Oblique", 10)
-        c.drawString(40, y, "Meanings:")
-        y -= 14
-        c.setFont("Helvetica", 10)
 
+def _layout_favorite(f, lang_mode) -> Block:
+    width = A4[0]
+    fg = f["FiveGrids"]
+    items = [
+        (140, 16, ("head", 40, 12, _runs(f"{f['Name']}  ({f['Pinyin']})", "Helvetica-Bold"))),
+        (None, 14, ("text", 40, 10, _runs(
+            f"Pattern (組合): {f['PatternComputed']}   |   Total (總格): {f['DestinyTotal']} ({f['DestinyElement']})"))),
+        (None, 16, ("text", 40, 10, _runs(
+            f"Five Grids 五格: 天格 {fg['天格'][0]}({fg['天格'][1]}) · 人格 {fg['人格'][0]}({fg['人格'][1]}) · "
+            f"地格 {fg['地格'][0]}({fg['地格'][1]}) · 總格 {fg['總格'][0]}({fg['總格'][1]})"))),
+        (None, 14, ("label", 40, "Pattern calculation (+1 rule):")),
+    ]
+    _wrapped(items, f.get("PatternCalc", ""), 50, width - 90, line_height=13)
+    items += [(None, 6, None), (None, 14, ("label", 40, "Meanings:"))]
+
+    if lang_mode in ("English", "Both"):
+        _wrapped(items, "Pattern (EN): " + (f.get("PatternMeaning_EN") or "—"), 50, width - 90)
+        _wrapped(items, "Destiny (EN): " + (f.get("DestinyMeaning_EN") or "—"), 50, width - 90)
+        items.append((None, 4, None))
+    if lang_mode in ("Chinese", "Both"):
+        _wrapped(items, "組合(中): " + (f.get("PatternMeaning_ZH") or "—"), 50, width - 90)
+        _wrapped(items, "數理(中): " + (f.get("DestinyMeaning_ZH") or "—"), 50, width - 90)
+        items.append((None, 4, None))
+
+    items.append((None, 14, ("label", 40, "Characters:")))
+    for ch in f.get("CharDetails", []):
+        line = f"{ch.get('char','')} ({ch.get('pinyin','')}), {ch.get('strokes','')} strokes, element {ch.get('element','')}"
+        items.append((120, 12, ("text", 50, 10, _runs(line))))
         if lang_mode in ("English", "Both"):
-            y = _wrap_text(c, "Pattern (EN): " + (f.get("PatternMeaning_EN") or "—"), 50, y, width - 90)
-            y = _wrap_text(c, "Destiny (EN): " + (f.get("DestinyMeaning_EN") or "—"), 50, y, width - 90)
-            y -= 4
+            _wrapped(items, "EN: " + (ch.get("meaning_en") or "—"), 60, width - 100, line_height=12)
         if lang_mode in ("Chinese", "Both"):
-            y = _wrap_text(c, "組合(中): " + (f.get("PatternMeaning_ZH") or "—"), 50, y, width - 90)
-            y = _wrap_text(c, "數理(中): " + (f.get("DestinyMeaning_ZH") or "—"), 50, y, width - 90)
-            y -= 4
+            _wrapped(items, "中: " + (ch.get("meaning_zh") or "—"), 60, width - 100, line_height=12)
+        items.append((None, 6, None))
 
-        c.setFont("Helvetica-Oblique", 10)
-        c.drawString(40, y, "Characters:")
-        y -= 14
-        c.setFont("Helvetica", 10)
-
-        for ch in f.get("CharDetails", []):
-            if y < 120:
-                c.showPage()
-                y = height - 40
-                c.setFont("Helvetica", 10)
-
-            line = f"{ch.get('char','')} ({ch.get('pinyin','')}), {ch.get('strokes','')} strokes, element {ch.get('element','')}"
-            c.drawString(50, y, line)
-            y -= 12
-            if lang_mode in ("English", "Both"):
-                y = _wrap_text(c, "EN: " + (ch.get("meaning_en") or "—"), 60, y, width - 100, line_height=12)
-            if lang_mode in ("Chinese", "Both"):
-                y = _wrap_text(c, "中: " + (ch.get("meaning_zh") or "—"), 60, y, width - 100, line_height=12)
-            y -= 6
-
-        c.line(40, y, width - 40, y)
-        y -= 16
+    items.append((None, 16, ("rule",)))
+    return tuple(items)
+
+
+def _block_content(f) -> tuple:
+    """Everything _layout_favorite reads from a row; a cached block is stale when this differs."""
+    return (
+        f["Pinyin"], f["PatternComputed"], f["DestinyTotal"], f["DestinyElement"], tuple(f["FiveGrids"].items()),
+        f.get("PatternCalc"), f.get("PatternMeaning_EN"), f.get("DestinyMeaning_EN"),
+        f.get("PatternMeaning_ZH"), f.get("DestinyMeaning_ZH"),
+        tuple((ch.get("char"), ch.get("pinyin"), ch.get("strokes"), ch.get("element"),
+               ch.get("meaning_en"), ch.get("meaning_zh")) for ch in f.get("CharDetails", [])),
+    )
+
+
+def block_cached(f, lang_mode) -> bool:
+    cached = _BLOCKS.get((f["Name"], lang_mode, LAYOUT_VERSION))
+    return cached is not None and cached[0] == _block_content(f)
+
+
+def _cached_block(f, lang_mode) -> Optional[Block]:
+    """f's cached block, or None when it must be laid out (counted as a hit or a miss)."""
+    key = (f["Name"], lang_mode, LAYOUT_VERSION)
+    with _BLOCKS_LOCK:
+        cached = _BLOCKS.get(key)
+        if cached is not None and cached[0] == _block_content(f):
+            _BLOCKS.move_to_end(key)
+            _BLOCK_STATS["hits"] += 1
+            return cached[1]
+        _BLOCK_STATS["misses"] += 1
+    return None
+
+
+def _store_block(f, lang_mode, block: Block) -> None:
+    key = (f["Name"], lang_mode, LAYOUT_VERSION)
+    with _BLOCKS_LOCK:
+        _BLOCKS[key] = (_block_content(f), block)
+        _BLOCKS.move_to_end(key)
+        while len(_BLOCKS) > PDF_BLOCK_CACHE_SIZE:
+            _BLOCKS.popitem(last=False)
 
+
+def favorite_block(f, lang_mode) -> Block:
+    """The laid-out block for f, from the cache when f's content is unchanged."""
+    block = _cached_block(f, lang_mode)
+    if block is None:
+        block = _layout_favorite(f, lang_mode)
+        _store_block(f, lang_mode, block)
+    return block
+
+
+def block_cache_stats() -> dict:
+    with _BLOCKS_LOCK:
+        return dict(_BLOCK_STATS, blocks=len(_BLOCKS))
+
+
+def clear_block_cache() -> None:
+    with _BLOCKS_LOCK:
+        _BLOCKS.clear()
+        _BLOCK_STATS.update(hits=0, misses=0)
+
+
+def _text(c, x, y, size, runs) -> None:
+    t = c.beginText(x, y)
+    for font, run in runs:
+        t.setFont(font, size)
+        t.textOut(run)
+    c.drawText(t)
+
+
+def _place(c, idx, block: Block, y):
+    """Draw a favorite block numbered idx from y down, breaking pages where a line doesn't fit; returns y."""
+    top = A4[1] - 40
+    for need, dy, op in block:
+        if need is not None and y < need:
+            c.showPage()
+            y = top
+        if op is None:
+            pass
+        elif op[0] == "text":
+            _text(c, op[1], y, op[2], op[3])
+        elif op[0] == "head":
+            runs = op[3]
+            prefix = f"{idx}. "
+            if runs and runs[0][0] == "Helvetica-Bold":
+                runs = ((runs[0][0], prefix + runs[0][1]),) + runs[1:]
+            else:
+                runs = (("Helvetica-Bold", prefix),) + runs
+            _text(c, op[1], y, op[2], runs)
+        elif op[0] == "label":
+            c.setFont("Helvetica-Oblique", 10)
+            c.drawString(op[1], y, op[2])
+        else:
+            c.line(40, y, A4[0] - 40, y)
+        y -= dy
+    return y
+
+
+def _render(c, favorites, lang_mode, start=1, surnames=None, on_favorite=None, blocks=None):
+    """
+    Draw favorites numbered from `start` onto c; the report title first
+    unless surnames is None. blocks, if given, are the favorites' blocks
+    (the block cache is not used).
+    """
+    y = A4[1] - 40
+    if surnames is not None:
+        y = _draw_title(c, surnames, y)
+    if blocks is None:
+        blocks = (favorite_block(f, lang_mode) for f in favorites)
+    for idx, block in enumerate(blocks, start=start):
+        y = _place(c, idx, block, y)
+        if on_favorite:
+            on_favorite(idx)
+
+
+def generate_pdf(favorites, lang_mode="Both"):
+    buffer = BytesIO()
+    c = _ReportCanvas(buffer, pagesize=A4)
+    _render(c, favorites, lang_mode, surnames=_surnames(favorites))
     c.save()
     buffer.seek(0)
     return buffer
+
+
+# ============================================================
+# LARGE EXPORTS (export_pdf)
+# Hundreds or thousands of candidates, rendered by a process pool in
+# three steps, with pages identical to the serial render:
+#   1. layout: favorites missing from the block cache are laid out in
+#      chunks of PDF_CHUNK_SIZE by the workers and stored in the main
+#      cache (so a later re-export is incremental whichever path ran);
+#   2. pagination: the main process replays the page flow (_page_flow,
+#      arithmetic only) and cuts the report into parts at favorites that
+#      start a new page, each part about chunk_size favorites long;
+#   3. parts: each worker renders one part from its blocks, starting at
+#      the top of its first page with that page's number in the footer.
+# _concat_parts then streams the parts into the target one at a time,
+# renumbering their objects (pypdf reads each part), so only one part
+# is held in memory while merging; the serial path holds one canvas.
+# Without pypdf, with one worker, or when at most one chunk's worth of
+# blocks is missing from the block cache, the report is rendered
+# serially straight to the file.
+# progress(fraction, message) is called as chunks finish and while merging.
+# ============================================================
+ProgressFn = Callable[[float, str], None]
+
+
+def _layout_part(favorites, lang_mode) -> List[Block]:
+    return [_layout_favorite(f, lang_mode) for f in favorites]
+
+
+def _render_part(blocks, start, first_page, surnames, path) -> int:
+    """Render blocks numbered from `start`, beginning at the top of page first_page; returns the page count."""
+    c = _ReportCanvas(path, pagesize=A4, first_page=first_page)
+    _render(c, None, None, start=start, surnames=surnames, blocks=blocks)
+    pages = c.getPageNumber()
+    c.save()
+    return pages
+
+
+def _page_flow(blocks, y) -> List[Optional[int]]:
+    """Per block, the page it starts at the top of (as _place would break), or None if it starts mid-page."""
+    top = A4[1] - 40
+    page = 1
+    starts = []
+    for block in blocks:
+        fresh = None
+        for k, (need, dy, _) in enumerate(block):
+            if need is not None and y < need:
+                page += 1
+                y = top
+                if k == 0:
+                    fresh = page
+            y -= dy
+        starts.append(fresh)
+    return starts
+
+
+def _split_parts(starts, chunk_size) -> List[Tuple[int, int, int]]:
+    """(first block, end block, first page) per part; parts begin only where a block starts a page."""
+    parts = [(0, 1)]
+    for i, page in enumerate(starts):
+        if page is not None and i - parts[-1][0] >= chunk_size:
+            parts.append((i, page))
+    ends = [i for i, _ in parts[1:]] + [len(starts)]
+    return [(i, end, page) for (i, page), end in zip(parts, ends)]
+
+
+def _concat_parts(part_paths, path) -> int:
+    """Write the pages of every part, in order, to path as one PDF; returns the page count."""
+    from pypdf import PdfReader
+    from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject, StreamObject
+
+    offsets = {}  # object number -> file offset; 1 = catalog, 2 = page tree
+    kids = ArrayObject()
+    pages_ref = IndirectObject(2, 0, None)
+
+    def write_obj(fh, num, obj):
+        offsets[num] = fh.tell()
+        fh.write(f"{num} 0 obj\n".encode())
+        obj.write_to_stream(fh)
+        fh.write(b"\nendobj\n")
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        next_num = 3
+        for part in part_paths:
+            reader = PdfReader(part)
+            numbers: Dict[Tuple[int, int], int] = {}
+            queue = []
+
+            def ref(ind):
+                nonlocal next_num
+                key = (ind.idnum, ind.generation)
+                if key not in numbers:
+                    numbers[key] = next_num
+                    next_num += 1
+                    queue.append(ind)
+                return IndirectObject(numbers[key], 0, None)
+
+            def remap(obj):
+                if isinstance(obj, IndirectObject):
+                    return ref(obj)
+                if isinstance(obj, StreamObject):
+                    out = obj.__class__()
+                    out._data = obj._data  # still encoded: copied as is
+                    out.update({k: remap(v) for k, v in obj.items()})
+                    return out
+                if isinstance(obj, DictionaryObject):
+                    return DictionaryObject({k: remap(v) for k, v in obj.items()})
+                if isinstance(obj, ArrayObject):
+                    return ArrayObject(remap(v) for v in obj)
+                return obj
+
+            for page in reader.pages:
+                page_obj = remap(DictionaryObject({k: v for k, v in page.items() if k != "/Parent"}))
+                page_obj[NameObject("/Parent")] = pages_ref
+                num = next_num
+                next_num += 1
+                kids.append(IndirectObject(num, 0, None))
+                write_obj(fh, num, page_obj)
+                while queue:  # content streams and resources this page reaches
+                    ind = queue.pop()
+                    write_obj(fh, numbers[(ind.idnum, ind.generation)], remap(ind.get_object()))
+            del reader
+            gc.collect()  # a PdfReader is a web of reference cycles: free each part before the next
+
+        write_obj(fh, 2, DictionaryObject({
+            NameObject("/Type"): NameObject("/Pages"), NameObject("/Count"): NumberObject(len(kids)),
+            NameObject("/Kids"): kids,
+        }))
+        write_obj(fh, 1, DictionaryObject({
+            NameObject("/Type"): NameObject("/Catalog"), NameObject("/Pages"): pages_ref,
+        }))
+        xref = fh.tell()
+        fh.write(f"xref\n0 {next_num}\n0000000000 65535 f \n".encode())
+        fh.write("".join(f"{offsets[n]:010d} 00000 n \n" for n in range(1, next_num)).encode())
+        fh.write(f"trailer\n<< /Size {next_num} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    os.replace(tmp, path)
+    return len(kids)
+
+
+def _export_serial(favorites, path, lang_mode, progress: Optional[ProgressFn]) -> int:
+    total = len(favorites)
+    step = max(1, total // 100)
+
+    def on_favorite(idx):
+        if progress and (idx % step == 0 or idx == total):
+            progress(idx / max(1, total), f"Rendered {idx}/{total}")
+
+    c = _ReportCanvas(path, pagesize=A4)
+    _render(c, favorites, lang_mode, surnames=_surnames(favorites), on_favorite=on_favorite)
+    pages = c.getPageNumber()
+    c.save()
+    return pages
+
+
+def _export_parallel(favorites, path, lang_mode, workers, chunk_size, progress: Optional[ProgressFn]) -> int:
+    total = len(favorites)
+    surnames = _surnames(favorites)
+    blocks = [_cached_block(f, lang_mode) for f in favorites]
+    stale = [k for k, b in enumerate(blocks) if b is None]
+    parts_dir = tempfile.mkdtemp(prefix=".pdf_parts_", dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        # spawn, not fork: the app process runs threads that fork would copy mid-lock
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {
+                pool.submit(_layout_part, [favorites[k] for k in ids], lang_mode): ids
+                for ids in (stale[i:i + chunk_size] for i in range(0, len(stale), chunk_size))
+            }
+            done = 0
+            for future in as_completed(futures):
+                ids = futures[future]
+                for k, block in zip(ids, future.result()):
+                    blocks[k] = block
+                    _store_block(favorites[k], lang_mode, block)
+                done += len(ids)
+                if progress:
+                    progress(0.5 * done / len(stale), f"Laid out {done}/{len(stale)}")
+
+            y = _draw_title(canvas.Canvas(BytesIO(), pagesize=A4), surnames, A4[1] - 40)
+            parts = _split_parts(_page_flow(blocks, y), chunk_size)
+            part_paths = [os.path.join(parts_dir, f"part{k:05d}.pdf") for k in range(len(parts))]
+            futures = {
+                pool.submit(_render_part, blocks[i:end], i + 1, page, surnames if i == 0 else None, part): end - i
+                for (i, end, page), part in zip(parts, part_paths)
+            }
+            done = 0
+            for future in as_completed(futures):
+                future.result()
+                done += futures[future]
+                if progress:
+                    progress(0.5 + 0.4 * done / total, f"Rendered {done}/{total}")
+
+        if progress:
+            progress(0.9, f"Merging {len(parts)} parts")
+        return _concat_parts(part_paths, path)
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+
+def export_pdf(
+    favorites: List[dict],
+    path: str,
+    lang_mode: str = "Both",
+    workers: Optional[int] = None,
+    chunk_size: int = PDF_CHUNK_SIZE,
+    progress: Optional[ProgressFn] = None,
+) -> int:
+    """Write the report for favorites to path (the same pages as generate_pdf, on any path); returns the page count."""
+    workers = workers or PDF_WORKERS or os.cpu_count() or 1
+    try:
+        import pypdf  # noqa: F401
+        can_merge = True
+    except ImportError:
+        can_merge = False
+    # the pool only pays off when much is left to lay out
+    stale = sum(not block_cached(f, lang_mode) for f in favorites)
+    if can_merge and workers > 1 and stale > chunk_size:
+        pages = _export_parallel(favorites, path, lang_mode, workers, chunk_size, progress)
+    else:
+        pages = _export_serial(favorites, path, lang_mode, progress)
+    if progress:
+        progress(1.0, f"{len(favorites)} names · {pages} pages")
+    return pages
@@ -0,0 +1,114 @@
+import os
+import sqlite3
+import struct
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from result_store import ResultSet
+
+# ============================================================
+# PERSISTENT RESULT CACHE
+# SQLite file next to the DB snapshots, shared by every server process
+# and surviving restarts. One row per generated ResultSet (blob from
+# ResultSet.to_bytes), keyed by logic.result_cache_key (rules digest, DB fingerprint +
+# query). Reads bump last_used; writes evict least-recently-used rows
+# until the payloads fit in max_bytes.
+# Any sqlite error degrades to a cache miss: generation never depends
+# on the cache being writable. A payload that doesn't decode is deleted
+# and counts as a miss too.
+# ============================================================
+_CORRUPT = (struct.error, ValueError, KeyError, TypeError, UnicodeDecodeError)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key       TEXT PRIMARY KEY,
+    payload   BLOB NOT NULL,
+    nbytes    INTEGER NOT NULL,
+    last_used REAL NOT NULL
+)
+"""
+
+
+class ResultCache:
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")  # readers don't block the writer across processes
+            conn.execute(_SCHEMA)
+            conn.execute("CREATE INDEX IF NOT EXISTS results_lru ON results (last_used)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # one short-lived connection per call (committed, then closed): safe across Streamlit's session threads
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[ResultSet]:
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT payload FROM results WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+        except sqlite3.Error:
+            return None
+        try:
+            return ResultSet.from_bytes(row[0])
+        except _CORRUPT:
+            self.discard(key)
+            return None
+
+    def discard(self, key: str) -> None:
+        try:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM results WHERE key = ?", (key,))
+        except sqlite3.Error:
+            pass
+
+    def put(self, key: str, rs: ResultSet) -> None:
+        blob = rs.to_bytes()
+        if len(blob) > self.max_bytes:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO results (key, payload, nbytes, last_used) VALUES (?, ?, ?, ?)",
+                    (key, blob, len(blob), time.time()),
+                )
+                self._evict(conn)
+        except sqlite3.Error:
+            pass
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        stale = []
+        for key, nbytes in conn.execute("SELECT key, nbytes FROM results ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= nbytes
+        conn.executemany("DELETE FROM results WHERE key = ?", stale)
+
+    def stats(self) -> dict:
+        try:
+            with self._connect() as conn:
+                n, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM results").fetchone()
+        except sqlite3.Error:
+            n, total = 0, 0
+        return {"entries": n, "bytes": total, "max_bytes": self.max_bytes}
+
+    def clear(self) -> None:
+        try:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM results")
+        except sqlite3.Error:
+            pass
@@ -0,0 +1,121 @@
+import json
+import struct
+from array import array
+from typing import Optional, Sequence, Tuple
+
+# ============================================================
+# COLUMNAR RESULT SET
+# One candidate = one slot in each parallel array (12 bytes):
+#   second / third : u32 index into the loaded db list
+#   pattern        : u8  index into ResultSet.patterns
+#   destiny        : u16 destiny total (總格)
+#   zodiac         : u8  packed status codes for the selected rule set
+#                    (2nd | 3rd << 2, see rules.zodiac_rules.STATUS_*)
+# Everything else in a result row is derived from these plus the DB
+# and the surname spec (None = config.FIRST_CHAR), so full row dicts are
+# built only for what is shown or exported (logic.result_rows / logic.result_frame).
+# ============================================================
+_COLUMNS = (("second", "I"), ("third", "I"), ("pattern", "B"), ("destiny", "H"), ("zodiac", "B"))
+_BLOB_HEADER = struct.Struct("<II")  # meta length, candidate count
+
+
+class ResultSet:
+    __slots__ = (
+        "patterns", "zodiac_name", "zodiac_filter_mode", "surname",
+        "second", "third", "pattern", "destiny", "zodiac",
+    )
+
+    def __init__(
+        self,
+        patterns: Sequence[str],
+        zodiac_name: str = "None",
+        zodiac_filter_mode: str = "OFF",
+        surname: Optional[dict] = None,
+    ):
+        self.patterns: Tuple[str, ...] = tuple(patterns)
+        self.zodiac_name = zodiac_name
+        self.zodiac_filter_mode = zodiac_filter_mode
+        self.surname = surname
+        self.second = array("I")
+        self.third = array("I")
+        self.pattern = array("B")
+        self.destiny = array("H")
+        self.zodiac = array("B")
+
+    def __len__(self) -> int:
+        return len(self.second)
+
+    def append(self, second_idx: int, third_idx: int, pattern_id: int, destiny_total: int, zodiac_codes: int) -> None:
+        self.second.append(second_idx)
+        self.third.append(third_idx)
+        self.pattern.append(pattern_id)
+        self.destiny.append(destiny_total)
+        self.zodiac.append(zodiac_codes)
+
+    def extend(self, other: "ResultSet") -> None:
+        """Append every candidate of another set over the same patterns (e.g. a shard computed elsewhere)."""
+        for name, _ in _COLUMNS:
+            getattr(self, name).extend(getattr(other, name))
+
+    def select(self, ids: Sequence[int]) -> "ResultSet":
+        """New ResultSet holding only the given candidate ids, in that order."""
+        out = ResultSet(self.patterns, self.zodiac_name, self.zodiac_filter_mode, self.surname)
+        for k in ids:
+            out.append(self.second[k], self.third[k], self.pattern[k], self.destiny[k], self.zodiac[k])
+        return out
+
+    def with_surname(self, surname: Optional[dict]) -> "ResultSet":
+        """Same candidates for another surname with identical stroke counts; arrays are shared, not copied."""
+        out = ResultSet(self.patterns, self.zodiac_name, self.zodiac_filter_mode, surname)
+        out.second, out.third, out.pattern, out.destiny, out.zodiac = (
+            self.second, self.third, self.pattern, self.destiny, self.zodiac
+        )
+        return out
+
+    def remap_chars(self, index_map: Sequence[int]) -> "ResultSet":
+        """Same candidates with every db index i replaced by index_map[i] (a reloaded db); other arrays are shared."""
+        out = self.with_surname(self.surname)
+        out.second = array("I", [index_map[i] for i in self.second])
+        out.third = array("I", [index_map[i] for i in self.third])
+        return out
+
+    def char_indexes(self, k: int) -> Tuple[int, int]:
+        return self.second[k], self.third[k]
+
+    def pattern_key(self, k: int) -> str:
+        return self.patterns[self.pattern[k]]
+
+    def zodiac_codes(self, k: int) -> Tuple[int, int]:
+        packed = self.zodiac[k]
+        return packed & 0b11, (packed >> 2) & 0b11
+
+    def nbytes(self) -> int:
+        return sum(a.itemsize * len(a) for a in (self.second, self.third, self.pattern, self.destiny, self.zodiac))
+
+    def to_bytes(self) -> bytes:
+        """Compact blob for on-disk caches (result_cache.py): JSON meta + the raw arrays (native byte order)."""
+        meta = json.dumps({
+            "patterns": self.patterns,
+            "zodiac_name": self.zodiac_name,
+            "zodiac_filter_mode": self.zodiac_filter_mode,
+            "surname": self.surname,
+        }, ensure_ascii=False).encode("utf-8")
+        parts = [_BLOB_HEADER.pack(len(meta), len(self)), meta]
+        parts.extend(getattr(self, name).tobytes() for name, _ in _COLUMNS)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> "ResultSet":
+        meta_len, n = _BLOB_HEADER.unpack_from(blob, 0)
+        pos = _BLOB_HEADER.size
+        meta = json.loads(blob[pos:pos + meta_len].decode("utf-8"))
+        pos += meta_len
+        rs = cls(meta["patterns"], meta["zodiac_name"], meta["zodiac_filter_mode"], meta["surname"])
+        for name, _ in _COLUMNS:
+            col = getattr(rs, name)
+            size = col.itemsize * n
+            col.frombytes(blob[pos:pos + size])
+            pos += size
+        if pos != len(blob) or any(len(getattr(rs, name)) != n for name, _ in _COLUMNS):
+            raise ValueError("ResultSet blob is truncated or corrupt")
+        return rs
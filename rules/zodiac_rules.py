@@ -1,4 +1,4 @@
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from config import ZODIAC_RULES
 
 def _split_components(text: str) -> List[str]:
@@ -37,3 +37,81 @@ def check_zodiac_tokens(zodiac_name: str, tokens_text: str) -> Dict[str, str]:
             return {"status": "吉", "matched": t}
 
     return {"status": "neutral", "matched": ""}
+
+# ============================================================
+# PRECOMPILED STATUS INDEX
+# Each character's row[4] cell is tokenized once at load time and
+# its status under every rule set is packed into one int:
+#   2 bits per zodiac, in ZODIAC_ORDER (0=neutral, 1=吉, 2=凶)
+# Generation/filtering only reads these codes.
+# ============================================================
+ZODIAC_ORDER: List[str] = list(ZODIAC_RULES)
+
+STATUS_NEUTRAL = 0
+STATUS_JI = 1
+STATUS_XIONG = 2
+STATUS_NAMES = {STATUS_NEUTRAL: "neutral", STATUS_JI: "吉", STATUS_XIONG: "凶"}
+
+_ZODIAC_SHIFT = {name: 2 * i for i, name in enumerate(ZODIAC_ORDER)}
+
+def zodiac_code(mask: int, zodiac_name: str) -> int:
+    shift = _ZODIAC_SHIFT.get(zodiac_name)
+    if shift is None:
+        return STATUS_NEUTRAL
+    return (mask >> shift) & 0b11
+
+def compile_zodiac_cell(tokens_text: str) -> Tuple[Tuple[str, ...], int, Tuple[str, ...]]:
+    """
+    Returns (tokens, mask, matched) where matched[i] is the token that
+    decided the status for ZODIAC_ORDER[i] ("" when neutral).
+    """
+    tokens = tuple(_split_components(tokens_text))
+    mask = 0
+    matched = []
+    for name in ZODIAC_ORDER:
+        res = check_zodiac_tokens(name, tokens_text)
+        code = {"吉": STATUS_JI, "凶": STATUS_XIONG}.get(res["status"], STATUS_NEUTRAL)
+        mask |= code << _ZODIAC_SHIFT[name]
+        matched.append(res["matched"])
+    return tokens, mask, tuple(matched)
+
+def build_zodiac_index(db: List[dict]) -> None:
+    """
+    Annotate every record in place with zodiac_tokens / zodiac_mask / zodiac_matched.
+    Identical cells (most are empty) are compiled only once.
+    """
+    compiled: Dict[str, Tuple[Tuple[str, ...], int, Tuple[str, ...]]] = {}
+    for c in db:
+        cell = c.get("zodiac_cell", "") or ""
+        if cell not in compiled:
+            compiled[cell] = compile_zodiac_cell(cell)
+        c["zodiac_tokens"], c["zodiac_mask"], c["zodiac_matched"] = compiled[cell]
+
+def zodiac_check(ch: dict, zodiac_name: str) -> Dict[str, str]:
+    """check_zodiac_tokens() equivalent that reads the precompiled index."""
+    mask = ch.get("zodiac_mask")
+    if mask is None:
+        return check_zodiac_tokens(zodiac_name, ch.get("zodiac_cell", ""))
+    code = zodiac_code(mask, zodiac_name)
+    if code == STATUS_NEUTRAL:
+        return {"status": "neutral", "matched": ""}
+    return {
+        "status": STATUS_NAMES[code],
+        "matched": ch["zodiac_matched"][ZODIAC_ORDER.index(zodiac_name)],
+    }
+
+def passes_zodiac_filter(code: int, zodiac_filter_mode: str) -> bool:
+    """Per-character half of the 2nd + 3rd character filter."""
+    if zodiac_filter_mode == "REQUIRE_JI":
+        return code == STATUS_JI
+    if zodiac_filter_mode == "EXCLUDE_XIONG":
+        return code != STATUS_XIONG
+    return True
+
+def pair_passes(code2: int, code3: int, zodiac_filter_mode: str) -> bool:
+    """2nd + 3rd character filter for one rule set."""
+    return passes_zodiac_filter(code2, zodiac_filter_mode) and passes_zodiac_filter(code3, zodiac_filter_mode)
+
+def passes_any_zodiac(mask: int, zodiac_filter_mode: str) -> bool:
+    """Per-character prefilter for matrix mode: the character is usable under at least one rule set."""
+    return any(passes_zodiac_filter(zodiac_code(mask, z), zodiac_filter_mode) for z in ZODIAC_ORDER)
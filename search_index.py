@@ -0,0 +1,99 @@
+import re
+import unicodedata
+from typing import Dict, List, Optional, Set
+
+from config import FIRST_CHAR
+from result_store import ResultSet
+
+# ============================================================
+# SEARCH INDEX
+# Inverted index over one ResultSet, built once per result set:
+#   chars     : Name character            -> candidate ids
+#   syllables : tone-stripped pinyin      -> candidate ids
+#   prefixes  : every prefix of a syllable -> candidate ids
+# A query is split into terms; each term is looked up and the postings
+# are intersected, so "hong wen", "hóng wén", "hong we" and "洪文" all
+# resolve to the same ids without scanning the rows. ü is indexed as u
+# (and a typed "v" means ü).
+# ============================================================
+_SYLLABLE = re.compile(r"[a-z]+")
+
+
+def strip_tones(text: str) -> str:
+    """'Hóng Lǚ' -> 'hong lu'"""
+    decomposed = unicodedata.normalize("NFD", str(text).lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def _is_cjk(ch: str) -> bool:
+    return unicodedata.category(ch) == "Lo"
+
+
+class SearchIndex:
+    __slots__ = ("size", "names", "chars", "syllables", "prefixes")
+
+    def __init__(self, rs: ResultSet, db: List[dict]):
+        surname = rs.surname or FIRST_CHAR
+        surname_char = surname["char"]
+        surname_syllables = _SYLLABLE.findall(strip_tones(surname["pinyin"]))
+
+        self.size = len(rs)
+        self.names: List[str] = []
+        self.chars: Dict[str, Set[int]] = {}
+        self.syllables: Dict[str, Set[int]] = {}
+        self.prefixes: Dict[str, Set[int]] = {}
+
+        # postings are per DB character: candidates sharing a 2nd/3rd char share the lookups
+        syllables_of: Dict[int, List[str]] = {}
+        for k in range(len(rs)):
+            a, b = rs.second[k], rs.third[k]
+            for idx in (a, b):
+                if idx not in syllables_of:
+                    syllables_of[idx] = _SYLLABLE.findall(strip_tones(db[idx]["pinyin"]))
+            name = surname_char + db[a]["char"] + db[b]["char"]
+            self.names.append(name)
+            for ch in set(name):
+                self.chars.setdefault(ch, set()).add(k)
+            for syl in set(surname_syllables + syllables_of[a] + syllables_of[b]):
+                self.syllables.setdefault(syl, set()).add(k)
+                for n in range(1, len(syl) + 1):
+                    self.prefixes.setdefault(syl[:n], set()).add(k)
+
+    def _pinyin_term(self, term: str) -> Set[int]:
+        """
+        Ids matching one latin term: a syllable prefix ("hon"), or whole
+        syllables run together ending in a prefix ("hongwe").
+        """
+        hits = self.prefixes.get(term)
+        if hits is not None:
+            return hits
+        # split off the longest indexed syllable and recurse on the rest
+        for cut in range(len(term) - 1, 0, -1):
+            head = self.syllables.get(term[:cut])
+            if head:
+                rest = self._pinyin_term(term[cut:])
+                if rest:
+                    return head & rest
+        return set()
+
+    def search(self, query: str) -> Optional[Set[int]]:
+        """Candidate ids matching every term of the query; None = empty query (no filtering)."""
+        text = strip_tones(query).replace("v", "u")
+        cjk = [ch for ch in query if _is_cjk(ch)]
+        latin = _SYLLABLE.findall(text)
+        if not cjk and not latin:
+            return None
+
+        postings = [self.chars.get(ch, set()) for ch in dict.fromkeys(cjk)]
+        postings += [self._pinyin_term(term) for term in latin]
+        postings.sort(key=len)  # intersect smallest first
+        hits = set(postings[0])
+        for p in postings[1:]:
+            hits &= p
+            if not hits:
+                break
+
+        run = query.strip()
+        if len(cjk) > 1 and run == "".join(cjk):
+            hits = {k for k in hits if run in self.names[k]}  # "洪文" means that substring, not just both chars
+        return hits